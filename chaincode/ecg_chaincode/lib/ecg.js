@@ -2,6 +2,9 @@
 
 const { Contract } = require('fabric-contract-api');
 
+// Upper bound on records per storeECGDataBatch transaction
+const MAX_BATCH_SIZE = 1000;
+
 class ECGContract extends Contract {
 
     // Helper method to get the client ID (X.509 identity string)
@@ -9,6 +12,52 @@ class ECGContract extends Contract {
         return ctx.clientIdentity.getID();
     }
 
+    // Helper (underscore = not exposed as a transaction) to build a new ECG record in PENDING_VERIFICATION state
+    _buildECGData(patientIDString, ipfsHash, timestamp, parsedMetadata, patientOwnerClientID, inputByClientID) {
+        return {
+            patientID: patientIDString,
+            ipfsHash,
+            timestamp,
+            metadata: parsedMetadata,
+            status: "PENDING_VERIFICATION",      // 🔒 Escrow: Start with PENDING
+            accessControl: {
+                owner: patientOwnerClientID,      // Patient sebagai owner
+                authorizedUsers: []              // Awalnya kosong
+            },
+            accessHistory: [],
+            inputBy: inputByClientID,             // Doctor yang input data
+            createdAt: timestamp,
+            lastStatusUpdate: timestamp
+        };
+    }
+
+    // Helper (underscore = not exposed as a transaction) to validate one batch record, returns an error message or null
+    _validateBatchRecord(record, seenPatientIDs) {
+        if (!record || typeof record !== 'object') {
+            return 'Record must be an object';
+        }
+        if (!record.patientID || String(record.patientID).trim() === '') {
+            return 'patientID is required';
+        }
+        if (!record.ipfsHash || String(record.ipfsHash).trim() === '') {
+            return 'ipfsHash is required';
+        }
+        if (!record.patientOwnerClientID || String(record.patientOwnerClientID).trim() === '') {
+            return 'Patient owner client ID is required';
+        }
+        if (seenPatientIDs.has(record.patientID)) {
+            return `Duplicate patientID ${record.patientID} in batch`;
+        }
+        if (typeof record.metadata === 'string') {
+            try {
+                JSON.parse(record.metadata || '{}');
+            } catch (error) {
+                return `Invalid metadata JSON: ${error.message}`;
+            }
+        }
+        return null;
+    }
+
     async initLedger(ctx) {
         console.info('========= ECG Chaincode Initialized =========');
         return;
@@ -30,21 +79,7 @@ class ECGContract extends Contract {
         // 🔧 FIX: Use deterministic timestamp from parameter
         const deterministicTimestamp = timestamp || new Date().toISOString();
         
-        const ecgData = {
-            patientID: patientIDString,
-            ipfsHash,
-            timestamp: deterministicTimestamp,
-            metadata: parsedMetadata,
-            status: "PENDING_VERIFICATION",      // 🔒 Escrow: Start with PENDING
-            accessControl: {
-                owner: patientOwnerClientID,      // Patient sebagai owner
-                authorizedUsers: []              // Awalnya kosong
-            },
-            accessHistory: [],
-            inputBy: inputByClientID,             // Doctor yang input data
-            createdAt: deterministicTimestamp,   // 🔧 FIX: Use deterministic timestamp
-            lastStatusUpdate: deterministicTimestamp  // 🔧 FIX: Use deterministic timestamp
-        };
+        const ecgData = this._buildECGData(patientIDString, ipfsHash, deterministicTimestamp, parsedMetadata, patientOwnerClientID, inputByClientID);
 
         await ctx.stub.putState(patientIDString, Buffer.from(JSON.stringify(ecgData)));
         console.info(`ECG data stored with PENDING status for patient ${patientIDString} with owner ${patientOwnerClientID}, input by ${inputByClientID}`);
@@ -74,6 +109,7 @@ class ECGContract extends Contract {
             ipfsHash: ipfsHash,
             timestamp: deterministicTimestamp,
             requestedBy: inputByClientID,
+            owner: patientOwnerClientID,
             verificationTimeout: 300 // 5 minutes timeout
         };
 
@@ -81,6 +117,8 @@ class ECGContract extends Contract {
         console.info(`Event emitted: VerifyIPFSData for patient ${patientIDString}`);
         
         return JSON.stringify({ 
+            // Lets clients follow the commit without waiting for it
+            txId: ctx.stub.getTxID(),
             status: 'success', 
             message: 'ECG data stored successfully with PENDING verification status', 
             patientID: patientIDString, 
@@ -91,6 +129,91 @@ class ECGContract extends Contract {
         });
     }
 
+    async storeECGDataBatch(ctx, recordsJSON) {
+        console.info('========= Store ECG Data Batch with Escrow Pattern =========');
+
+        const inputByClientID = this.getClientIdentityString(ctx);
+
+        let records;
+        try {
+            records = JSON.parse(recordsJSON || '[]');
+        } catch (error) {
+            throw new Error(`Invalid batch payload: ${error.message}`);
+        }
+        if (!Array.isArray(records) || records.length === 0) {
+            throw new Error('Batch must be a non-empty array of ECG records');
+        }
+        if (records.length > MAX_BATCH_SIZE) {
+            throw new Error(`Batch too large: ${records.length} records (max ${MAX_BATCH_SIZE})`);
+        }
+
+        // 🔧 FIX: Use transaction timestamp for deterministic behavior
+        const txTimestamp = ctx.stub.getTxTimestamp();
+        const batchTimestamp = new Date(txTimestamp.seconds * 1000 + Math.round(txTimestamp.nanos / 1000000)).toISOString();
+
+        const seenPatientIDs = new Set();
+        const results = [];
+        const storedRecords = [];
+
+        for (let index = 0; index < records.length; index++) {
+            const record = records[index];
+            const validationError = this._validateBatchRecord(record, seenPatientIDs);
+            if (validationError) {
+                results.push({
+                    index,
+                    patientID: (record && record.patientID) || null,
+                    status: 'REJECTED',
+                    error: validationError
+                });
+                continue;
+            }
+            seenPatientIDs.add(record.patientID);
+
+            const parsedMetadata = typeof record.metadata === 'string'
+                ? JSON.parse(record.metadata || '{}')
+                : (record.metadata || {});
+            const recordTimestamp = record.timestamp || batchTimestamp;
+
+            const ecgData = this._buildECGData(record.patientID, record.ipfsHash, recordTimestamp, parsedMetadata, record.patientOwnerClientID, inputByClientID);
+            await ctx.stub.putState(record.patientID, Buffer.from(JSON.stringify(ecgData)));
+
+            storedRecords.push({ patientID: record.patientID, ipfsHash: record.ipfsHash, owner: record.patientOwnerClientID });
+            results.push({
+                index,
+                patientID: record.patientID,
+                ipfsHash: record.ipfsHash,
+                status: 'PENDING_VERIFICATION'
+            });
+        }
+
+        console.info(`ECG batch stored: ${storedRecords.length}/${records.length} records with PENDING status, input by ${inputByClientID}`);
+
+        // 🔄 EMIT EVENT untuk IPFS verification (Fabric keeps one event per transaction)
+        if (storedRecords.length > 0) {
+            const verificationPayload = {
+                eventType: 'VERIFY_IPFS_DATA_BATCH',
+                records: storedRecords,
+                timestamp: batchTimestamp,
+                requestedBy: inputByClientID,
+                verificationTimeout: 300 // 5 minutes timeout
+            };
+
+            ctx.stub.setEvent('VerifyIPFSData', Buffer.from(JSON.stringify(verificationPayload)));
+            console.info(`Event emitted: VerifyIPFSData for ${storedRecords.length} batch records`);
+        }
+
+        return JSON.stringify({
+            txId: ctx.stub.getTxID(),
+            status: 'success',
+            message: `ECG batch processed: ${storedRecords.length} stored, ${records.length - storedRecords.length} rejected`,
+            total: records.length,
+            stored: storedRecords.length,
+            rejected: records.length - storedRecords.length,
+            inputBy: inputByClientID,
+            results
+        });
+    }
+
     async confirmECGData(ctx, patientIDString, isValid, verificationDetails) {
         console.info('========= Confirm ECG Data Verification =========');
 
@@ -140,6 +263,7 @@ class ECGContract extends Contract {
         console.info(`Event emitted: ECGVerificationCompleted for patient ${patientIDString} with result ${newStatus}`);
 
         return JSON.stringify({
+            txId: ctx.stub.getTxID(),
             status: 'success',
             message: `ECG data verification completed for patient ${patientIDString}`,
             verificationResult: newStatus,
@@ -202,6 +326,7 @@ class ECGContract extends Contract {
         console.info(`Event emitted: AccessGranted for doctor ${doctorClientIDToGrant} to patient ${patientIDString}`);
 
         return JSON.stringify({
+            txId: ctx.stub.getTxID(),
             status: 'success',
             message: `Access granted to doctor ${doctorClientIDToGrant} for patient ${patientIDString}`,
             grantedBy: callerClientID,
@@ -260,6 +385,7 @@ class ECGContract extends Contract {
         console.info(`Event emitted: AccessRevoked for doctor ${doctorClientIDToRevoke} from patient ${patientIDString}`);
 
         return JSON.stringify({
+            txId: ctx.stub.getTxID(),
             status: 'success',
             message: `Access revoked from doctor ${doctorClientIDToRevoke} for patient ${patientIDString}`,
             revokedBy: callerClientID,
@@ -0,0 +1,240 @@
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+import gatewayMetrics
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0    # doctor/patient reads: /ecg/access, /ecg/audit, grant/revoke
+PRIORITY_NORMAL = 1         # status polling, windows, previews
+PRIORITY_BULK = 2           # uploads
+PRIORITY_BACKGROUND = 3     # verification, prefetch
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_BULK: 'bulk',
+    PRIORITY_BACKGROUND: 'background'
+}
+
+# Priority of the work running in this context, set per request by the web gateway
+# (copied into asyncio tasks and asyncio.to_thread, not into plain executor threads)
+_current_priority = contextvars.ContextVar('ecg_admission_priority', default=PRIORITY_NORMAL)
+
+
+def current_priority():
+    return _current_priority.get()
+
+
+def set_priority(priority):
+    """Set the priority of the current context, returns a token for reset_priority()"""
+    return _current_priority.set(priority)
+
+
+def reset_priority(token):
+    _current_priority.reset(token)
+
+
+@contextmanager
+def prioritized(value):
+    """Run a block at the given priority"""
+    token = _current_priority.set(value)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a pool's queue is full or the wait for a slot timed out"""
+
+    def __init__(self, pool, reason, retry_after):
+        super().__init__(f"{pool} pool {reason}, retry after {retry_after}s")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """
+    Bounded concurrency with a priority queue in front of it.
+
+    At most limit holders run at once. Callers beyond that wait in a heap
+    ordered by (priority, arrival), so an interactive read queued after a
+    burst of uploads gets the next free slot. When max_queue callers are
+    already waiting, acquire() fails right away instead of queueing, which
+    the web gateway turns into 429 with a Retry-After estimate.
+    """
+
+    def __init__(self, name, limit, max_queue=None, max_wait=None):
+        """
+        Args:
+            name: pool name for stats and metrics ('submit', 'evaluate', 'ipfs')
+            limit: concurrent holders
+            max_queue: waiting callers before new ones are rejected (None is unbounded)
+            max_wait: default seconds to wait for a slot (None waits forever)
+        """
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._lock = threading.Lock()
+        self._waiters = []                # heap of (priority, seq, Future)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._queued = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._hold_ewma = None            # seconds a slot is typically held
+        self.stats = {'admitted': 0, 'queuedTotal': 0, 'rejected': 0, 'timedOut': 0,
+                      'waitMs': 0.0, 'maxWaitMs': 0.0}
+
+    def _retry_after(self):
+        """Seconds until a rejected caller has a fair chance, from the queue and hold time"""
+        hold = self._hold_ewma or 1.0
+        waiting = sum(self._queued.values())
+        return max(1, min(60, math.ceil(hold * (waiting + 1) / self.limit)))
+
+    def _update_gauges(self):
+        gatewayMetrics.observe_admission_depth(self.name, self._in_flight, sum(self._queued.values()))
+
+    def acquire(self, priority=None, timeout=-1):
+        """
+        Take a slot, waiting behind higher priority callers
+
+        Args:
+            priority: PRIORITY_* (default: priority of the current context)
+            timeout: seconds to wait (default max_wait, None waits forever)
+
+        Returns:
+            float: seconds spent waiting
+
+        Raises:
+            AdmissionRejected: the queue is full or no slot freed up in time
+        """
+        priority = current_priority() if priority is None else priority
+        timeout = self.max_wait if timeout == -1 else timeout
+        started = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                self.stats['admitted'] += 1
+                self._update_gauges()
+                gatewayMetrics.observe_admission(self.name, PRIORITY_NAMES[priority], 'admitted', 0.0)
+                return 0.0
+            if self.max_queue is not None and sum(self._queued.values()) >= self.max_queue:
+                self.stats['rejected'] += 1
+                retry_after = self._retry_after()
+                gatewayMetrics.observe_admission(self.name, PRIORITY_NAMES[priority], 'rejected')
+                raise AdmissionRejected(self.name, 'queue full', retry_after)
+            waiter = Future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            self._queued[priority] += 1
+            self.stats['queuedTotal'] += 1
+            self._update_gauges()
+
+        try:
+            waiter.result(timeout)
+        except FutureTimeoutError:
+            # cancel() fails once release() handed the slot over, then it is ours after all
+            if waiter.cancel():
+                with self._lock:
+                    self._queued[priority] -= 1
+                    self.stats['timedOut'] += 1
+                    retry_after = self._retry_after()
+                    self._update_gauges()
+                gatewayMetrics.observe_admission(self.name, PRIORITY_NAMES[priority], 'timeout')
+                raise AdmissionRejected(self.name, f'no free slot within {timeout}s', retry_after)
+            waiter.result()
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.stats['admitted'] += 1
+            self.stats['waitMs'] += waited * 1000
+            self.stats['maxWaitMs'] = max(self.stats['maxWaitMs'], waited * 1000)
+        gatewayMetrics.observe_admission(self.name, PRIORITY_NAMES[priority], 'admitted', waited)
+        return waited
+
+    def release(self, held_seconds=None):
+        """
+        Free a slot, handing it to the first waiter in priority order
+
+        Args:
+            held_seconds: how long the slot was held, feeds the Retry-After estimate
+        """
+        with self._lock:
+            if held_seconds is not None:
+                self._hold_ewma = held_seconds if self._hold_ewma is None else \
+                    0.8 * self._hold_ewma + 0.2 * held_seconds
+            while self._waiters:
+                priority, _, waiter = heapq.heappop(self._waiters)
+                # False when the waiter timed out and cancelled itself
+                if waiter.set_running_or_notify_cancel():
+                    self._queued[priority] -= 1
+                    waiter.set_result(True)
+                    self._update_gauges()
+                    return
+            self._in_flight -= 1
+            self._update_gauges()
+
+    @contextmanager
+    def slot(self, priority=None, timeout=-1):
+        self.acquire(priority, timeout)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def get_stats(self):
+        with self._lock:
+            admitted = self.stats['admitted']
+            return dict(
+                self.stats,
+                waitMs=round(self.stats['waitMs'], 1),
+                maxWaitMs=round(self.stats['maxWaitMs'], 1),
+                avgWaitMs=round(self.stats['waitMs'] / admitted, 2) if admitted else None,
+                inFlight=self._in_flight,
+                limit=self.limit,
+                queued=sum(self._queued.values()),
+                queuedByPriority={PRIORITY_NAMES[p]: count for p, count in self._queued.items()},
+                maxQueue=self.max_queue,
+                retryAfter=self._retry_after()
+            )
+
+
+class AdmissionController:
+    """Admission pools of the web gateway: ledger submits and ledger evaluates"""
+
+    def __init__(self, submit_limit=8, evaluate_limit=32, max_queue=64, max_wait=10.0):
+        """
+        Args:
+            submit_limit: concurrent requests that submit transactions
+            evaluate_limit: concurrent requests that evaluate (query) the ledger
+            max_queue: waiting requests per pool before answering 429
+            max_wait: seconds a queued request waits for a slot before 429
+        """
+        self.pools = {
+            'submit': AdmissionPool('submit', submit_limit, max_queue, max_wait),
+            'evaluate': AdmissionPool('evaluate', evaluate_limit, max_queue, max_wait)
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build from ECG_ADMISSION_* environment variables"""
+        return cls(
+            submit_limit=int(os.getenv('ECG_ADMISSION_SUBMIT_LIMIT', '8')),
+            evaluate_limit=int(os.getenv('ECG_ADMISSION_EVALUATE_LIMIT', '32')),
+            max_queue=int(os.getenv('ECG_ADMISSION_MAX_QUEUE', '64')),
+            max_wait=float(os.getenv('ECG_ADMISSION_MAX_WAIT', '10'))
+        )
+
+    def pool(self, name):
+        return self.pools[name]
+
+    def get_stats(self):
+        return {name: pool.get_stats() for name, pool in self.pools.items()}
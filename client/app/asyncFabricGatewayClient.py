@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+
+
+class AsyncFabricGatewayClient:
+    """
+    Asyncio front-end for FabricGatewayClient.
+
+    All chaincode calls run on one long-lived event loop owned by this object,
+    so gRPC channels are shared and thousands of transactions can be in flight
+    from a single process. The coroutines can be awaited from any other event
+    loop (e.g. Flask async views), they are handed over to the client loop.
+    """
+
+    def __init__(self, fabric_client, max_in_flight=4096, timeout=120):
+        """
+        Args:
+            fabric_client: configured FabricGatewayClient (peers, identities, backend)
+            max_in_flight: maximum concurrent chaincode calls
+            timeout: peer CLI timeout in seconds (gRPC uses the backend deadline)
+        """
+        self.client = fabric_client
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._semaphore = None
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='fabric-async-loop', daemon=True)
+        self._thread.start()
+
+        print(f"🔧 AsyncFabricGatewayClient started (max in-flight: {max_in_flight})")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _run_on_loop(self, coro):
+        """Await a coroutine on the client loop from whichever loop we are on"""
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def run(self, coro):
+        """Run a coroutine on the client loop from synchronous code"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _run_peer_command_async(self, chaincode_call, is_query, user_role, peer_names):
+        try:
+            cmd, full_env = self.client._build_peer_command(chaincode_call, is_query, user_role, peer_names)
+            started = time.time()
+
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                env=full_env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                raise TimeoutError(f"peer command timed out after {self.timeout} seconds")
+
+            return self.client._parse_peer_result(
+                process.returncode, stdout.decode('utf-8'), stderr.decode('utf-8'), user_role, started
+            )
+
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'userRole': user_role}
+
+    async def _execute_peer_command_async(self, chaincode_call, is_query=False, user_role='admin'):
+        """Peer CLI fallback using a non-blocking subprocess, failing over to other peers"""
+        selector = self.client.peer_selector
+        result = {'success': False, 'error': 'No peer available', 'userRole': user_role}
+        excluded = set()
+
+        for attempt in range(self.client.max_peer_attempts):
+            peer_names = self.client._select_cli_peers(is_query, excluded)
+            if not peer_names:
+                break
+
+            started = min(selector.start(peer_name) for peer_name in peer_names)
+            result = await self._run_peer_command_async(chaincode_call, is_query, user_role, peer_names)
+
+            failed = self.client._finish_cli_attempt(peer_names, is_query, started, result)
+            if failed is None:
+                break
+            excluded.add(failed)
+
+        return result
+
+    async def _execute_on_loop(self, chaincode_call, is_query, user_role):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async with self._semaphore:
+            backend = self.client.backend
+            if backend is None:
+                return await self._execute_peer_command_async(chaincode_call, is_query, user_role)
+            return await backend.execute_async(chaincode_call, is_query=is_query, user_role=user_role)
+
+    async def _execute_chaincode(self, chaincode_call, is_query=False, user_role='admin'):
+        started = time.perf_counter()
+        cached, cache_ticket = self.client._cache_lookup(chaincode_call, is_query, user_role)
+        if cached is not None:
+            self.client._observe_execution(chaincode_call, is_query, user_role, cached, started)
+            return cached
+
+        result = await self._run_on_loop(self._execute_on_loop(chaincode_call, is_query, user_role))
+        self.client._observe_execution(chaincode_call, is_query, user_role, result, started)
+        self.client._cache_store(cache_ticket, result)
+        return self.client._track_result(chaincode_call, is_query, result)
+
+    async def wait_for_commit(self, tx_id, timeout=30):
+        """Wait (without blocking the loop) until a submitted transaction is committed"""
+        tracker = self.client.commit_tracker
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(tracker.future(tx_id)), timeout)
+        except asyncio.TimeoutError:
+            status = tracker.get_status(tx_id)
+            if status['status'] != 'COMMITTED':
+                status['status'] = 'TIMEOUT'
+            return status
+
+    async def store_ecg_data(self, patient_id, ipfs_hash, metadata, patient_owner_client_id, user_role='admin'):
+        """Store ECG data (async)"""
+        try:
+            print(f"📊 STORE_ECG_DATA (async): Patient {patient_id} by {user_role}")
+
+            chaincode_call = self.client._store_ecg_data_call(patient_id, ipfs_hash, metadata, patient_owner_client_id)
+            result = await self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
+
+            if result['success']:
+                print(f"✅ STORE_ECG_DATA (async): Success by {user_role}")
+                self.client.start_verification(patient_id, ipfs_hash, result.get('txId'), patient_owner_client_id)
+
+            return self.client._store_ecg_data_response(result, patient_id, ipfs_hash)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    async def grant_access(self, patient_id, doctor_client_id, user_role='patient'):
+        """Grant access (async)"""
+        try:
+            chaincode_call = {"function": "grantAccess", "Args": [patient_id, doctor_client_id]}
+            result = await self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
+            return self.client._grant_access_response(result, patient_id, doctor_client_id, user_role)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    async def access_ecg_data(self, patient_id, user_role='doctor'):
+        """Access ECG data (async)"""
+        try:
+            chaincode_call = {"function": "accessECGData", "Args": [patient_id]}
+            result = await self._execute_chaincode(chaincode_call, is_query=True, user_role=user_role)
+            return self.client._access_ecg_data_response(result, patient_id, user_role)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    async def revoke_access(self, patient_id, doctor_client_id, user_role='patient'):
+        """Revoke access (async)"""
+        try:
+            chaincode_call = {"function": "revokeAccess", "Args": [patient_id, doctor_client_id]}
+            result = await self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
+            return self.client._revoke_access_response(result, patient_id, doctor_client_id, user_role)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    async def get_audit_trail(self, patient_id, user_role='patient'):
+        """Get audit trail (async)"""
+        try:
+            chaincode_call = {"function": "getAuditTrail", "Args": [patient_id]}
+            result = await self._execute_chaincode(chaincode_call, is_query=True, user_role=user_role)
+            return self.client._audit_trail_response(result, patient_id, user_role)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    async def get_data_status(self, patient_id, user_role='patient'):
+        """Get data status (async)"""
+        try:
+            chaincode_call = {"function": "getDataStatus", "Args": [patient_id]}
+            result = await self._execute_chaincode(chaincode_call, is_query=True, user_role=user_role)
+            return self.client._data_status_response(result, patient_id, user_role)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    async def confirm_ecg_data(self, patient_id, is_valid, verification_details):
+        """Confirm verification (async, always admin)"""
+        try:
+            chaincode_call = {
+                "function": "confirmECGData",
+                "Args": [patient_id, str(is_valid).lower(), verification_details]
+            }
+            result = await self._execute_chaincode(chaincode_call, is_query=False, user_role='admin')
+            return self.client._confirm_ecg_data_response(result, patient_id, is_valid)
+
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    def close(self):
+        """Close async gRPC channels and stop the client loop"""
+        backend = self.client.backend
+        if backend is not None and hasattr(backend, 'close_async'):
+            self.run(backend.close_async())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class CommitTracker:
+    """
+    Tracks submitted transactions until their block is committed.
+
+    Commit statuses come from block events, or from the peer CLI waiting for
+    the commit event itself when FABRIC_CLI_WAIT_FOR_EVENT is set. Recent statuses are kept so a caller
+    that asks after the block arrived still gets the answer immediately.
+    """
+
+    def __init__(self, history_size=10000, on_commit=None):
+        """
+        Args:
+            history_size: submitted/committed transactions remembered
+            on_commit: optional callback(status) for commits of tracked transactions
+        """
+        self.history_size = history_size
+        self.on_commit = on_commit
+        self._submitted = OrderedDict()   # tx_id -> submit info and timings
+        self._committed = OrderedDict()   # tx_id -> commit info
+        self._waiters = {}                # tx_id -> [Future, ...]
+        self._lock = threading.Lock()
+
+    def _trim(self, entries):
+        while len(entries) > self.history_size:
+            entries.popitem(last=False)
+
+    def track_submit(self, tx_id, function, timings=None):
+        """Remember a transaction accepted by the orderer"""
+        timings = timings or {}
+        now = time.time()
+        with self._lock:
+            self._submitted[tx_id] = {
+                'function': function,
+                'startedAt': timings.get('startedAt', now),
+                'orderedAt': timings.get('orderedAt', now),
+                'endorseMs': timings.get('endorseMs'),
+                'orderMs': timings.get('orderMs'),
+                'submitMs': timings.get('submitMs')
+            }
+            self._trim(self._submitted)
+
+    def record_commit(self, tx_id, validation_code, block_number=None):
+        """Record the validation result of a committed transaction and wake waiters"""
+        with self._lock:
+            if tx_id in self._committed:
+                return
+            self._committed[tx_id] = {
+                'validationCode': validation_code,
+                'blockNumber': block_number,
+                'committedAt': time.time()
+            }
+            self._trim(self._committed)
+            waiters = self._waiters.pop(tx_id, [])
+            status = self._status(tx_id)
+            tracked = tx_id in self._submitted
+
+        if tracked and self.on_commit is not None:
+            self.on_commit(status)
+        for future in waiters:
+            if not future.done():
+                future.set_result(status)
+
+    def handle_block(self, block_info):
+        """Block event callback"""
+        for tx in block_info['transactions']:
+            self.record_commit(tx['txId'], tx['validationCode'], block_info['blockNumber'])
+
+    def _status(self, tx_id):
+        """Build the status dict for a transaction (lock must be held)"""
+        submitted = self._submitted.get(tx_id)
+        committed = self._committed.get(tx_id)
+
+        status = {
+            'txId': tx_id,
+            'status': 'COMMITTED' if committed else ('PENDING' if submitted else 'UNKNOWN'),
+            'validationCode': committed['validationCode'] if committed else None,
+            'valid': committed['validationCode'] == 'VALID' if committed else None,
+            'blockNumber': committed['blockNumber'] if committed else None,
+            'function': submitted['function'] if submitted else None,
+            'timings': None
+        }
+
+        if submitted:
+            timings = {'endorseMs': submitted['endorseMs'], 'orderMs': submitted['orderMs'],
+                       'submitMs': submitted['submitMs'], 'commitMs': None, 'totalMs': None}
+            if committed:
+                timings['commitMs'] = round(max(0.0, committed['committedAt'] - submitted['orderedAt']) * 1000, 1)
+                timings['totalMs'] = round(max(0.0, committed['committedAt'] - submitted['startedAt']) * 1000, 1)
+            status['timings'] = timings
+        return status
+
+    def get_status(self, tx_id):
+        with self._lock:
+            return self._status(tx_id)
+
+    def future(self, tx_id):
+        """Future resolved with the status dict once the transaction commits"""
+        future = Future()
+        with self._lock:
+            if tx_id in self._committed:
+                future.set_result(self._status(tx_id))
+            else:
+                self._waiters.setdefault(tx_id, []).append(future)
+        return future
+
+    def wait_for_commit(self, tx_id, timeout=30):
+        """Block until the transaction commits or the timeout expires"""
+        future = self.future(tx_id)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                waiters = self._waiters.get(tx_id, [])
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    self._waiters.pop(tx_id, None)
+                status = self._status(tx_id)
+            if status['status'] != 'COMMITTED':
+                status['status'] = 'TIMEOUT'
+            return status
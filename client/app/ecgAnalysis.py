@@ -0,0 +1,359 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+# Beat detector settings, in seconds unless noted
+BASELINE_WINDOW = 0.6       # moving mean removed as baseline wander
+SMOOTH_WINDOW = 0.02        # moving mean that keeps the ECG but removes noise (quality check)
+ENERGY_WINDOW = 0.15        # integration of the squared slope, about one QRS complex
+MERGE_GAP = 0.1             # energy humps closer than this belong to one QRS
+MIN_QRS_WIDTH = 0.03
+REFRACTORY = 0.25           # minimum spacing of two beats
+THRESHOLD_FRACTION = 0.3    # of the 99th percentile of the integrated energy
+
+# RR intervals outside this range are ignored for HR/HRV
+MIN_RR = 0.25
+MAX_RR = 2.5
+MIN_SECONDS = 5
+
+# Quality limits
+FLAT_FRACTION = 0.5         # share of unchanged consecutive samples
+CLIPPED_FRACTION = 0.01     # share of samples held flat at the lead's min or max
+NOISE_RATIO = 0.4           # std of the high-frequency residual / std of the baseline-free signal
+HEART_RATE_RANGE = (30, 220)
+HEART_RATE_TOLERANCE = 10   # bpm between the reported and the measured rate
+
+
+def _moving_mean(signals, window):
+    """Centred moving mean along the last axis, edges padded with the edge value"""
+    window = max(1, int(round(window)))
+    if window == 1:
+        return signals
+    padded = np.pad(signals, ((0, 0), (window // 2, window - 1 - window // 2)), mode='edge')
+    cumulative = np.cumsum(padded, axis=1)
+    cumulative = np.concatenate([np.zeros((signals.shape[0], 1)), cumulative], axis=1)
+    return (cumulative[:, window:] - cumulative[:, :-window]) / window
+
+
+def _per_row(rows, values, count):
+    return np.bincount(rows, weights=values, minlength=count)
+
+
+def analyze_signals(signals, sampling_rate):
+    """
+    Beat detection, heart rate, HRV and quality checks for every row at once
+
+    The detector is a vectorized Pan-Tompkins variant: baseline removal and
+    smoothing, squared slope, moving integration and a per-lead adaptive threshold; a beat is the
+    centre of each region above the threshold.
+
+    Args:
+        signals: float array, leads x samples (all leads of a block share the length)
+        sampling_rate: samples per second
+
+    Returns:
+        dict of per-row arrays: beats, heartRate, sdnnMs, rmssdMs, rrCount and
+        flatline, clipping, noisy, nonfinite flags
+    """
+    count, length = signals.shape
+    nonfinite = ~np.all(np.isfinite(signals), axis=1)
+    if nonfinite.any():
+        row_means = np.nanmean(np.where(np.isfinite(signals), signals, np.nan), axis=1, keepdims=True)
+        signals = np.where(np.isfinite(signals), signals, np.nan_to_num(row_means))
+
+    # Band limit (about 0.5 to 25 Hz at 500 Hz) before the slope, as Pan-Tompkins does
+    highpassed = signals - _moving_mean(signals, BASELINE_WINDOW * sampling_rate)
+    smoothed = _moving_mean(highpassed, SMOOTH_WINDOW * sampling_rate)
+    slope = np.diff(smoothed, axis=1, prepend=smoothed[:, :1])
+    energy = _moving_mean(slope * slope, ENERGY_WINDOW * sampling_rate)
+    threshold = THRESHOLD_FRACTION * np.percentile(energy, 99, axis=1, keepdims=True)
+    above = (energy > threshold) & (threshold > 0)
+
+    # Regions above the threshold, as (row, start, end) in row-major order
+    edges = np.diff(above.astype(np.int8), axis=1, prepend=0, append=0)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    if len(starts):
+        new_region = np.ones(len(starts), dtype=bool)
+        new_region[1:] = (rows[1:] != rows[:-1]) | (starts[1:] - ends[:-1] >= MERGE_GAP * sampling_rate)
+        first = np.flatnonzero(new_region)
+        rows, starts, ends = rows[first], starts[first], np.maximum.reduceat(ends, first)
+        keep = ends - starts >= MIN_QRS_WIDTH * sampling_rate
+        rows, positions = rows[keep], (starts[keep] + ends[keep]) // 2
+        keep = np.ones(len(positions), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (np.diff(positions) >= REFRACTORY * sampling_rate)
+        rows, positions = rows[keep], positions[keep]
+    else:
+        positions = starts
+
+    beats = np.bincount(rows, minlength=count)
+
+    # RR intervals within each row, restricted to the physiologic range
+    same_row = rows[1:] == rows[:-1]
+    rr = np.diff(positions) / sampling_rate
+    rr_rows = rows[1:]
+    valid = same_row & (rr >= MIN_RR) & (rr <= MAX_RR)
+    rr_count = _per_row(rr_rows[valid], np.ones(valid.sum()), count)
+    rr_sum = _per_row(rr_rows[valid], rr[valid], count)
+    rr_squares = _per_row(rr_rows[valid], rr[valid] ** 2, count)
+    successive = valid[1:] & valid[:-1] & (rr_rows[1:] == rr_rows[:-1])
+    successive_squares = _per_row(rr_rows[1:][successive], np.diff(rr)[successive] ** 2, count)
+    successive_count = _per_row(rr_rows[1:][successive], np.ones(successive.sum()), count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_rr = rr_sum / rr_count
+        sdnn = np.sqrt(np.maximum(rr_squares / rr_count - mean_rr ** 2, 0))
+        rmssd = np.sqrt(successive_squares / successive_count)
+        heart_rate = 60.0 / mean_rr
+
+        spread = signals.max(axis=1) - signals.min(axis=1)
+        flatline = (spread == 0) | (np.mean(np.diff(signals, axis=1) == 0, axis=1) > FLAT_FRACTION)
+        # Clipped leads plateau at the rail, so only repeated samples there count
+        # (a quantised signal touching its extremes for a sample or two does not)
+        at_rail = (signals == signals.max(axis=1, keepdims=True)) | (signals == signals.min(axis=1, keepdims=True))
+        at_limits = np.mean(at_rail[:, 1:] & (np.diff(signals, axis=1) == 0), axis=1)
+        clipping = ~flatline & (at_limits > CLIPPED_FRACTION)
+        residual = highpassed - smoothed
+        noisy = ~flatline & (np.std(residual, axis=1) > NOISE_RATIO * np.std(highpassed, axis=1))
+
+    return {
+        'beats': beats,
+        'rrCount': rr_count.astype(int),
+        'heartRate': heart_rate,
+        'sdnnMs': sdnn * 1000,
+        'rmssdMs': rmssd * 1000,
+        'flatline': flatline,
+        'clipping': clipping,
+        'noisy': noisy,
+        'nonfinite': nonfinite
+    }
+
+
+def _lead_issues(stats, row):
+    issues = [name for name in ('flatline', 'clipping', 'noisy', 'nonfinite') if stats[name][row]]
+    heart_rate = stats['heartRate'][row]
+    if stats['rrCount'][row] < 2 or not np.isfinite(heart_rate):
+        issues.append('no_beats')
+    elif not HEART_RATE_RANGE[0] <= heart_rate <= HEART_RATE_RANGE[1]:
+        issues.append('rate_out_of_range')
+    return issues
+
+
+def _rounded(value):
+    return round(float(value), 1) if np.isfinite(value) else None
+
+
+def _summarize(lead_results, seconds, reported_heart_rate):
+    """Record-level result from the per-lead results {name: (stats, row)}"""
+    issues = {name: _lead_issues(stats, row) for name, (stats, row) in lead_results.items()}
+    usable = [name for name, lead_issues in issues.items() if not lead_issues]
+    summary = {
+        'analyzedSeconds': round(seconds, 1),
+        'leads': len(lead_results),
+        'quality': {
+            'ok': bool(usable),
+            'usableLeads': len(usable),
+            'issues': {name: lead_issues for name, lead_issues in issues.items() if lead_issues}
+        }
+    }
+    if seconds < MIN_SECONDS:
+        summary['quality']['ok'] = False
+        summary['quality']['tooShort'] = True
+    if not usable:
+        summary.update({'heartRate': None, 'rhythm': 'Undetermined'})
+        return summary
+
+    # The lead closest to the median rate of the usable leads speaks for the record
+    rates = {name: lead_results[name][0]['heartRate'][lead_results[name][1]] for name in usable}
+    median = float(np.median(list(rates.values())))
+    lead = min(usable, key=lambda name: abs(rates[name] - median))
+    stats, row = lead_results[lead]
+    heart_rate = float(stats['heartRate'][row])
+    variation = stats['sdnnMs'][row] / (60000.0 / heart_rate)
+
+    if variation > 0.15:
+        rhythm = 'Irregular Rhythm'
+    elif heart_rate < 60:
+        rhythm = 'Bradycardia'
+    elif heart_rate > 100:
+        rhythm = 'Tachycardia'
+    else:
+        rhythm = 'Regular Rhythm'
+
+    summary.update({
+        'heartRate': _rounded(heart_rate),
+        'rhythm': rhythm,
+        'lead': lead,
+        'beats': int(stats['beats'][row]),
+        'hrv': {'sdnnMs': _rounded(stats['sdnnMs'][row]), 'rmssdMs': _rounded(stats['rmssdMs'][row])}
+    })
+    if isinstance(reported_heart_rate, (int, float)) and not isinstance(reported_heart_rate, bool):
+        summary['reportedHeartRate'] = reported_heart_rate
+        summary['heartRateMismatch'] = abs(heart_rate - reported_heart_rate) > HEART_RATE_TOLERANCE
+    return summary
+
+
+def analyze_batch(items):
+    """
+    Analyse several records, stacking equal-length leads of all of them into one array
+
+    Args:
+        items: list of (sampling rate, {lead name: 1-D float array}, reported heart rate or None)
+
+    Returns:
+        list: one summary dict per item (see _summarize), or {'error': ...}
+    """
+    groups = {}
+    for index, (sampling_rate, leads, _) in enumerate(items):
+        for name, samples in leads.items():
+            groups.setdefault((sampling_rate, len(samples)), []).append((index, name, samples))
+
+    lead_results = [{} for _ in items]
+    for (sampling_rate, length), members in groups.items():
+        if not sampling_rate or length < 2:
+            continue
+        stats = analyze_signals(np.vstack([samples for _, _, samples in members]).astype(np.float64), sampling_rate)
+        for row, (index, name, _) in enumerate(members):
+            lead_results[index][name] = (stats, row)
+
+    results = []
+    for index, (sampling_rate, leads, reported_heart_rate) in enumerate(items):
+        if not sampling_rate:
+            results.append({'error': 'recording has no samplingRate'})
+        elif not lead_results[index]:
+            results.append({'error': 'recording has no numeric leads'})
+        else:
+            seconds = max(len(samples) for samples in leads.values()) / sampling_rate
+            results.append(_summarize(lead_results[index], seconds, reported_heart_rate))
+    return results
+
+
+class ECGAnalysisPool:
+    """
+    Runs analyze_batch in worker processes so the NumPy work holds no gateway GIL.
+
+    Records submitted within max_wait_seconds of each other (up to
+    max_batch_size) are sent to a worker as one batch. Workers are forked when
+    the pool is created, so create it before the gateway starts its threads.
+    """
+
+    def __init__(self, workers=2, max_batch_size=8, max_wait_seconds=0.05):
+        """
+        Args:
+            workers: analysis processes
+            max_batch_size: records per analyze_batch call
+            max_wait_seconds: time window before a partial batch is sent
+        """
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        # spawn/forkserver would re-import webapp (the __main__ module) in every worker
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self._executor.submit(int).result()
+
+        self._pending = []        # [(item, future), ...]
+        self._first_queued = None
+        self._condition = threading.Condition()
+        self.stats = {'batches': 0, 'records': 0, 'errors': 0, 'busyMs': 0.0}
+
+        self._worker = threading.Thread(target=self._run, name='ecg-analysis-batcher', daemon=True)
+        self._worker.start()
+        print(f"🫀 ECGAnalysisPool started ({workers} processes, batch {max_batch_size})")
+
+    @classmethod
+    def from_env(cls):
+        """Build from ECG_ANALYSIS_* environment variables, None when ECG_ANALYSIS_WORKERS=0"""
+        workers = int(os.getenv('ECG_ANALYSIS_WORKERS', '2'))
+        if workers <= 0:
+            return None
+        return cls(
+            workers=workers,
+            max_batch_size=int(os.getenv('ECG_ANALYSIS_BATCH_SIZE', '8')),
+            max_wait_seconds=float(os.getenv('ECG_ANALYSIS_BATCH_MS', '50')) / 1000
+        )
+
+    def submit(self, sampling_rate, leads, reported_heart_rate=None):
+        """
+        Queue one recording for analysis
+
+        Args:
+            leads: {name: [samples]}; non-numeric leads are skipped
+
+        Returns:
+            Future: summary dict (see analyze_batch)
+        """
+        arrays = {}
+        for name, values in leads.items():
+            try:
+                arrays[name] = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                continue
+            if arrays[name].ndim != 1:
+                del arrays[name]
+
+        future = Future()
+        with self._condition:
+            self._pending.append(((sampling_rate, arrays, reported_heart_rate), future))
+            if self._first_queued is None:
+                self._first_queued = time.monotonic()
+            self._condition.notify()
+        return future
+
+    def analyze(self, sampling_rate, leads, reported_heart_rate=None, timeout=None):
+        """Blocking submit(), raises on timeout or a failed worker"""
+        return self.submit(sampling_rate, leads, reported_heart_rate).result(timeout)
+
+    def get_stats(self):
+        with self._condition:
+            queued = len(self._pending)
+        return dict(self.stats, busyMs=round(self.stats['busyMs'], 1), queued=queued, workers=self.workers)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._pending:
+                        waited = time.monotonic() - self._first_queued
+                        if len(self._pending) >= self.max_batch_size or waited >= self.max_wait_seconds:
+                            break
+                        self._condition.wait(self.max_wait_seconds - waited)
+                    else:
+                        self._condition.wait()
+                batch = self._pending[:self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size:]
+                self._first_queued = time.monotonic() if self._pending else None
+
+            started = time.perf_counter()
+            try:
+                batch_future = self._executor.submit(analyze_batch, [item for item, _ in batch])
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+            batch_future.add_done_callback(lambda done, batch=batch: self._deliver(batch, done, started))
+
+    def _deliver(self, batch, done, started):
+        try:
+            results = done.result()
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        with self._condition:
+            self.stats['batches'] += 1
+            self.stats['records'] += len(batch)
+            self.stats['busyMs'] += (time.perf_counter() - started) * 1000
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _fail(self, batch, error):
+        with self._condition:
+            self.stats['errors'] += len(batch)
+        print(f"❌ ECG analysis batch failed: {error}")
+        for _, future in batch:
+            future.set_exception(error)
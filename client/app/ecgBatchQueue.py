@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ECGBatchQueue:
+    """
+    Groups queued uploads into storeECGDataBatch transactions.
+
+    A batch is flushed when it reaches max_batch_size records or when its oldest
+    record has waited max_wait_seconds, whichever comes first. Records are grouped
+    per user role, because the role decides which identity submits the batch.
+    """
+
+    def __init__(self, fabric_client, max_batch_size=100, max_wait_seconds=2.0, max_concurrent_batches=2):
+        """
+        Args:
+            fabric_client: FabricGatewayClient used to submit the batches
+            max_batch_size: records per transaction (chaincode limit is 1000)
+            max_wait_seconds: time window before a partial batch is flushed
+            max_concurrent_batches: batch transactions in flight at once
+        """
+        self.fabric_client = fabric_client
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        self._pending = {}        # user role -> [(record, future), ...]
+        self._first_queued = {}   # user role -> monotonic time of the oldest pending record
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix='ecg-batch')
+        self.stats = {'batches': 0, 'records': 0, 'failedBatches': 0}
+
+        self._worker = threading.Thread(target=self._run, name='ecg-batch-queue', daemon=True)
+        self._worker.start()
+
+    def enqueue(self, patient_id, ipfs_hash, metadata, patient_owner_client_id, user_role='admin'):
+        """Queue a record, returns a Future with the store_ecg_data-style result"""
+        future = Future()
+        record = {
+            'patientId': patient_id,
+            'ipfsHash': ipfs_hash,
+            'metadata': metadata,
+            'patientOwnerClientID': patient_owner_client_id
+        }
+
+        with self._condition:
+            self._pending.setdefault(user_role, []).append((record, future))
+            self._first_queued.setdefault(user_role, time.monotonic())
+            self._condition.notify()
+        return future
+
+    def flush(self):
+        """Submit every pending record now, regardless of the time window"""
+        with self._condition:
+            due = self._take_batches(force=True)
+        for user_role, items in due:
+            self._executor.submit(self._submit, user_role, items)
+
+    def get_stats(self):
+        with self._condition:
+            queued = sum(len(items) for items in self._pending.values())
+            return dict(self.stats, queued=queued)
+
+    def _take_batches(self, force=False):
+        """Pop the batches that are full or past their window (lock must be held)"""
+        now = time.monotonic()
+        due = []
+        for user_role in list(self._pending):
+            items = self._pending[user_role]
+            expired = now - self._first_queued[user_role] >= self.max_wait_seconds
+            while items and (force or expired or len(items) >= self.max_batch_size):
+                due.append((user_role, items[:self.max_batch_size]))
+                items = items[self.max_batch_size:]
+
+            if items:
+                self._pending[user_role] = items
+                if due and due[-1][0] == user_role:
+                    self._first_queued[user_role] = now
+            else:
+                del self._pending[user_role]
+                del self._first_queued[user_role]
+        return due
+
+    def _next_timeout(self):
+        if not self._first_queued:
+            return None
+        oldest = min(self._first_queued.values())
+        return max(0.0, oldest + self.max_wait_seconds - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._take_batches()
+                while not due:
+                    self._condition.wait(self._next_timeout())
+                    due = self._take_batches()
+
+            for user_role, items in due:
+                self._executor.submit(self._submit, user_role, items)
+
+    def _submit(self, user_role, items):
+        try:
+            result = self.fabric_client.store_ecg_data_batch([record for record, _ in items], user_role=user_role)
+        except Exception as e:
+            result = {'status': 'error', 'error': str(e)}
+
+        failed = result.get('status') != 'success'
+        with self._condition:
+            self.stats['batches'] += 1
+            self.stats['records'] += len(items)
+            if failed:
+                self.stats['failedBatches'] += 1
+
+        if failed:
+            for record, future in items:
+                future.set_result({
+                    'status': 'error',
+                    'message': 'Failed to store ECG batch',
+                    'patientID': record['patientId'],
+                    'error': result.get('error'),
+                    'userRole': user_role
+                })
+            return
+
+        results_by_index = {r.get('index'): r for r in result['results']}
+        for index, (record, future) in enumerate(items):
+            record_result = results_by_index.get(index, {})
+            if record_result.get('status') == 'PENDING_VERIFICATION':
+                future.set_result({
+                    'status': 'success',
+                    'message': 'ECG data stored successfully',
+                    'patientID': record['patientId'],
+                    'ipfsHash': record['ipfsHash'],
+                    'verificationStatus': 'PENDING_VERIFICATION',
+                    'userRole': result['userRole'],
+                    'mspId': result['mspId'],
+                    'blockchainStored': True,
+                    'batchSize': len(items)
+                })
+            else:
+                future.set_result({
+                    'status': 'error',
+                    'message': 'ECG record rejected in batch',
+                    'patientID': record['patientId'],
+                    'error': record_result.get('error', 'No result returned for record'),
+                    'userRole': user_role
+                })
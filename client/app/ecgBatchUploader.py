@@ -0,0 +1,156 @@
+import contextvars
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ipfsClient import IPFSUploadError
+
+
+class ECGBatchUploader:
+    """
+    Bulk upload pipeline behind /ecg/upload/batch.
+
+    Records are pulled lazily from the request, encoded and added to IPFS by a
+    bounded pool of workers, then queued on the FabricGatewayClient batch queue
+    so up to ECGBatchQueue.max_batch_size records share one storeECGDataBatch
+    transaction. At most parallelism records are in the IPFS stage and
+    max_pending records wait for the ledger, so memory stays bounded however
+    long the upload is. One result is yielded per record as soon as it is
+    stored (or failed), in completion order.
+    """
+
+    def __init__(self, ipfs_client, fabric_client, parallelism=16, max_pending=2000):
+        """
+        Args:
+            ipfs_client: IPFSClient used for the adds
+            fabric_client: FabricGatewayClient whose batch queue stores the records
+            parallelism: records encoded and added to IPFS at once
+            max_pending: records added to IPFS and waiting for their ledger batch
+        """
+        self.ipfs_client = ipfs_client
+        self.fabric_client = fabric_client
+        self.parallelism = parallelism
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='ecg-batch-upload')
+
+    @classmethod
+    def from_env(cls, ipfs_client, fabric_client):
+        """Build from ECG_BATCH_UPLOAD_PARALLELISM / ECG_BATCH_UPLOAD_MAX_PENDING"""
+        return cls(
+            ipfs_client,
+            fabric_client,
+            parallelism=int(os.getenv('ECG_BATCH_UPLOAD_PARALLELISM', '16')),
+            max_pending=int(os.getenv('ECG_BATCH_UPLOAD_MAX_PENDING', '2000'))
+        )
+
+    def _add_to_ipfs(self, ecg_data):
+        """commit_upload() result of one record; blocks pinned before a failure are unpinned again"""
+        if not self.ipfs_client.client:
+            raise IPFSUploadError("No IPFS connection", [])
+
+        prepared = self.ipfs_client.prepare_upload(ecg_data)
+        try:
+            return self.ipfs_client.commit_upload(prepared)
+        except IPFSUploadError as e:
+            if e.added:
+                self.ipfs_client.rollback_upload(e.added)
+            raise
+        finally:
+            self.ipfs_client.release_upload(prepared)
+
+    def run(self, records, user_role, default_owner_id):
+        """
+        Upload records, yielding one result dict per record
+
+        Args:
+            records: iterable of (index, record dict or Exception for an unreadable line)
+            user_role: identity that submits the ledger batches
+            default_owner_id: patientOwnerClientID for records that do not set one
+
+        Yields:
+            dict: index, patientId, status ('success' or 'error'), ipfsHash or error
+        """
+        records = iter(records)
+        exhausted = False
+        ipfs_stage = {}        # Future -> (index, patient_id, owner_id, metadata)
+        ledger_stage = {}      # Future -> (index, patient_id, ipfs_hash, CIDs the IPFS add pinned)
+
+        while True:
+            while not exhausted and len(ipfs_stage) < self.parallelism and len(ledger_stage) < self.max_pending:
+                try:
+                    index, record = next(records)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if isinstance(record, Exception):
+                    yield {'index': index, 'status': 'error', 'error': f"Invalid record: {record}"}
+                    continue
+
+                patient_id = record.get('patientId')
+                ecg_data = record.get('ecgData')
+                if not patient_id or not ecg_data:
+                    yield {
+                        'index': index,
+                        'patientId': patient_id,
+                        'status': 'error',
+                        'error': 'Missing required fields',
+                        'required': ['patientId', 'ecgData']
+                    }
+                    continue
+
+                # IPFS adds keep the request's admission priority
+                future = self._executor.submit(contextvars.copy_context().run, self._add_to_ipfs, ecg_data)
+                ipfs_stage[future] = (
+                    index, patient_id,
+                    record.get('patientOwnerClientID') or default_owner_id,
+                    record.get('metadata', {})
+                )
+
+            if exhausted and self.fabric_client.batch_queue is not None:
+                # No more records will join the open batches, do not wait out their window
+                self.fabric_client.batch_queue.flush()
+
+            if not ipfs_stage and not ledger_stage:
+                if exhausted:
+                    return
+                continue
+
+            done, _ = wait(list(ipfs_stage) + list(ledger_stage), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in ipfs_stage:
+                    index, patient_id, owner_id, metadata = ipfs_stage.pop(future)
+                    try:
+                        upload = future.result()
+                    except Exception as e:
+                        yield {'index': index, 'patientId': patient_id, 'status': 'error',
+                               'stage': 'ipfs', 'error': str(e)}
+                        continue
+                    ipfs_hash = upload['ipfsHash']
+                    ledger_future = self.fabric_client.enqueue_ecg_data(
+                        patient_id, ipfs_hash, metadata, owner_id, user_role
+                    )
+                    ledger_stage[ledger_future] = (index, patient_id, ipfs_hash, upload['added'])
+                else:
+                    index, patient_id, ipfs_hash, added = ledger_stage.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'status': 'error', 'error': str(e)}
+                    line = {'index': index, 'patientId': patient_id, 'status': result.get('status'),
+                            'ipfsHash': ipfs_hash}
+                    if result.get('status') == 'success':
+                        line['verificationStatus'] = result.get('verificationStatus')
+                        line['batchSize'] = result.get('batchSize')
+                    else:
+                        line['stage'] = 'ledger'
+                        line['error'] = result.get('error')
+                        if added:
+                            # Nothing on the ledger points at the blocks this record pinned
+                            line['unpinned'] = len(self.ipfs_client.rollback_upload(added))
+                    yield line
+
+    def get_stats(self):
+        return {
+            'parallelism': self.parallelism,
+            'maxPending': self.max_pending,
+            'batchQueue': self.fabric_client.batch_queue.get_stats() if self.fabric_client.batch_queue else None
+        }
@@ -0,0 +1,521 @@
+import json
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # zlib is used instead, zstd payloads then cannot be decoded
+    zstandard = None
+
+# Container layout (all integers little endian):
+#   MAGIC | version (uint8) | header length (uint32) | header JSON | lead blobs
+# The header holds every non-lead field of the record plus one descriptor per
+# lead; the lead blobs follow back to back in descriptor order.
+#
+# Streamed recordings (version 2) cannot know their leads up front, so after the
+# header they carry frames until an empty frame:
+#   frame header length (uint32) | frame header JSON | lead blobs
+MAGIC = b'ECGB'
+VERSION = 1
+STREAM_VERSION = 2
+_PREFIX = struct.Struct('<4sBI')
+_FRAME_LENGTH = struct.Struct('<I')
+
+# Decimal scales tried when packing a lead as integers (1 = already integers)
+QUANTIZE_SCALES = (1, 10, 100, 1000, 10000)
+INT_DTYPES = ('<i2', '<i4')
+
+
+class ECGCodecError(ValueError):
+    pass
+
+
+def default_compression():
+    return 'zstd' if zstandard is not None else 'zlib'
+
+
+def is_binary(raw):
+    """True when raw bytes are an ECG binary container rather than JSON"""
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:len(MAGIC)]) == MAGIC
+
+
+def is_numeric_lead(values):
+    return isinstance(values, list) and len(values) > 0 and all(
+        isinstance(value, (int, float)) and not isinstance(value, bool) for value in values
+    )
+
+
+def _quantize(samples, all_ints):
+    """Smallest integer dtype + scale that reproduces every sample exactly, or None"""
+    if not np.all(np.isfinite(samples)):
+        return None
+    for scale in ((1,) if all_ints else QUANTIZE_SCALES):
+        quantized = np.rint(samples * scale)
+        if not np.array_equal(quantized / scale, samples):
+            continue
+        for dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if quantized.min() >= info.min and quantized.max() <= info.max:
+                return quantized.astype(dtype), scale
+        return None
+    return None
+
+
+def _compress(data, compression, level):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ECGCodecError("zstd compression requested but zstandard is not installed")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if compression == 'zlib':
+        return zlib.compress(data, min(level, 9))
+    return data
+
+
+def _decompress(data, compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ECGCodecError("payload is zstd compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    if compression == 'none':
+        return data
+    raise ECGCodecError(f"unknown compression: {compression}")
+
+
+def _encode_lead(name, values, delta, compression, level, float32):
+    samples = np.asarray(values, dtype='<f8')
+    all_ints = all(isinstance(value, int) for value in values)
+    descriptor = {'name': name, 'count': len(values), 'scale': 1, 'delta': False, 'integer': all_ints}
+
+    quantized = _quantize(samples, all_ints)
+    if quantized is not None:
+        packed, descriptor['scale'] = quantized
+        if delta:
+            # First differences wrap around in the lead's own dtype, cumsum undoes them exactly
+            packed = np.diff(packed.astype('<i8'), prepend=0).astype(packed.dtype)
+            descriptor['delta'] = True
+    elif float32:
+        packed = samples.astype('<f4')
+    else:
+        packed = samples
+
+    descriptor['dtype'] = packed.dtype.str
+    data = packed.tobytes()
+    descriptor['compression'] = 'none'
+    if compression != 'none':
+        compressed = _compress(data, compression, level)
+        if len(compressed) < len(data):
+            data = compressed
+            descriptor['compression'] = compression
+    descriptor['length'] = len(data)
+    return descriptor, data
+
+
+def encode_ecg(ecg_data, delta=True, compression=None, level=3, float32=False):
+    """
+    Pack an ECG record into the binary container
+
+    Numeric leads are stored as int16/int32 when a decimal scale reproduces every
+    sample exactly, otherwise as float64 (or float32 when float32=True, which is lossy).
+
+    Args:
+        ecg_data (dict): ECG record in the JSON upload format
+        delta: store first differences of integer leads
+        compression: 'zstd', 'zlib' or 'none' (default: zstd when installed)
+        level: compression level
+        float32: allow lossy float32 for leads that cannot be quantized
+
+    Returns:
+        bytes: encoded container
+    """
+    if compression is None:
+        compression = default_compression()
+
+    leads = ecg_data.get('leads') or {}
+    header = {
+        'record': {key: value for key, value in ecg_data.items() if key != 'leads'},
+        'samplingRate': (ecg_data.get('recordInfo') or {}).get('samplingRate'),
+        'leads': [],
+        # Leads that are not plain number lists stay JSON so decoding returns them unchanged
+        'jsonLeads': {}
+    }
+
+    blobs = []
+    for name, values in leads.items():
+        if not is_numeric_lead(values):
+            header['jsonLeads'][name] = values
+            continue
+        descriptor, data = _encode_lead(name, values, delta, compression, level, float32)
+        header['leads'].append(descriptor)
+        blobs.append(data)
+
+    header['leadOrder'] = list(leads.keys())
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return b''.join([_PREFIX.pack(MAGIC, VERSION, len(header_bytes)), header_bytes] + blobs)
+
+
+def decode_header(raw):
+    """Header of a container and the offset of the first lead blob"""
+    if len(raw) < _PREFIX.size:
+        raise ECGCodecError("payload too short for an ECG container")
+    magic, version, header_length = _PREFIX.unpack_from(raw)
+    if magic != MAGIC:
+        raise ECGCodecError("not an ECG binary container")
+    if version not in (VERSION, STREAM_VERSION):
+        raise ECGCodecError(f"unsupported ECG container version {version}")
+    offset = _PREFIX.size + header_length
+    header = json.loads(bytes(raw[_PREFIX.size:offset]).decode('utf-8'))
+    header['version'] = version
+    return header, offset
+
+
+def decode_lead_array(descriptor, data):
+    """Samples of one lead as a float64 numpy array"""
+    packed = np.frombuffer(_decompress(data, descriptor['compression']), dtype=descriptor['dtype'])
+    if len(packed) != descriptor['count']:
+        raise ECGCodecError(f"lead {descriptor['name']}: expected {descriptor['count']} samples, got {len(packed)}")
+    if descriptor['delta']:
+        packed = np.cumsum(packed, dtype=packed.dtype)
+    if descriptor['dtype'] in INT_DTYPES:
+        return packed.astype('<f8') / descriptor['scale']
+    return packed.astype('<f8')
+
+
+def decode_ecg(raw):
+    """
+    Decode a binary container back into the JSON record format
+
+    Returns:
+        dict: ECG record with leads as lists of numbers, same shape as the JSON upload
+    """
+    header, offset = decode_header(raw)
+    if header['version'] == STREAM_VERSION:
+        return _decode_stream(header, raw, offset)
+
+    decoded = {}
+    for descriptor in header['leads']:
+        end = offset + descriptor['length']
+        samples = decode_lead_array(descriptor, raw[offset:end])
+        offset = end
+        if descriptor.get('integer'):
+            decoded[descriptor['name']] = samples.astype(np.int64).tolist()
+        else:
+            decoded[descriptor['name']] = samples.tolist()
+    decoded.update(header.get('jsonLeads') or {})
+
+    ecg_data = dict(header['record'])
+    ecg_data['leads'] = {name: decoded[name] for name in header.get('leadOrder', decoded) if name in decoded}
+    return ecg_data
+
+
+def check_container(raw):
+    """
+    Decode every lead of a version 1 container without building sample lists,
+    for containers received from clients
+
+    Returns:
+        dict: header (see decode_header)
+
+    Raises:
+        ECGCodecError: the container is truncated, has trailing bytes or a lead does not decode
+    """
+    header, offset = decode_header(raw)
+    if header['version'] != VERSION:
+        raise ECGCodecError(f"expected an ECG container version {VERSION}, got {header['version']}")
+    try:
+        for descriptor in header['leads']:
+            end = offset + descriptor['length']
+            if end > len(raw):
+                raise ECGCodecError(f"lead {descriptor['name']} is truncated")
+            decode_lead_array(descriptor, raw[offset:end])
+            offset = end
+    except ECGCodecError:
+        raise
+    except Exception as e:
+        raise ECGCodecError(f"invalid lead descriptor: {e}")
+    if offset != len(raw):
+        raise ECGCodecError(f"{len(raw) - offset} unexpected bytes after the last lead")
+    return header
+
+
+def _decode_stream(header, raw, offset):
+    chunks = {}
+    integer = {}
+    while True:
+        if offset + _FRAME_LENGTH.size > len(raw):
+            raise ECGCodecError("streamed ECG container is truncated")
+        (frame_length,) = _FRAME_LENGTH.unpack_from(raw, offset)
+        offset += _FRAME_LENGTH.size
+        if frame_length == 0:
+            break
+        frame = json.loads(bytes(raw[offset:offset + frame_length]).decode('utf-8'))
+        offset += frame_length
+        for descriptor in frame['leads']:
+            end = offset + descriptor['length']
+            chunks.setdefault(descriptor['name'], []).append(decode_lead_array(descriptor, raw[offset:end]))
+            integer[descriptor['name']] = integer.get(descriptor['name'], True) and descriptor.get('integer')
+            offset = end
+
+    ecg_data = dict(header['record'])
+    ecg_data['leads'] = {}
+    for name, parts in chunks.items():
+        samples = np.concatenate(parts)
+        ecg_data['leads'][name] = samples.astype(np.int64).tolist() if integer[name] else samples.tolist()
+    return ecg_data
+
+
+class ECGStreamEncoder:
+    """
+    Encodes a recording chunk by chunk into a streamed (version 2) container
+
+    Only the current chunk is held in memory, so arbitrarily long recordings can be
+    piped straight into IPFS. Call header() first, encode_chunk() per block of
+    samples and end() last; concatenating the returned bytes gives the container.
+    """
+
+    def __init__(self, record, delta=True, compression=None, level=3, float32=False):
+        """
+        Args:
+            record (dict): record fields without 'leads' (patientInfo, recordInfo, ...)
+        """
+        self.record = {key: value for key, value in record.items() if key != 'leads'}
+        self.delta = delta
+        self.compression = compression or default_compression()
+        self.level = level
+        self.float32 = float32
+        self.sample_counts = {}
+        self.chunks = 0
+        self.bytes_out = 0
+
+    def _emit(self, data):
+        self.bytes_out += len(data)
+        return data
+
+    def header(self):
+        header = {
+            'record': self.record,
+            'samplingRate': (self.record.get('recordInfo') or {}).get('samplingRate')
+        }
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        return self._emit(_PREFIX.pack(MAGIC, STREAM_VERSION, len(header_bytes)) + header_bytes)
+
+    def encode_chunk(self, leads):
+        """
+        Args:
+            leads (dict): lead name -> list of samples following the previous chunk
+
+        Returns:
+            bytes: one frame
+        """
+        descriptors = []
+        blobs = []
+        for name, values in leads.items():
+            if not is_numeric_lead(values):
+                raise ECGCodecError(f"lead {name}: streamed leads must be non-empty lists of numbers")
+            descriptor, data = _encode_lead(name, values, self.delta, self.compression, self.level, self.float32)
+            descriptors.append(descriptor)
+            blobs.append(data)
+            self.sample_counts[name] = self.sample_counts.get(name, 0) + len(values)
+
+        self.chunks += 1
+        frame = json.dumps({'leads': descriptors}, separators=(',', ':')).encode('utf-8')
+        return self._emit(b''.join([_FRAME_LENGTH.pack(len(frame)), frame] + blobs))
+
+    def end(self):
+        return self._emit(_FRAME_LENGTH.pack(0))
+
+
+# Chunked layout: every lead is cut into fixed time chunks stored as separate IPFS
+# objects, and a small JSON manifest (the record's CID) lists them so a reader can
+# fetch only the chunks overlapping a time window.
+MANIFEST_FORMAT = 'ecg-chunked-manifest'
+_MANIFEST_PREFIX = b'{"format":"' + MANIFEST_FORMAT.encode() + b'"'
+
+
+def chunk_samples_for(ecg_data, chunk_seconds):
+    """Samples per chunk, or None when the record has no usable sampling rate"""
+    sampling_rate = (ecg_data.get('recordInfo') or {}).get('samplingRate')
+    if not isinstance(sampling_rate, (int, float)) or isinstance(sampling_rate, bool) or sampling_rate <= 0:
+        return None
+    return max(1, int(round(chunk_seconds * sampling_rate)))
+
+
+def needs_chunking(ecg_data, chunk_seconds):
+    """True when at least one numeric lead spans more than one chunk"""
+    chunk_samples = chunk_samples_for(ecg_data, chunk_seconds)
+    if chunk_samples is None:
+        return False
+    return any(
+        is_numeric_lead(values) and len(values) > chunk_samples
+        for values in (ecg_data.get('leads') or {}).values()
+    )
+
+
+def split_ecg(ecg_data, chunk_seconds=10, delta=True, compression=None, level=3, float32=False):
+    """
+    Cut a record into per-lead time chunks
+
+    Returns:
+        (manifest, blobs): manifest dict whose chunk entries still lack 'cid', and a
+        list of (lead name, chunk index, bytes) to upload; fill each chunk's 'cid'
+        and serialize with dump_manifest()
+    """
+    if compression is None:
+        compression = default_compression()
+    chunk_samples = chunk_samples_for(ecg_data, chunk_seconds)
+    if chunk_samples is None:
+        raise ECGCodecError("chunked layout needs recordInfo.samplingRate")
+
+    leads = ecg_data.get('leads') or {}
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': 1,
+        'record': {key: value for key, value in ecg_data.items() if key != 'leads'},
+        'samplingRate': ecg_data['recordInfo']['samplingRate'],
+        'chunkSamples': chunk_samples,
+        'leadOrder': list(leads.keys()),
+        'leads': {},
+        'jsonLeads': {}
+    }
+
+    blobs = []
+    for name, values in leads.items():
+        if not is_numeric_lead(values):
+            manifest['jsonLeads'][name] = values
+            continue
+        chunks = []
+        for index, start in enumerate(range(0, len(values), chunk_samples)):
+            descriptor, data = _encode_lead(
+                name, values[start:start + chunk_samples], delta, compression, level, float32
+            )
+            descriptor['start'] = start
+            del descriptor['name']
+            chunks.append(descriptor)
+            blobs.append((name, index, data))
+        manifest['leads'][name] = {
+            'count': len(values),
+            'integer': all(chunk['integer'] for chunk in chunks),
+            'chunks': chunks
+        }
+    return manifest, blobs
+
+
+def dump_manifest(manifest):
+    # 'format' is the first key so is_manifest() can check a fixed prefix
+    ordered = dict(format=manifest['format'], **{k: v for k, v in manifest.items() if k != 'format'})
+    return json.dumps(ordered, separators=(',', ':')).encode('utf-8')
+
+
+def is_manifest(raw):
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:len(_MANIFEST_PREFIX)]) == _MANIFEST_PREFIX
+
+
+def load_manifest(raw):
+    manifest = json.loads(bytes(raw).decode('utf-8'))
+    if manifest.get('format') != MANIFEST_FORMAT or manifest.get('version') != 1:
+        raise ECGCodecError("unsupported chunked ECG manifest")
+    return manifest
+
+
+def chunks_in_window(manifest, lead, start_sample, end_sample=None):
+    """Chunk entries of a lead overlapping samples [start_sample, end_sample)"""
+    selected = []
+    for chunk in manifest['leads'][lead]['chunks']:
+        chunk_end = chunk['start'] + chunk['count']
+        if chunk_end <= start_sample:
+            continue
+        if end_sample is not None and chunk['start'] >= end_sample:
+            break
+        selected.append(chunk)
+    return selected
+
+
+def join_chunks(chunks_with_data, start_sample=0, end_sample=None, integer=False):
+    """
+    Decode consecutive chunks of one lead and cut them to [start_sample, end_sample)
+
+    Args:
+        chunks_with_data: list of (chunk entry, bytes) in time order
+
+    Returns:
+        list: samples, same number types as the original upload
+    """
+    if not chunks_with_data:
+        return []
+    first_start = chunks_with_data[0][0]['start']
+    samples = np.concatenate([
+        decode_lead_array(dict(chunk, name=f"chunk@{chunk['start']}"), data) for chunk, data in chunks_with_data
+    ])
+    begin = max(0, start_sample - first_start)
+    end = None if end_sample is None else max(begin, end_sample - first_start)
+    samples = samples[begin:end]
+    return samples.astype(np.int64).tolist() if integer else samples.tolist()
+
+
+# Preview pyramid: level k keeps the minimum and maximum of every run of
+# factors[k] samples, interleaved (min, max, min, max, ...) so an overview can be
+# drawn as an envelope. Each level is a regular container next to the chunks.
+PYRAMID_FACTORS = (8, 64, 512)
+
+
+def reduce_minmax(mins, maxs, ratio):
+    """Merge every run of ratio (min, max) pairs into one pair, the last run may be shorter"""
+    if ratio <= 1 or len(mins) == 0:
+        return mins, maxs
+    full = len(mins) // ratio * ratio
+    reduced_mins = [mins[:full].reshape(-1, ratio).min(axis=1)]
+    reduced_maxs = [maxs[:full].reshape(-1, ratio).max(axis=1)]
+    if full < len(mins):
+        reduced_mins.append(mins[full:].min(keepdims=True))
+        reduced_maxs.append(maxs[full:].max(keepdims=True))
+    return np.concatenate(reduced_mins), np.concatenate(reduced_maxs)
+
+
+def build_pyramid(ecg_data, factors=PYRAMID_FACTORS, compression=None, level=3):
+    """
+    Min/max decimated copies of the numeric leads, one container per factor
+
+    Levels are computed from the previous level when the factors divide, so the
+    raw samples are only scanned once. Levels that would not shrink any lead are
+    skipped.
+
+    Returns:
+        list: (factor, bytes) in increasing factor order
+    """
+    leads = {
+        name: np.asarray(values) for name, values in (ecg_data.get('leads') or {}).items()
+        if is_numeric_lead(values)
+    }
+    longest = max((len(values) for values in leads.values()), default=0)
+    current = {name: (values, values) for name, values in leads.items()}
+    current_factor = 1
+
+    levels = []
+    for factor in sorted(set(factors)):
+        if factor <= 1 or factor >= longest:
+            continue
+        if factor % current_factor:
+            current, current_factor = {name: (values, values) for name, values in leads.items()}, 1
+        current = {
+            name: reduce_minmax(mins, maxs, factor // current_factor) for name, (mins, maxs) in current.items()
+        }
+        current_factor = factor
+
+        level_leads = {}
+        for name, (mins, maxs) in current.items():
+            interleaved = np.empty(2 * len(mins), dtype=mins.dtype)
+            interleaved[0::2] = mins
+            interleaved[1::2] = maxs
+            level_leads[name] = interleaved.tolist()
+        level_record = {
+            'recordInfo': {
+                'samplingRate': (ecg_data.get('recordInfo') or {}).get('samplingRate'),
+                'pyramidFactor': factor
+            },
+            'leads': level_leads
+        }
+        levels.append((factor, encode_ecg(level_record, compression=compression, level=level)))
+    return levels
@@ -0,0 +1,162 @@
+import json
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+import ecgCodec
+
+try:
+    import msgpack
+except ImportError:  # application/msgpack is then not offered
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder is used instead
+    orjson = None
+
+# Media types of the ECG API
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+# ecgCodec container: typed, quantized and compressed lead arrays plus a JSON header
+ECG_BINARY = 'application/vnd.ecg-binary'
+
+# Also accepted on requests
+MSGPACK_ALIASES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+def response_types(waveform=False):
+    """Media types a response can be rendered in, JSON first so it stays the default"""
+    offered = [JSON]
+    if msgpack is not None:
+        offered.append(MSGPACK)
+    if waveform:
+        offered.append(ECG_BINARY)
+    return offered
+
+
+def negotiate(accept, waveform=False):
+    """
+    Response media type for an Accept header
+
+    Args:
+        accept: werkzeug MIMEAccept (request.accept_mimetypes)
+        waveform: the response carries lead samples, so ECG_BINARY can be offered
+
+    Returns:
+        str: JSON when the client states no preference or nothing offered matches
+    """
+    return accept.best_match(response_types(waveform), default=JSON)
+
+
+def request_type(content_type):
+    """Normalized media type of a request body (JSON for a missing Content-Type)"""
+    media_type = (content_type or JSON).split(';')[0].strip().lower()
+    if media_type in MSGPACK_ALIASES:
+        return MSGPACK
+    return media_type
+
+
+def _msgpack_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not msgpack serializable")
+
+
+def loads(body, media_type):
+    """
+    Decode a JSON or msgpack request body
+
+    Raises:
+        UnsupportedMediaType: msgpack is not installed or the type is not a document type
+        ValueError: the body does not decode
+    """
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise UnsupportedMediaType("msgpack is not installed on this gateway")
+        try:
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        except (msgpack.UnpackException, msgpack.ExtraData) as e:
+            raise ValueError(f"Invalid msgpack body: {e}")
+    if media_type == JSON or media_type.endswith('+json'):
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    raise UnsupportedMediaType(f"Unsupported request media type {media_type}")
+
+
+def dumps(document, media_type, leads_path=None):
+    """
+    Encode a response document
+
+    Args:
+        document (dict): response body
+        media_type: JSON, MSGPACK or ECG_BINARY
+        leads_path: keys leading to the {lead: samples} dict inside document,
+            required for ECG_BINARY; the leads become the container's lead
+            arrays and the rest of the document its header record, so
+            ecgCodec.decode_ecg() returns the document with 'leads' at the top
+
+    Returns:
+        bytes
+    """
+    if media_type == MSGPACK:
+        return msgpack.packb(document, default=_msgpack_default, use_bin_type=True)
+    if media_type == ECG_BINARY:
+        return ecgCodec.encode_ecg(_split_leads(document, leads_path))
+    if orjson is not None:
+        try:
+            return orjson.dumps(document, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits, the stdlib encoder handles them
+    return json.dumps(document, separators=(',', ':'), default=_msgpack_default).encode('utf-8')
+
+
+def _split_leads(document, leads_path):
+    """Copy of document without the leads at leads_path, plus those leads under 'leads'"""
+    record = dict(document)
+    parent = record
+    for key in leads_path[:-1]:
+        parent[key] = dict(parent[key])
+        parent = parent[key]
+    leads = parent.pop(leads_path[-1])
+    record['leads'] = {
+        name: values.tolist() if isinstance(values, np.ndarray) else values
+        for name, values in leads.items()
+    }
+    return record
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that uses orjson when it is installed
+
+    jsonify() and request.json then encode and parse lead arrays several times
+    faster; values orjson cannot handle go through the default provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(
+                obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            # Indented output for debugging stays with the stdlib encoder
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(f"{self.dumps(obj)}\n", mimetype=self.mimetype)
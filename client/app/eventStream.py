@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import threading
+from collections import deque
+
+from admissionControl import AdmissionRejected
+
+# Chaincode events each role may subscribe to (None: all)
+ROLE_EVENTS = {
+    'admin': None,
+    'patient': ('ECGDataStored', 'VerifyIPFSData', 'ECGVerificationCompleted', 'AccessGranted',
+                'AccessRevoked', 'ECGDataAccessed'),
+    'doctor': ('ECGVerificationCompleted', 'AccessGranted', 'AccessRevoked')
+}
+
+# Roles whose events keep the record's IPFS hash, the others get it stripped
+IPFS_HASH_ROLES = ('admin',)
+
+
+class BlockCheckpoint:
+    """
+    Number of the last block whose events were fully dispatched, persisted so a
+    restarted gateway resumes the block stream there instead of at the newest
+    block (events are delivered at least once).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.block_number = None
+        self._lock = threading.Lock()
+        try:
+            with open(path) as handle:
+                self.block_number = int(json.load(handle)['blockNumber'])
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Ignoring unreadable block checkpoint {path}: {e}")
+
+    @classmethod
+    def from_env(cls):
+        """Build from FABRIC_EVENT_CHECKPOINT ('off' disables), None when disabled"""
+        path = os.getenv('FABRIC_EVENT_CHECKPOINT', 'off')
+        return None if path.lower() == 'off' else cls(path)
+
+    def next_block(self):
+        """First block to request from the peer, None when there is no checkpoint"""
+        return None if self.block_number is None else self.block_number + 1
+
+    def save(self, block_number):
+        with self._lock:
+            if self.block_number is not None and block_number <= self.block_number:
+                return
+            self.block_number = block_number
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w') as handle:
+                    json.dump({'blockNumber': block_number}, handle)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Block checkpoint write failed: {e}")
+
+
+def _event_key(event_id):
+    """Sortable (block, tx, event) tuple of an event ID, None if it is not one of ours"""
+    try:
+        block, tx, index = (int(part) for part in str(event_id).split('-'))
+    except ValueError:
+        return None
+    return block, tx, index
+
+
+def _without_ipfs_hash(payload):
+    """Copy of an event payload without ipfsHash, also in batch records"""
+    if not isinstance(payload, dict):
+        return payload
+    payload = {key: value for key, value in payload.items() if key != 'ipfsHash'}
+    if isinstance(payload.get('records'), list):
+        payload['records'] = [_without_ipfs_hash(record) for record in payload['records']]
+    return payload
+
+
+class EventSubscription:
+    """One stream client: a bounded queue of the events that pass its filter"""
+
+    def __init__(self, patient_ids=None, event_names=None, queue_size=1000, redact=False):
+        self.patient_ids = set(patient_ids) if patient_ids else None
+        self.event_names = set(event_names) if event_names is not None else None
+        self.redact = redact
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def matches(self, event):
+        if self.event_names is not None and event['eventName'] not in self.event_names:
+            return False
+        return self.patient_ids is None or not self.patient_ids.isdisjoint(event['patientIds'])
+
+    def put(self, event):
+        if self.redact:
+            # Events are shared between subscribers, strip a copy
+            event = dict(event, payload=_without_ipfs_hash(event['payload']))
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # The client reconnects with Last-Event-ID and is replayed from the history
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Next event, None when nothing arrived within timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChaincodeEventHub:
+    """
+    Fans chaincode events from committed blocks out to stream subscribers.
+
+    Registered as a FabricGatewayClient block listener, so the gateway keeps a
+    single block subscription however many clients listen. Recent events are
+    kept so a reconnecting client can resume after its Last-Event-ID. Event IDs
+    are "<block>-<tx>-<n>" and stay valid across gateway restarts.
+    """
+
+    def __init__(self, history_size=1000, max_subscribers=100, queue_size=1000):
+        """
+        Args:
+            history_size: recent events kept for Last-Event-ID replay
+            max_subscribers: concurrent stream clients
+            queue_size: undelivered events per client before it is disconnected
+        """
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.stats = {'events': 0, 'delivered': 0, 'overflows': 0, 'rejected': 0}
+
+    @classmethod
+    def from_env(cls):
+        """Build from ECG_EVENT_HISTORY / ECG_EVENT_MAX_SUBSCRIBERS / ECG_EVENT_QUEUE_SIZE"""
+        return cls(
+            history_size=int(os.getenv('ECG_EVENT_HISTORY', '1000')),
+            max_subscribers=int(os.getenv('ECG_EVENT_MAX_SUBSCRIBERS', '100')),
+            queue_size=int(os.getenv('ECG_EVENT_QUEUE_SIZE', '1000'))
+        )
+
+    @staticmethod
+    def _patient_ids(payload):
+        if not isinstance(payload, dict):
+            return []
+        if payload.get('patientID'):
+            return [payload['patientID']]
+        # Batch events (VERIFY_IPFS_DATA_BATCH) list their records
+        return [record.get('patientID') for record in payload.get('records') or [] if isinstance(record, dict)]
+
+    def handle_block(self, block_info):
+        """Block listener"""
+        events = []
+        for tx_index, tx in enumerate(block_info['transactions']):
+            if not tx['valid']:
+                continue
+            for event_index, event in enumerate(tx['chaincodeEvents']):
+                events.append({
+                    'id': f"{block_info['blockNumber']}-{tx_index}-{event_index}",
+                    'blockNumber': block_info['blockNumber'],
+                    'txId': tx['txId'],
+                    'eventName': event['eventName'],
+                    'patientIds': self._patient_ids(event['payload']),
+                    'payload': event['payload']
+                })
+        if not events:
+            return
+
+        with self._lock:
+            self._history.extend(events)
+            subscribers = list(self._subscribers)
+            self.stats['events'] += len(events)
+        for subscription in subscribers:
+            for event in events:
+                if subscription.matches(event) and not subscription.overflowed:
+                    subscription.put(event)
+                    if subscription.overflowed:
+                        with self._lock:
+                            self.stats['overflows'] += 1
+                    else:
+                        with self._lock:
+                            self.stats['delivered'] += 1
+
+    def subscribe(self, user_role='admin', patient_ids=None, event_names=None, last_event_id=None):
+        """
+        Register a stream client
+
+        Args:
+            user_role: limits the events to ROLE_EVENTS[user_role], roles not in
+                IPFS_HASH_ROLES get them without ipfsHash
+            patient_ids: only events about these patients (None: all); the
+                caller checks the role may see them
+            event_names: only these event names (None: all the role may see)
+            last_event_id: replay the kept events after this ID first
+
+        Returns:
+            EventSubscription
+
+        Raises:
+            AdmissionRejected: max_subscribers clients are already connected
+        """
+        allowed = ROLE_EVENTS.get(user_role, ())
+        if allowed is not None:
+            event_names = set(allowed) & set(event_names) if event_names else set(allowed)
+        subscription = EventSubscription(patient_ids, event_names, self.queue_size,
+                                         redact=user_role not in IPFS_HASH_ROLES)
+
+        resume_key = _event_key(last_event_id) if last_event_id else None
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.stats['rejected'] += 1
+                raise AdmissionRejected('events', 'subscriber limit reached', 5)
+            if resume_key is not None:
+                for event in self._history:
+                    if _event_key(event['id']) > resume_key and subscription.matches(event):
+                        subscription.put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                subscribers=len(self._subscribers),
+                maxSubscribers=self.max_subscribers,
+                history=len(self._history),
+                lastEventId=self._history[-1]['id'] if self._history else None
+            )
@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+
+import grpc
+from google.protobuf.timestamp_pb2 import Timestamp
+
+# Importing the backend puts the generated Fabric stubs on sys.path
+import fabricGrpcBackend  # noqa: F401
+from common import common_pb2
+from ledger.rwset import rwset_pb2
+from ledger.rwset.kvrwset import kv_rwset_pb2
+from orderer import ab_pb2
+from peer import chaincode_event_pb2, events_pb2_grpc, proposal_pb2, proposal_response_pb2, transaction_pb2
+
+MAX_BLOCK_NUMBER = 2 ** 64 - 1
+
+
+def parse_block(block):
+    """
+    Reduce a common.Block to the parts the gateway cares about
+
+    Returns:
+        dict: {'blockNumber', 'transactions': [{'txId', 'validationCode', 'valid', 'chaincodeEvents',
+               'writeSet': {namespace: [key, ...]}}]}
+    """
+    tx_filter = block.metadata.metadata[common_pb2.TRANSACTIONS_FILTER]
+    transactions = []
+
+    for tx_index, envelope_bytes in enumerate(block.data.data):
+        envelope = common_pb2.Envelope.FromString(envelope_bytes)
+        payload = common_pb2.Payload.FromString(envelope.payload)
+        channel_header = common_pb2.ChannelHeader.FromString(payload.header.channel_header)
+        if channel_header.type != common_pb2.ENDORSER_TRANSACTION:
+            continue
+
+        code = tx_filter[tx_index] if tx_index < len(tx_filter) else transaction_pb2.NOT_VALIDATED
+        chaincode_events = []
+        write_set = {}
+
+        transaction = transaction_pb2.Transaction.FromString(payload.data)
+        for action in transaction.actions:
+            action_payload = transaction_pb2.ChaincodeActionPayload.FromString(action.payload)
+            response_payload = proposal_response_pb2.ProposalResponsePayload.FromString(
+                action_payload.action.proposal_response_payload
+            )
+            chaincode_action = proposal_pb2.ChaincodeAction.FromString(response_payload.extension)
+
+            if chaincode_action.results:
+                tx_rwset = rwset_pb2.TxReadWriteSet.FromString(chaincode_action.results)
+                for ns_rwset in tx_rwset.ns_rwset:
+                    kv_rwset = kv_rwset_pb2.KVRWSet.FromString(ns_rwset.rwset)
+                    if kv_rwset.writes:
+                        write_set.setdefault(ns_rwset.namespace, []).extend(w.key for w in kv_rwset.writes)
+
+            if chaincode_action.events:
+                event = chaincode_event_pb2.ChaincodeEvent.FromString(chaincode_action.events)
+                if event.event_name:
+                    try:
+                        event_payload = json.loads(event.payload.decode('utf-8'))
+                    except ValueError:
+                        event_payload = event.payload.decode('utf-8', errors='replace')
+                    chaincode_events.append({
+                        'chaincodeId': event.chaincode_id,
+                        'eventName': event.event_name,
+                        'payload': event_payload
+                    })
+
+        transactions.append({
+            'txId': channel_header.tx_id,
+            'validationCode': transaction_pb2.TxValidationCode.Name(code),
+            'valid': code == transaction_pb2.VALID,
+            'chaincodeEvents': chaincode_events,
+            'writeSet': write_set
+        })
+
+    return {'blockNumber': block.header.number, 'transactions': transactions}
+
+
+class BlockEventListener:
+    """
+    Streams committed blocks from one peer's Deliver service in a background
+    thread and hands each parsed block to the registered callbacks.
+    Reconnects with backoff and resumes after the last block it delivered.
+    """
+
+    def __init__(self, backend, peer_name, user_role='admin', start_block=None, max_reconnect_delay=30.0):
+        """
+        Args:
+            backend: FabricGrpcBackend providing channels and signing identities
+            peer_name: peer to stream blocks from
+            user_role: identity used to sign the seek request
+            start_block: first block to deliver (None = newest)
+            max_reconnect_delay: upper bound for the reconnect backoff in seconds
+        """
+        self.backend = backend
+        self.peer_name = peer_name
+        self.user_role = user_role
+        self.next_block = start_block
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.connected = False
+
+        self._callbacks = []
+        self._disconnect_callbacks = []
+        self._stopped = threading.Event()
+        self._call = None
+        self._thread = None
+
+    def add_callback(self, callback):
+        """Register callback(block_info) for every delivered block"""
+        self._callbacks.append(callback)
+
+    def add_disconnect_callback(self, callback):
+        """Register callback() for when the stream drops and blocks may be missed"""
+        self._disconnect_callbacks.append(callback)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='fabric-block-events', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._call is not None:
+            self._call.cancel()
+
+    def _seek_envelope(self):
+        identity = self.backend.get_identity(self.user_role)
+
+        if self.next_block is None:
+            start = ab_pb2.SeekPosition(newest=ab_pb2.SeekNewest())
+        else:
+            start = ab_pb2.SeekPosition(specified=ab_pb2.SeekSpecified(number=self.next_block))
+        seek_info = ab_pb2.SeekInfo(
+            start=start,
+            stop=ab_pb2.SeekPosition(specified=ab_pb2.SeekSpecified(number=MAX_BLOCK_NUMBER)),
+            behavior=ab_pb2.SeekInfo.BLOCK_UNTIL_READY
+        )
+
+        timestamp = Timestamp()
+        timestamp.GetCurrentTime()
+        channel_header = common_pb2.ChannelHeader(
+            type=common_pb2.DELIVER_SEEK_INFO,
+            timestamp=timestamp,
+            channel_id=self.backend.channel_name
+        )
+        signature_header = common_pb2.SignatureHeader(creator=identity.creator, nonce=os.urandom(24))
+        payload_bytes = common_pb2.Payload(
+            header=common_pb2.Header(
+                channel_header=channel_header.SerializeToString(),
+                signature_header=signature_header.SerializeToString()
+            ),
+            data=seek_info.SerializeToString()
+        ).SerializeToString()
+        return common_pb2.Envelope(payload=payload_bytes, signature=identity.sign(payload_bytes))
+
+    def _requests(self, envelope, connection_closed):
+        # Keep the send side open so the peer keeps streaming until we cancel
+        yield envelope
+        while not connection_closed.wait(1.0) and not self._stopped.is_set():
+            pass
+
+    def _run(self):
+        delay = 1.0
+        while not self._stopped.is_set():
+            connection_closed = threading.Event()
+            try:
+                peer = self.backend.peers[self.peer_name]
+                channel = self.backend._get_channel(self.peer_name, peer['address'], peer['tlsRootCert'])
+                stub = events_pb2_grpc.DeliverStub(channel)
+
+                self._call = stub.Deliver(self._requests(self._seek_envelope(), connection_closed))
+                print(f"📡 Block event stream connected to {self.peer_name} (from block {self.next_block or 'newest'})")
+
+                for response in self._call:
+                    if response.WhichOneof('Type') == 'status':
+                        raise RuntimeError(f"Deliver ended with status {common_pb2.Status.Name(response.status)}")
+
+                    block_info = parse_block(response.block)
+                    self.next_block = block_info['blockNumber'] + 1
+                    self.connected = True
+                    delay = 1.0
+                    for callback in self._callbacks:
+                        try:
+                            callback(block_info)
+                        except Exception as e:
+                            print(f"⚠️ Block callback error: {e}")
+
+            except grpc.RpcError as e:
+                if self._stopped.is_set():
+                    return
+                print(f"⚠️ Block event stream error: {e.code().name} {e.details()}")
+            except Exception as e:
+                print(f"⚠️ Block event stream error: {e}")
+            finally:
+                connection_closed.set()
+                if self.connected:
+                    self.connected = False
+                    for callback in self._disconnect_callbacks:
+                        callback()
+
+            self._stopped.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
@@ -1,16 +1,60 @@
 import subprocess
 import json
 import os
-import time
+import re
+import codecs
 import threading
+import time
 from datetime import datetime
 
+import gatewayMetrics
+from commitTracker import CommitTracker
+from ecgBatchQueue import ECGBatchQueue
+from eventStream import BlockCheckpoint
+from ledgerReadCache import LedgerReadCache
+from peerSelector import PeerSelector
+from verificationScheduler import VerificationScheduler
+
 class FabricGatewayClient:
-    def __init__(self, peer_address="10.34.100.126:7051"):
+    # Read-only chaincode functions whose results depend only on the patient record (Args[0])
+    CACHEABLE_QUERIES = ('accessECGData', 'getAuditTrail', 'getDataStatus')
+
+    def __init__(self, peer_address="10.34.100.126:7051", backend=None, ipfs_client=None, analysis_pool=None):
         self.peer_address = peer_address
         self.orderer_address = "10.34.100.121:7050"
         self.channel_name = "ecgchannel"
         self.chaincode_name = "ecgcontract"
+        self.orderer_tls_ca = "/app/crypto-config/ordererOrganizations/example.com/orderers/orderer.example.com/msp/tlscacerts/tlsca.example.com-cert.pem"
+
+        # Peer table shared by the CLI and gRPC backends
+        self.peers = {
+            'peer0.org1.example.com': {
+                'address': '10.34.100.126:7051',
+                'mspId': 'Org1MSP',
+                'tlsRootCert': '/app/crypto-config/peerOrganizations/org1.example.com/peers/peer0.org1.example.com/tls/ca.crt'
+            },
+            'peer1.org1.example.com': {
+                'address': '10.34.100.128:8051',
+                'mspId': 'Org1MSP',
+                'tlsRootCert': '/app/crypto-config/peerOrganizations/org1.example.com/peers/peer1.org1.example.com/tls/ca.crt'
+            },
+            'peer0.org2.example.com': {
+                'address': '10.34.100.114:9051',
+                'mspId': 'Org2MSP',
+                'tlsRootCert': '/app/crypto-config/peerOrganizations/org2.example.com/peers/peer0.org2.example.com/tls/ca.crt'
+            },
+            'peer1.org2.example.com': {
+                'address': '10.34.100.116:10051',
+                'mspId': 'Org2MSP',
+                'tlsRootCert': '/app/crypto-config/peerOrganizations/org2.example.com/peers/peer1.org2.example.com/tls/ca.crt'
+            }
+        }
+        self.endorsing_peers = ['peer0.org1.example.com', 'peer0.org2.example.com']
+
+        # Latency/health tracking over all peers: queries are spread, submits use the
+        # fastest healthy peer per org, failed peers are skipped for a cooldown
+        self.peer_selector = PeerSelector(self.peers)
+        self.max_peer_attempts = 3
         
         # Identity mapping table - NO HARDCODE
         self.identity_mappings = {
@@ -31,15 +75,73 @@ class FabricGatewayClient:
             }
         }
         
+        # Backend: 'cli' forks the peer binary, 'grpc' keeps persistent connections,
+        # 'local' emulates the contract in-process for offline load testing
+        self.backend_name = (backend or os.getenv('FABRIC_BACKEND', 'cli')).lower()
+        self.backend = self._create_backend(self.backend_name)
+        # Peer CLI invokes return once the orderer accepted the transaction and commits
+        # arrive through block events; 'true' makes every invoke wait for its commit
+        # instead (fallback when the block stream cannot be used)
+        self.cli_wait_for_event = os.getenv('FABRIC_CLI_WAIT_FOR_EVENT', 'false').lower() == 'true'
+
+        # Created on first enqueue_ecg_data() call
+        self.batch_queue = None
+        self._batch_queue_lock = threading.Lock()
+
+        # Bounded verification pool, replaces the per-upload sleep threads
+        self.verification_scheduler = VerificationScheduler(self, ipfs_client, analysis_pool=analysis_pool)
+
+        # Commit status of submitted transactions, fed by block events or the peer CLI
+        self.commit_tracker = CommitTracker(on_commit=gatewayMetrics.observe_commit)
+        self.block_event_listener = None
+        self.block_checkpoint = None
+        self._block_listeners = []
+
+        # Query results, invalidated by the write sets of committed blocks
+        self.read_cache = LedgerReadCache(max_entries=int(os.getenv('LEDGER_CACHE_SIZE', '4096')))
+        self.start_block_events()
+
         print("🔧 FabricGatewayClient initialized with dynamic identity mapping")
         print(f"🔗 Peer: {self.peer_address}")
         print(f"🔗 Orderer: {self.orderer_address}")
+        print(f"🔗 Backend: {self.backend_name}")
+
+    def _create_backend(self, backend_name):
+        """Create the chaincode execution backend (None means peer CLI)"""
+        if backend_name == 'cli':
+            return None
+        if backend_name == 'grpc':
+            from fabricGrpcBackend import FabricGrpcBackend
+
+            query_peer = next(
+                (name for name, peer in self.peers.items() if peer['address'] == self.peer_address),
+                self.endorsing_peers[0]
+            )
+            return FabricGrpcBackend(
+                channel_name=self.channel_name,
+                chaincode_name=self.chaincode_name,
+                peers=self.peers,
+                endorsing_peers=self.endorsing_peers,
+                query_peer=query_peer,
+                orderer={
+                    'name': 'orderer.example.com',
+                    'address': self.orderer_address,
+                    'tlsRootCert': self.orderer_tls_ca
+                },
+                identity_mappings=self.identity_mappings,
+                peer_selector=self.peer_selector
+            )
+        if backend_name == 'local':
+            from localLedgerBackend import LocalLedgerBackend
 
-    def get_fabric_env(self, user_role='admin'):
+            return LocalLedgerBackend.from_env(self.chaincode_name, self.identity_mappings)
+        raise ValueError(f"Unknown Fabric backend: {backend_name}")
+
+    def get_fabric_env(self, user_role='admin', peer_name=None):
         """Get Fabric environment variables berdasarkan user role"""
         mapping = self.identity_mappings.get(user_role, self.identity_mappings['admin'])
         
-        return {
+        env = {
             'FABRIC_CFG_PATH': '/app/config',
             'CORE_PEER_LOCALMSPID': mapping['msp_id'],
             'CORE_PEER_TLS_ROOTCERT_FILE': '/app/crypto-config/peerOrganizations/org1.example.com/peers/peer0.org1.example.com/tls/ca.crt',
@@ -47,136 +149,577 @@ class FabricGatewayClient:
             'CORE_PEER_ADDRESS': self.peer_address,
             'CORE_PEER_TLS_ENABLED': 'true'
         }
+        if peer_name is not None:
+            env['CORE_PEER_ADDRESS'] = self.peers[peer_name]['address']
+            env['CORE_PEER_TLS_ROOTCERT_FILE'] = self.peers[peer_name]['tlsRootCert']
+        return env
 
-    def _execute_peer_command_with_env(self, chaincode_call, is_query=False, user_role='admin'):
-        """Execute peer command dengan dynamic identity"""
-        try:
-            # Get environment berdasarkan user role
-            fabric_env = self.get_fabric_env(user_role)
-            
-            # Build command
-            if is_query:
-                cmd = ["peer", "chaincode", "query"]
-            else:
-                cmd = ["peer", "chaincode", "invoke"]
-                cmd.extend([
-                    "-o", self.orderer_address,
-                    "--ordererTLSHostnameOverride", "orderer.example.com",
-                    "--tls",
-                    "--cafile", "/app/crypto-config/ordererOrganizations/example.com/orderers/orderer.example.com/msp/tlscacerts/tlsca.example.com-cert.pem"
-                ])
-            
+    def _build_peer_command(self, chaincode_call, is_query=False, user_role='admin', peer_names=None):
+        """
+        Build peer CLI command and environment for a chaincode call
+
+        Args:
+            peer_names: query peer ([name]) or endorsing peers; defaults to the static configuration
+        """
+        if peer_names is None and not is_query:
+            peer_names = self.endorsing_peers
+        
+        # Get environment berdasarkan user role
+        fabric_env = self.get_fabric_env(user_role, peer_names[0] if is_query and peer_names else None)
+        
+        # Build command
+        if is_query:
+            cmd = ["peer", "chaincode", "query"]
+        else:
+            cmd = ["peer", "chaincode", "invoke"]
             cmd.extend([
-                "-C", self.channel_name,
-                "-n", self.chaincode_name,
-                "-c", json.dumps(chaincode_call, separators=(',', ':'))
+                "-o", self.orderer_address,
+                "--ordererTLSHostnameOverride", "orderer.example.com",
+                "--tls",
+                "--cafile", self.orderer_tls_ca
             ])
-            
-            if not is_query:
+            if self.cli_wait_for_event:
+                cmd.extend(["--waitForEvent", "--waitForEventTimeout", "60s"])
+        
+        cmd.extend([
+            "-C", self.channel_name,
+            "-n", self.chaincode_name,
+            "-c", json.dumps(chaincode_call, separators=(',', ':'))
+        ])
+        
+        if not is_query:
+            for peer_name in peer_names:
                 cmd.extend([
-                    "--peerAddresses", "10.34.100.126:7051",
-                    "--tlsRootCertFiles", "/app/crypto-config/peerOrganizations/org1.example.com/peers/peer0.org1.example.com/tls/ca.crt",
-                    "--peerAddresses", "10.34.100.114:9051", 
-                    "--tlsRootCertFiles", "/app/crypto-config/peerOrganizations/org2.example.com/peers/peer0.org2.example.com/tls/ca.crt"
+                    "--peerAddresses", self.peers[peer_name]['address'],
+                    "--tlsRootCertFiles", self.peers[peer_name]['tlsRootCert']
                 ])
+        
+        print(f"🔧 Using identity: {fabric_env['CORE_PEER_LOCALMSPID']} - {self.identity_mappings[user_role]['description']}")
+        print(f"🔧 MSP Path: {fabric_env['CORE_PEER_MSPCONFIGPATH'].split('/')[-2]}")
+        
+        # Merge environment
+        full_env = os.environ.copy()
+        full_env.update(fabric_env)
+        
+        return cmd, full_env
+
+    def _parse_peer_result(self, returncode, stdout, stderr, user_role, started=None):
+        """
+        Turn peer CLI output into the common result dict
+
+        The CLI does not report when endorsement ended, so endorseMs and orderMs
+        stay None; submitMs is the whole invoke (endorse + order) and commitMs
+        follows from the block event. With FABRIC_CLI_WAIT_FOR_EVENT the invoke
+        also spans the commit, so neither is recorded.
+        """
+        print(f"📤 Return code: {returncode}")
+        
+        # SUCCESS DETECTION
+        is_success = False
+        payload_data = None
+        tx_id = None
+        validation_code = None
+        
+        # Printed by --waitForEvent once the peer has committed the block
+        commit_match = re.search(r'txid \[(\w+)\] committed with status \((\w+)\)', stderr)
+        if commit_match:
+            tx_id, validation_code = commit_match.group(1), commit_match.group(2)
+        
+        if returncode == 0:
+            if validation_code is not None and validation_code != 'VALID':
+                print(f"❌ Transaction {tx_id} committed as {validation_code}")
+            elif 'Chaincode invoke successful' in stderr or 'status:200' in stderr:
+                is_success = True
+                payload_data = self._parse_invoke_payload(stderr)
+                if tx_id is None and isinstance(payload_data, dict):
+                    # The contract returns its txId, the commit is then seen in a block event
+                    tx_id = payload_data.get('txId')
+                print(f"✅ SUCCESS: {user_role} operation completed")
+            elif stdout.strip():
+                is_success = True
+                try:
+                    payload_data = json.loads(stdout.strip())
+                except:
+                    payload_data = stdout.strip()
+        
+        ordered_at = time.time()
+        return {
+            'success': is_success,
+            'output': stdout,
+            'error': stderr,
+            'returnCode': returncode,
+            'payload': payload_data,
+            'userRole': user_role,
+            'mspId': self.identity_mappings[user_role]['msp_id'],
+            'txId': tx_id,
+            'validationCode': validation_code,
+            'timings': {
+                'startedAt': started or ordered_at,
+                'orderedAt': ordered_at,
+                'endorseMs': None,
+                'orderMs': None,
+                'submitMs': round((ordered_at - started) * 1000, 1)
+                if started is not None and validation_code is None else None
+            }
+        }
+
+    def _parse_invoke_payload(self, stderr):
+        """Extract the chaincode return value from 'peer chaincode invoke' stderr"""
+        match = re.search(r'payload:"((?:[^"\\]|\\.)*)"', stderr)
+        if not match:
+            return None
+        try:
+            # The payload is printed as an escaped string with octal escapes for UTF-8 bytes
+            raw = codecs.decode(match.group(1), 'unicode_escape').encode('latin-1').decode('utf-8')
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _select_cli_peers(self, is_query, exclude):
+        """Peers for one CLI attempt: one query peer, or one endorser per org"""
+        if is_query:
+            peer_name = self.peer_selector.select_query_peer(exclude)
+            return [peer_name] if peer_name else []
+        return self.peer_selector.select_endorsers(exclude)
+
+    def _finish_cli_attempt(self, peer_names, is_query, started, result):
+        """
+        Record a CLI attempt with the peer selector
+
+        Returns:
+            str: peer to exclude and retry without, or None when the result is final
+        """
+        error = result.get('error')
+        failed = None
+        if not result.get('success') and PeerSelector.is_connectivity_error(error):
+            # An invoke is only retried when the error names the endorser that failed,
+            # so a transaction that may have reached the orderer is never sent twice
+            failed = peer_names[0] if is_query else self.peer_selector.peer_for_address(error)
+            if failed not in peer_names:
+                failed = None
+        
+        for peer_name in peer_names:
+            # Invoke time includes ordering and commit, it says nothing about the peer
+            self.peer_selector.finish(peer_name, started, peer_name != failed, error, record_latency=is_query)
+        return failed
+
+    def _execute_peer_command_with_env(self, chaincode_call, is_query=False, user_role='admin'):
+        """Execute peer command dengan dynamic identity, failing over to other peers"""
+        result = {'success': False, 'error': 'No peer available', 'userRole': user_role}
+        excluded = set()
+        
+        for attempt in range(self.max_peer_attempts):
+            peer_names = self._select_cli_peers(is_query, excluded)
+            if not peer_names:
+                break
+            
+            started = min(self.peer_selector.start(peer_name) for peer_name in peer_names)
+            try:
+                cmd, full_env = self._build_peer_command(chaincode_call, is_query, user_role, peer_names)
+                
+                print(f"🔄 Executing command as {user_role} on {', '.join(peer_names)}...")
+                started_at = time.time()
+                
+                # Execute command
+                completed = subprocess.run(
+                    cmd,
+                    env=full_env,
+                    capture_output=True,
+                    text=True,
+                    timeout=120
+                )
+                
+                result = self._parse_peer_result(completed.returncode, completed.stdout, completed.stderr, user_role, started_at)
+                
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'userRole': user_role}
+            
+            failed = self._finish_cli_attempt(peer_names, is_query, started, result)
+            if failed is None:
+                break
+            excluded.add(failed)
+            print(f"🔁 Peer {failed} failed, retrying on another peer")
+        
+        return result
+
+    def _execute_chaincode(self, chaincode_call, is_query=False, user_role='admin'):
+        """Run a chaincode call on the configured backend"""
+        started = time.perf_counter()
+        cached, cache_ticket = self._cache_lookup(chaincode_call, is_query, user_role)
+        if cached is not None:
+            self._observe_execution(chaincode_call, is_query, user_role, cached, started)
+            return cached
+        
+        if self.backend is None:
+            result = self._execute_peer_command_with_env(chaincode_call, is_query=is_query, user_role=user_role)
+        else:
+            result = self.backend.execute(chaincode_call, is_query=is_query, user_role=user_role)
+        
+        self._observe_execution(chaincode_call, is_query, user_role, result, started)
+        self._cache_store(cache_ticket, result)
+        return self._track_result(chaincode_call, is_query, result)
+
+    def _observe_execution(self, chaincode_call, is_query, user_role, result, started):
+        gatewayMetrics.observe_chaincode(chaincode_call, is_query, user_role, self.backend_name,
+                                         result, time.perf_counter() - started)
+
+    def _cache_active(self):
+        # Without a live block stream, writes by other clients would go unnoticed
+        listener = self.block_event_listener
+        return listener is not None and listener.connected
+
+    def _cache_lookup(self, chaincode_call, is_query, user_role):
+        """
+        Returns:
+            tuple: (cached result or None, ticket for _cache_store or None)
+        """
+        if not is_query or chaincode_call['function'] not in self.CACHEABLE_QUERIES or not self._cache_active():
+            return None, None
+        
+        key = LedgerReadCache.make_key(chaincode_call, user_role)
+        token = self.read_cache.begin()
+        cached = self.read_cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True), None
+        return None, (key, chaincode_call['Args'][:1], token)
+
+    def _cache_store(self, cache_ticket, result):
+        if cache_ticket is not None and result.get('success'):
+            key, ledger_keys, token = cache_ticket
+            self.read_cache.put(key, result, ledger_keys, token)
+
+    def _written_keys(self, chaincode_call):
+        """Patient keys a submitted transaction writes"""
+        if chaincode_call['function'] == 'storeECGDataBatch':
+            try:
+                return [record.get('patientID') for record in json.loads(chaincode_call['Args'][0])]
+            except (ValueError, IndexError, AttributeError):
+                return []
+        return chaincode_call.get('Args', [])[:1]
+
+    def _track_result(self, chaincode_call, is_query, result):
+        """Register submitted transactions with the commit tracker"""
+        if not is_query and result.get('success'):
+            # Our own writes are dropped right away, the block event confirms it later
+            self.read_cache.invalidate(self._written_keys(chaincode_call))
+            
+            if result.get('txId'):
+                self.commit_tracker.track_submit(result['txId'], chaincode_call['function'], result.get('timings'))
+                if result.get('validationCode'):
+                    # Peer CLI already waited for the commit event
+                    self.commit_tracker.record_commit(result['txId'], result['validationCode'])
+        return result
+
+    def wait_for_commit(self, tx_id, timeout=30):
+        """
+        Wait until a submitted transaction is committed
+
+        Returns:
+            dict: txId, status (COMMITTED|PENDING|TIMEOUT|UNKNOWN), validationCode,
+                  blockNumber and endorse/order (peer CLI: submit)/commit timings in ms
+        """
+        return self.commit_tracker.wait_for_commit(tx_id, timeout)
+
+    def add_block_listener(self, callback):
+        """Register callback(block_info) for committed blocks"""
+        self._block_listeners.append(callback)
+
+    def start_block_events(self):
+        """
+        Start receiving committed blocks (gRPC and peer CLI: query peer Deliver
+        stream, local: in-process)
+        """
+        if self.block_event_listener is not None:
+            return
+        if self.backend_name in ('grpc', 'cli'):
+            try:
+                from fabricBlockEvents import BlockEventListener
+
+                # The peer CLI has no block stream, a gRPC backend is only used for Deliver
+                events_backend = self.backend or self._create_backend('grpc')
+            except ImportError as e:
+                print(f"⚠️ Block events unavailable ({e}); commits are only tracked with FABRIC_CLI_WAIT_FOR_EVENT=true")
+                return
+
+            # Resume after the last dispatched block so events emitted while down are not lost
+            self.block_checkpoint = BlockCheckpoint.from_env()
+            start_block = self.block_checkpoint.next_block() if self.block_checkpoint else None
+            self.block_event_listener = BlockEventListener(events_backend, events_backend.query_peer,
+                                                           start_block=start_block)
+        elif self.backend_name == 'local':
+            # The local ledger delivers its own blocks
+            self.block_event_listener = self.backend
+        else:
+            return
+        
+        self.block_event_listener.add_callback(self._dispatch_block)
+        self.block_event_listener.add_disconnect_callback(self.read_cache.clear)
+        self.block_event_listener.start()
+
+    def _dispatch_block(self, block_info):
+        self.read_cache.handle_block(block_info, self.chaincode_name)
+        self.commit_tracker.handle_block(block_info)
+        
+        for tx in block_info['transactions']:
+            if not tx['valid']:
+                continue
+            for event in tx['chaincodeEvents']:
+                self.verification_scheduler.handle_chaincode_event(event['eventName'], event['payload'])
+        
+        for callback in self._block_listeners:
+            try:
+                callback(block_info)
+            except Exception as e:
+                print(f"⚠️ Block listener error: {e}")
+        
+        if self.block_checkpoint is not None:
+            self.block_checkpoint.save(block_info['blockNumber'])
+
+    def _store_ecg_data_call(self, patient_id, ipfs_hash, metadata, patient_owner_client_id, timestamp=None):
+        """Build storeECGData chaincode call (timestamp defaults to now)"""
+        if isinstance(metadata, dict):
+            metadata_str = json.dumps(metadata, separators=(',', ':'))
+        else:
+            metadata_str = json.dumps({}, separators=(',', ':'))
+        
+        return {
+            "function": "storeECGData",
+            "Args": [
+                patient_id,
+                ipfs_hash, 
+                timestamp or datetime.now().isoformat(),
+                metadata_str,
+                patient_owner_client_id
+            ]
+        }
+
+    def _store_ecg_data_response(self, result, patient_id, ipfs_hash):
+        if result['success']:
+            return {
+                'status': 'success',
+                'message': 'ECG data stored successfully',
+                'patientID': patient_id,
+                'ipfsHash': ipfs_hash,
+                'verificationStatus': 'PENDING_VERIFICATION',
+                'userRole': result['userRole'],
+                'mspId': result['mspId'],
+                'blockchainStored': True,
+                'returnCode': result['returnCode'],
+                'txId': result.get('txId')
+            }
+        else:
+            return {
+                'status': 'error',
+                'message': 'Failed to store ECG data',
+                'error': result['error'],
+                'userRole': result['userRole']
+            }
+
+    def _grant_access_response(self, result, patient_id, doctor_client_id, user_role):
+        if result['success']:
+            return {
+                'status': 'success',
+                'message': f'Access granted by {user_role}',
+                'patientID': patient_id,
+                'grantedTo': doctor_client_id,
+                'userRole': result['userRole'],
+                'mspId': result['mspId'],
+                'txId': result.get('txId')
+            }
+        else:
+            return {
+                'status': 'error',
+                'error': result['error'],
+                'userRole': result['userRole']
+            }
+
+    def _access_ecg_data_response(self, result, patient_id, user_role):
+        if result['success']:
+            return {
+                'status': 'success',
+                'message': f'ECG data accessed by {user_role}',
+                'patientID': patient_id,
+                'data': result.get('payload') or result['output'],
+                'userRole': result['userRole'],
+                'mspId': result['mspId']
+            }
+        else:
+            return {
+                'status': 'error',
+                'error': result['error'],
+                'userRole': result['userRole']
+            }
+
+    def _revoke_access_response(self, result, patient_id, doctor_client_id, user_role):
+        if result['success']:
+            return {
+                'status': 'success',
+                'message': f'Access revoked by {user_role}',
+                'patientID': patient_id,
+                'revokedFrom': doctor_client_id,
+                'userRole': result['userRole'],
+                'mspId': result['mspId'],
+                'txId': result.get('txId')
+            }
+        else:
+            return {
+                'status': 'error',
+                'error': result['error'],
+                'userRole': result['userRole']
+            }
+
+    def _audit_trail_response(self, result, patient_id, user_role):
+        if result['success']:
+            return {
+                'status': 'success',
+                'message': f'Audit trail retrieved by {user_role}',
+                'patientID': patient_id,
+                'auditTrail': result.get('payload') or result['output'],
+                'userRole': result['userRole'],
+                'mspId': result['mspId']
+            }
+        else:
+            return {
+                'status': 'error',
+                'error': result['error'],
+                'userRole': result['userRole']
+            }
+
+    def _data_status_response(self, result, patient_id, user_role):
+        if result['success']:
+            return {
+                'status': 'success',
+                'patientID': patient_id,
+                'dataStatus': result.get('payload') or result['output'],
+                'userRole': result['userRole'],
+                'mspId': result['mspId'],
+                'cached': result.get('cached', False)
+            }
+        else:
+            return {
+                'status': 'error',
+                'error': result['error'],
+                'userRole': result['userRole']
+            }
+
+    def _confirm_ecg_data_response(self, result, patient_id, is_valid):
+        if result['success']:
+            return {
+                'status': 'success', 
+                'message': 'ECG data verification confirmed',
+                'patientID': patient_id,
+                'verificationResult': 'CONFIRMED' if is_valid else 'FAILED',
+                'txId': result.get('txId')
+            }
+        else:
+            return {'status': 'error', 'error': result['error']}
+
+    def store_ecg_data(self, patient_id, ipfs_hash, metadata, patient_owner_client_id, user_role='admin',
+                       timestamp=None):
+        """Store ECG data dengan dynamic identity (timestamp becomes the record's createdAt)"""
+        try:
+            print(f"📊 STORE_ECG_DATA: Patient {patient_id} by {user_role}")
             
-            print(f"🔧 Using identity: {fabric_env['CORE_PEER_LOCALMSPID']} - {self.identity_mappings[user_role]['description']}")
-            print(f"🔧 MSP Path: {fabric_env['CORE_PEER_MSPCONFIGPATH'].split('/')[-2]}")
-            
-            # Merge environment
-            full_env = os.environ.copy()
-            full_env.update(fabric_env)
-            
-            print(f"🔄 Executing command as {user_role}...")
-            
-            # Execute command
-            result = subprocess.run(
-                cmd,
-                env=full_env,
-                capture_output=True,
-                text=True,
-                timeout=120
+            chaincode_call = self._store_ecg_data_call(
+                patient_id, ipfs_hash, metadata, patient_owner_client_id, timestamp
             )
+            result = self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
             
-            print(f"📤 Return code: {result.returncode}")
-            
-            # SUCCESS DETECTION
-            is_success = False
-            payload_data = None
-            
-            if result.returncode == 0:
-                if 'Chaincode invoke successful' in result.stderr or 'status:200' in result.stderr:
-                    is_success = True
-                    print(f"✅ SUCCESS: {user_role} operation completed")
-                elif result.stdout.strip():
-                    is_success = True
-                    try:
-                        payload_data = json.loads(result.stdout.strip())
-                    except:
-                        payload_data = result.stdout.strip()
-            
-            return {
-                'success': is_success,
-                'output': result.stdout,
-                'error': result.stderr,
-                'returnCode': result.returncode,
-                'payload': payload_data,
-                'userRole': user_role,
-                'mspId': fabric_env['CORE_PEER_LOCALMSPID']
-            }
+            if result['success']:
+                print(f"✅ STORE_ECG_DATA: Success by {user_role}")
+                self.start_verification(patient_id, ipfs_hash, result.get('txId'), patient_owner_client_id)
             
+            return self._store_ecg_data_response(result, patient_id, ipfs_hash)
+                
         except Exception as e:
-            return {'success': False, 'error': str(e), 'userRole': user_role}
+            return {'status': 'error', 'error': str(e)}
+
+    def store_ecg_data_batch(self, records, user_role='admin'):
+        """
+        Store many ECG records in one storeECGDataBatch transaction
 
-    def store_ecg_data(self, patient_id, ipfs_hash, metadata, patient_owner_client_id, user_role='admin'):
-        """Store ECG data dengan dynamic identity"""
+        Args:
+            records (list): dicts with patientId, ipfsHash, metadata, patientOwnerClientID
+            user_role: identity used to submit the batch
+
+        Returns:
+            dict: batch status with one result per record (same order as input)
+        """
         try:
-            print(f"📊 STORE_ECG_DATA: Patient {patient_id} by {user_role}")
+            print(f"📦 STORE_ECG_DATA_BATCH: {len(records)} records by {user_role}")
             
-            if isinstance(metadata, dict):
-                metadata_str = json.dumps(metadata, separators=(',', ':'))
-            else:
-                metadata_str = json.dumps({}, separators=(',', ':'))
+            batch = [{
+                'patientID': record.get('patientId'),
+                'ipfsHash': record.get('ipfsHash'),
+                'timestamp': record.get('timestamp') or datetime.now().isoformat(),
+                'metadata': record.get('metadata') if isinstance(record.get('metadata'), dict) else {},
+                'patientOwnerClientID': record.get('patientOwnerClientID')
+            } for record in records]
             
             chaincode_call = {
-                "function": "storeECGData",
-                "Args": [
-                    patient_id,
-                    ipfs_hash, 
-                    datetime.now().isoformat(),
-                    metadata_str,
-                    patient_owner_client_id
-                ]
+                "function": "storeECGDataBatch",
+                "Args": [json.dumps(batch, separators=(',', ':'))]
             }
             
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=False, user_role=user_role)
+            result = self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
             
-            if result['success']:
-                print(f"✅ STORE_ECG_DATA: Success by {user_role}")
-                self.start_verification(patient_id, ipfs_hash)
-                
-                return {
-                    'status': 'success',
-                    'message': 'ECG data stored successfully',
-                    'patientID': patient_id,
-                    'ipfsHash': ipfs_hash,
-                    'verificationStatus': 'PENDING_VERIFICATION',
-                    'userRole': result['userRole'],
-                    'mspId': result['mspId'],
-                    'blockchainStored': True,
-                    'returnCode': result['returnCode']
-                }
-            else:
+            if not result['success']:
                 return {
                     'status': 'error',
-                    'message': 'Failed to store ECG data',
+                    'message': 'Failed to store ECG batch',
                     'error': result['error'],
                     'userRole': result['userRole']
                 }
-                
+            
+            payload = result.get('payload') if isinstance(result.get('payload'), dict) else {}
+            results = payload.get('results')
+            if results is None:
+                # Backend did not return the chaincode payload; the whole batch was accepted
+                results = [{
+                    'index': index,
+                    'patientID': record['patientID'],
+                    'ipfsHash': record['ipfsHash'],
+                    'status': 'PENDING_VERIFICATION'
+                } for index, record in enumerate(batch)]
+            
+            for record_result in results:
+                if record_result.get('status') == 'PENDING_VERIFICATION':
+                    owner_id = batch[record_result['index']]['patientOwnerClientID'] \
+                        if record_result.get('index') is not None else None
+                    self.start_verification(record_result['patientID'], record_result['ipfsHash'],
+                                            result.get('txId'), owner_id)
+            
+            stored = sum(1 for r in results if r.get('status') == 'PENDING_VERIFICATION')
+            print(f"✅ STORE_ECG_DATA_BATCH: {stored}/{len(batch)} stored by {user_role}")
+            
+            return {
+                'status': 'success',
+                'message': f'ECG batch processed: {stored} stored, {len(batch) - stored} rejected',
+                'total': len(batch),
+                'stored': stored,
+                'rejected': len(batch) - stored,
+                'results': results,
+                'userRole': result['userRole'],
+                'mspId': result['mspId'],
+                'txId': result.get('txId')
+            }
+            
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
+    def enqueue_ecg_data(self, patient_id, ipfs_hash, metadata, patient_owner_client_id, user_role='admin'):
+        """
+        Queue one record for batched storage
+
+        Returns:
+            Future: resolves to the per-record result once its batch is committed
+        """
+        if self.batch_queue is None:
+            with self._batch_queue_lock:
+                if self.batch_queue is None:
+                    self.batch_queue = ECGBatchQueue(self)
+        return self.batch_queue.enqueue(patient_id, ipfs_hash, metadata, patient_owner_client_id, user_role)
+
     def grant_access(self, patient_id, doctor_client_id, user_role='patient'):
         """Grant access dengan identity validation"""
         try:
@@ -187,23 +730,8 @@ class FabricGatewayClient:
                 "Args": [patient_id, doctor_client_id]
             }
             
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=False, user_role=user_role)
-            
-            if result['success']:
-                return {
-                    'status': 'success',
-                    'message': f'Access granted by {user_role}',
-                    'patientID': patient_id,
-                    'grantedTo': doctor_client_id,
-                    'userRole': result['userRole'],
-                    'mspId': result['mspId']
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': result['error'],
-                    'userRole': result['userRole']
-                }
+            result = self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
+            return self._grant_access_response(result, patient_id, doctor_client_id, user_role)
                 
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
@@ -218,23 +746,8 @@ class FabricGatewayClient:
                 "Args": [patient_id]
             }
             
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=True, user_role=user_role)
-            
-            if result['success']:
-                return {
-                    'status': 'success',
-                    'message': f'ECG data accessed by {user_role}',
-                    'patientID': patient_id,
-                    'data': result.get('payload') or result['output'],
-                    'userRole': result['userRole'],
-                    'mspId': result['mspId']
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': result['error'],
-                    'userRole': result['userRole']
-                }
+            result = self._execute_chaincode(chaincode_call, is_query=True, user_role=user_role)
+            return self._access_ecg_data_response(result, patient_id, user_role)
                 
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
@@ -249,23 +762,8 @@ class FabricGatewayClient:
                 "Args": [patient_id, doctor_client_id]
             }
             
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=False, user_role=user_role)
-            
-            if result['success']:
-                return {
-                    'status': 'success',
-                    'message': f'Access revoked by {user_role}',
-                    'patientID': patient_id,
-                    'revokedFrom': doctor_client_id,
-                    'userRole': result['userRole'],
-                    'mspId': result['mspId']
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': result['error'],
-                    'userRole': result['userRole']
-                }
+            result = self._execute_chaincode(chaincode_call, is_query=False, user_role=user_role)
+            return self._revoke_access_response(result, patient_id, doctor_client_id, user_role)
                 
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
@@ -280,23 +778,22 @@ class FabricGatewayClient:
                 "Args": [patient_id]
             }
             
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=True, user_role=user_role)
+            result = self._execute_chaincode(chaincode_call, is_query=True, user_role=user_role)
+            return self._audit_trail_response(result, patient_id, user_role)
+                
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    def get_data_status(self, patient_id, user_role='patient'):
+        """Get verification status of a patient record"""
+        try:
+            chaincode_call = {
+                "function": "getDataStatus",
+                "Args": [patient_id]
+            }
             
-            if result['success']:
-                return {
-                    'status': 'success',
-                    'message': f'Audit trail retrieved by {user_role}',
-                    'patientID': patient_id,
-                    'auditTrail': result.get('payload') or result['output'],
-                    'userRole': result['userRole'],
-                    'mspId': result['mspId']
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': result['error'],
-                    'userRole': result['userRole']
-                }
+            result = self._execute_chaincode(chaincode_call, is_query=True, user_role=user_role)
+            return self._data_status_response(result, patient_id, user_role)
                 
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
@@ -309,45 +806,55 @@ class FabricGatewayClient:
                 "Args": [patient_id, str(is_valid).lower(), verification_details]
             }
             
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=False, user_role='admin')
-            
-            if result['success']:
-                return {
-                    'status': 'success', 
-                    'message': 'ECG data verification confirmed',
-                    'patientID': patient_id,
-                    'verificationResult': 'CONFIRMED' if is_valid else 'FAILED'
-                }
-            else:
-                return {'status': 'error', 'error': result['error']}
+            result = self._execute_chaincode(chaincode_call, is_query=False, user_role='admin')
+            return self._confirm_ecg_data_response(result, patient_id, is_valid)
                 
         except Exception as e:
             return {'status': 'error', 'error': str(e)}
 
-    def start_verification(self, patient_id, ipfs_hash):
-        """Start background verification"""
-        verification_thread = threading.Thread(
-            target=self._verify_ipfs_data,
-            args=(patient_id, ipfs_hash)
-        )
-        verification_thread.daemon = True
-        verification_thread.start()
-    
-    def _verify_ipfs_data(self, patient_id, ipfs_hash):
-        """Background verification process"""
-        try:
-            time.sleep(10)
-            is_valid = True
-            details = f"IPFS verified - Hash: {ipfs_hash[:20]}..."
-            result = self.confirm_ecg_data(patient_id, is_valid, details)
-            print(f"✅ Verification completed: {result}")
-        except Exception as e:
-            print(f"❌ Verification error: {e}")
+    def start_verification(self, patient_id, ipfs_hash, tx_id=None, owner_id=None):
+        """
+        Queue background verification of a stored record
+
+        confirmECGData only finds the record once its store transaction is
+        committed. With block events running the commit's VerifyIPFSData event
+        queues the record; with the peer CLI waiting for commits it is queued
+        once tx_id committed as VALID. Without a tx_id or any commit tracking it
+        is queued right away.
+
+        Args:
+            owner_id: patientOwnerClientID of the record, the identity that can read its status
+
+        Returns:
+            bool: False when the verification queue is full
+        """
+        if tx_id is not None:
+            if self.block_event_listener is not None:
+                return True
+            if self.backend_name == 'cli' and self.cli_wait_for_event:
+                commit = self.commit_tracker.get_status(tx_id)
+                if commit['status'] != 'COMMITTED' or not commit['valid']:
+                    # An invalidated store left no record to verify
+                    return True
+        return self.verification_scheduler.submit(patient_id, ipfs_hash, owner_id)
+
+    def role_for_client_id(self, client_id):
+        """Mapped role whose identity has the given X.509 client ID, or None"""
+        for role, mapping in self.identity_mappings.items():
+            user = os.path.basename(os.path.dirname(mapping['msp_path'].rstrip('/')))
+            if client_id and f"/CN={user}::" in client_id:
+                return role
+        return None
 
     def get_connection_info(self):
         """Connection info"""
         return {
             'peerAddress': self.peer_address,
+            'backend': self.backend_name,
+            'peers': self.peer_selector.get_stats(),
+            'readCache': self.read_cache.get_stats(),
+            'blockCheckpoint': self.block_checkpoint.block_number if self.block_checkpoint else None,
+            'localLedger': self.backend.get_stats() if self.backend_name == 'local' else None,
             'identityMappings': self.identity_mappings,
             'environment': 'Dynamic Identity Management',
             'timestamp': datetime.now().isoformat()
@@ -357,7 +864,7 @@ class FabricGatewayClient:
         """Test connectivity"""
         try:
             chaincode_call = {"function": "getMyIdentity", "Args": []}
-            result = self._execute_peer_command_with_env(chaincode_call, is_query=True, user_role='admin')
+            result = self._execute_chaincode(chaincode_call, is_query=True, user_role='admin')
             
             return {
                 'testType': 'basic_query_dynamic_identity',
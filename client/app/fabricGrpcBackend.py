@@ -0,0 +1,448 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import wait
+
+import grpc
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+from google.protobuf.timestamp_pb2 import Timestamp
+
+# Stubs generated from hyperledger/fabric-protos by scripts/generate-protos.sh
+PROTOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protos')
+if PROTOS_DIR not in sys.path:
+    sys.path.insert(0, PROTOS_DIR)
+
+from common import common_pb2
+from msp import identities_pb2
+from orderer import ab_pb2_grpc
+from peer import chaincode_pb2, peer_pb2_grpc, proposal_pb2, transaction_pb2
+
+# ECDSA P-256 curve order, Fabric rejects signatures with high S values
+P256_ORDER = 0xFFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551
+P256_HALF_ORDER = P256_ORDER >> 1
+
+GRPC_CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', 120000),
+    ('grpc.keepalive_timeout_ms', 20000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.max_send_message_length', 100 * 1024 * 1024),
+    ('grpc.max_receive_message_length', 100 * 1024 * 1024),
+]
+
+
+class SigningIdentity:
+    """X.509 signing identity loaded from an MSP directory"""
+
+    def __init__(self, msp_id, msp_path):
+        cert_files = sorted(glob.glob(os.path.join(msp_path, 'signcerts', '*.pem')))
+        key_files = sorted(glob.glob(os.path.join(msp_path, 'keystore', '*')))
+        if not cert_files or not key_files:
+            raise FileNotFoundError(f"No signcert/keystore found in MSP path {msp_path}")
+
+        with open(cert_files[0], 'rb') as f:
+            self.certificate = f.read()
+        with open(key_files[0], 'rb') as f:
+            self.private_key = serialization.load_pem_private_key(f.read(), password=None)
+
+        self.msp_id = msp_id
+        self.creator = identities_pb2.SerializedIdentity(
+            mspid=msp_id,
+            id_bytes=self.certificate
+        ).SerializeToString()
+
+    def sign(self, message):
+        """Sign message with ECDSA-SHA256 and normalize to low-S form"""
+        der_signature = self.private_key.sign(message, ec.ECDSA(hashes.SHA256()))
+        r, s = decode_dss_signature(der_signature)
+        if s > P256_HALF_ORDER:
+            s = P256_ORDER - s
+        return encode_dss_signature(r, s)
+
+
+class FabricGrpcBackend:
+    """
+    Native Fabric backend that keeps long-lived gRPC channels to the
+    endorsing peers and the orderer instead of forking the peer CLI.
+    """
+
+    def __init__(self, channel_name, chaincode_name, peers, endorsing_peers, query_peer,
+                 orderer, identity_mappings, timeout=120, peer_selector=None, peer_timeout=30):
+        """
+        Args:
+            channel_name: Fabric channel name
+            chaincode_name: Chaincode name on the channel
+            peers (dict): peer name -> {'address', 'mspId', 'tlsRootCert'}
+            endorsing_peers (list): peer names used to endorse submits
+            query_peer (str): peer name used to evaluate queries
+            orderer (dict): {'name', 'address', 'tlsRootCert'}
+            identity_mappings (dict): user role -> {'msp_id', 'msp_path', ...}
+            timeout: per-call deadline in seconds
+            peer_selector: optional PeerSelector; picks peers per call and fails over
+                           (without it endorsing_peers and query_peer are always used)
+            peer_timeout: per-peer deadline when another peer can take over
+        """
+        self.channel_name = channel_name
+        self.chaincode_name = chaincode_name
+        self.peers = peers
+        self.endorsing_peers = endorsing_peers
+        self.query_peer = query_peer
+        self.orderer = orderer
+        self.identity_mappings = identity_mappings
+        self.timeout = timeout
+        self.peer_selector = peer_selector
+        self.peer_timeout = peer_timeout if peer_selector is not None else timeout
+
+        self._channels = {}
+        self._aio_channels = {}
+        self._identities = {}
+        self._lock = threading.Lock()
+
+    def _get_channel(self, name, address, tls_root_cert):
+        """Return the cached gRPC channel for a node, creating it on first use"""
+        with self._lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                with open(tls_root_cert, 'rb') as f:
+                    credentials = grpc.ssl_channel_credentials(root_certificates=f.read())
+                options = GRPC_CHANNEL_OPTIONS + [('grpc.ssl_target_name_override', name)]
+                channel = grpc.secure_channel(address, credentials, options=options)
+                self._channels[name] = channel
+                print(f"🔗 gRPC channel opened: {name} ({address})")
+            return channel
+
+    def _get_aio_channel(self, name, address, tls_root_cert):
+        """Return the cached asyncio gRPC channel for a node (bound to the running loop)"""
+        channel = self._aio_channels.get(name)
+        if channel is None:
+            with open(tls_root_cert, 'rb') as f:
+                credentials = grpc.ssl_channel_credentials(root_certificates=f.read())
+            options = GRPC_CHANNEL_OPTIONS + [('grpc.ssl_target_name_override', name)]
+            channel = grpc.aio.secure_channel(address, credentials, options=options)
+            self._aio_channels[name] = channel
+            print(f"🔗 gRPC aio channel opened: {name} ({address})")
+        return channel
+
+    def _endorser(self, peer_name, use_aio=False):
+        peer = self.peers[peer_name]
+        get_channel = self._get_aio_channel if use_aio else self._get_channel
+        return peer_pb2_grpc.EndorserStub(get_channel(peer_name, peer['address'], peer['tlsRootCert']))
+
+    def _broadcaster(self, use_aio=False):
+        get_channel = self._get_aio_channel if use_aio else self._get_channel
+        channel = get_channel(self.orderer['name'], self.orderer['address'], self.orderer['tlsRootCert'])
+        return ab_pb2_grpc.AtomicBroadcastStub(channel)
+
+    def get_identity(self, user_role):
+        """Return the signing identity for a role, loading it once per process"""
+        role = user_role if user_role in self.identity_mappings else 'admin'
+        with self._lock:
+            identity = self._identities.get(role)
+            if identity is None:
+                mapping = self.identity_mappings[role]
+                identity = SigningIdentity(mapping['msp_id'], mapping['msp_path'])
+                self._identities[role] = identity
+            return identity
+
+    def create_proposal(self, identity, chaincode_call):
+        """Build and sign a chaincode proposal from a {function, Args} call"""
+        nonce = os.urandom(24)
+        tx_id = hashlib.sha256(nonce + identity.creator).hexdigest()
+
+        timestamp = Timestamp()
+        timestamp.GetCurrentTime()
+
+        chaincode_id = chaincode_pb2.ChaincodeID(name=self.chaincode_name)
+        channel_header = common_pb2.ChannelHeader(
+            type=common_pb2.ENDORSER_TRANSACTION,
+            timestamp=timestamp,
+            channel_id=self.channel_name,
+            tx_id=tx_id,
+            extension=proposal_pb2.ChaincodeHeaderExtension(chaincode_id=chaincode_id).SerializeToString()
+        )
+        signature_header = common_pb2.SignatureHeader(creator=identity.creator, nonce=nonce)
+        header = common_pb2.Header(
+            channel_header=channel_header.SerializeToString(),
+            signature_header=signature_header.SerializeToString()
+        )
+
+        args = [chaincode_call['function']] + list(chaincode_call.get('Args', []))
+        invocation_spec = chaincode_pb2.ChaincodeInvocationSpec(
+            chaincode_spec=chaincode_pb2.ChaincodeSpec(
+                type=chaincode_pb2.ChaincodeSpec.NODE,
+                chaincode_id=chaincode_id,
+                input=chaincode_pb2.ChaincodeInput(args=[str(arg).encode('utf-8') for arg in args])
+            )
+        )
+        proposal_payload = proposal_pb2.ChaincodeProposalPayload(input=invocation_spec.SerializeToString())
+        proposal = proposal_pb2.Proposal(
+            header=header.SerializeToString(),
+            payload=proposal_payload.SerializeToString()
+        )
+
+        proposal_bytes = proposal.SerializeToString()
+        signed_proposal = proposal_pb2.SignedProposal(
+            proposal_bytes=proposal_bytes,
+            signature=identity.sign(proposal_bytes)
+        )
+        return tx_id, proposal, header, signed_proposal
+
+    def create_transaction(self, identity, proposal, header, proposal_responses):
+        """Assemble the signed transaction envelope from matching endorsements"""
+        response_payloads = {r.payload for r in proposal_responses}
+        if len(response_payloads) != 1:
+            raise RuntimeError("Endorsement mismatch: peers returned different read/write sets")
+
+        original_payload = proposal_pb2.ChaincodeProposalPayload.FromString(proposal.payload)
+        # Transient data must never be written to the ledger
+        ledger_payload = proposal_pb2.ChaincodeProposalPayload(input=original_payload.input)
+
+        action_payload = transaction_pb2.ChaincodeActionPayload(
+            chaincode_proposal_payload=ledger_payload.SerializeToString(),
+            action=transaction_pb2.ChaincodeEndorsedAction(
+                proposal_response_payload=proposal_responses[0].payload,
+                endorsements=[r.endorsement for r in proposal_responses]
+            )
+        )
+        transaction = transaction_pb2.Transaction(actions=[
+            transaction_pb2.TransactionAction(
+                header=header.signature_header,
+                payload=action_payload.SerializeToString()
+            )
+        ])
+
+        payload_bytes = common_pb2.Payload(header=header, data=transaction.SerializeToString()).SerializeToString()
+        return common_pb2.Envelope(payload=payload_bytes, signature=identity.sign(payload_bytes))
+
+    def _check_endorsements(self, peer_names, responses):
+        for name, response in zip(peer_names, responses):
+            if response.response.status >= 400:
+                raise RuntimeError(f"Endorsement failed on {name}: {response.response.message}")
+        return list(responses)
+
+    def select_peers(self, is_query):
+        """Query peer or endorsing peers for the next call"""
+        if self.peer_selector is None:
+            return [self.query_peer] if is_query else list(self.endorsing_peers)
+        if is_query:
+            return [self.peer_selector.select_query_peer() or self.query_peer]
+        return self.peer_selector.select_endorsers() or list(self.endorsing_peers)
+
+    def _replacement_peer(self, failed_peer, is_query, excluded):
+        """Another peer that can stand in for a failed one (same org for endorsements)"""
+        if self.peer_selector is None:
+            return None
+        if is_query:
+            return self.peer_selector.select_query_peer(excluded)
+        return self.peer_selector.select_endorser(self.peers[failed_peer]['mspId'], excluded)
+
+    def _start_call(self, peer_name):
+        return self.peer_selector.start(peer_name) if self.peer_selector else time.monotonic()
+
+    def _finish_call(self, peer_name, started, error=None):
+        if self.peer_selector is not None:
+            self.peer_selector.finish(peer_name, started, error is None, error)
+
+    def _failover(self, failed, is_query, excluded):
+        """Replacement (slot, peer) pairs for failed (slot, peer, error) attempts; raises when none is left"""
+        retry = []
+        for slot, peer_name, error in failed:
+            excluded.add(peer_name)
+            replacement = self._replacement_peer(peer_name, is_query, excluded)
+            if replacement is None:
+                raise error
+            print(f"🔁 gRPC failover {peer_name} -> {replacement}: {error.code().name}")
+            retry.append((slot, replacement))
+        return retry
+
+    def endorse(self, signed_proposal, peer_names, is_query=False):
+        """
+        Send the proposal to all peers at once and collect their responses.
+        A peer that is down or misses its deadline is replaced by another peer
+        of the same organization (the signed proposal is valid on any peer).
+        """
+        responses = {}
+        excluded = set()
+        pending = list(enumerate(peer_names))
+
+        while pending:
+            calls = []
+            for slot, peer_name in pending:
+                started = self._start_call(peer_name)
+                future = self._endorser(peer_name).ProcessProposal.future(signed_proposal, timeout=self.peer_timeout)
+                calls.append((slot, peer_name, started, future))
+            wait([call[3] for call in calls])
+
+            failed = []
+            for slot, peer_name, started, future in calls:
+                try:
+                    responses[slot] = (peer_name, future.result())
+                    self._finish_call(peer_name, started)
+                except grpc.RpcError as e:
+                    self._finish_call(peer_name, started, e)
+                    failed.append((slot, peer_name, e))
+            pending = self._failover(failed, is_query, excluded)
+
+        ordered = [responses[slot] for slot in range(len(peer_names))]
+        return self._check_endorsements([name for name, _ in ordered], [response for _, response in ordered])
+
+    async def _endorse_one_async(self, signed_proposal, peer_name):
+        started = self._start_call(peer_name)
+        try:
+            response = await self._endorser(peer_name, use_aio=True).ProcessProposal(
+                signed_proposal, timeout=self.peer_timeout
+            )
+        except grpc.RpcError as e:
+            self._finish_call(peer_name, started, e)
+            raise
+        self._finish_call(peer_name, started)
+        return response
+
+    async def endorse_async(self, signed_proposal, peer_names, is_query=False):
+        """Asyncio variant of endorse()"""
+        responses = {}
+        excluded = set()
+        pending = list(enumerate(peer_names))
+
+        while pending:
+            results = await asyncio.gather(
+                *[self._endorse_one_async(signed_proposal, peer_name) for _, peer_name in pending],
+                return_exceptions=True
+            )
+
+            failed = []
+            for (slot, peer_name), result in zip(pending, results):
+                if isinstance(result, grpc.RpcError):
+                    failed.append((slot, peer_name, result))
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    responses[slot] = (peer_name, result)
+            pending = self._failover(failed, is_query, excluded)
+
+        ordered = [responses[slot] for slot in range(len(peer_names))]
+        return self._check_endorsements([name for name, _ in ordered], [response for _, response in ordered])
+
+    def _check_broadcast(self, response):
+        if response is None:
+            raise RuntimeError("Orderer closed the broadcast stream without a response")
+        if response.status != common_pb2.SUCCESS:
+            raise RuntimeError(f"Orderer rejected transaction: {common_pb2.Status.Name(response.status)} {response.info}")
+        return response
+
+    def broadcast(self, envelope):
+        """Send the transaction envelope to the orderer"""
+        call = self._broadcaster().Broadcast(iter([envelope]), timeout=self.timeout)
+        response = next(call, None)
+        call.cancel()
+        return self._check_broadcast(response)
+
+    async def broadcast_async(self, envelope):
+        """Asyncio variant of broadcast()"""
+        call = self._broadcaster(use_aio=True).Broadcast(iter([envelope]), timeout=self.timeout)
+        response = None
+        async for response in call:
+            break
+        call.cancel()
+        return self._check_broadcast(response)
+
+    def _timings(self, started, endorsed, ordered):
+        return {
+            'startedAt': started,
+            'orderedAt': ordered,
+            'endorseMs': round((endorsed - started) * 1000, 1),
+            'orderMs': round((ordered - endorsed) * 1000, 1)
+        }
+
+    def _success_result(self, responses, identity, tx_id, user_role, timings=None):
+        output = responses[0].response.payload.decode('utf-8')
+        try:
+            payload_data = json.loads(output) if output else None
+        except ValueError:
+            payload_data = output
+
+        return {
+            'success': True,
+            'output': output,
+            'error': '',
+            'returnCode': 0,
+            'payload': payload_data,
+            'userRole': user_role,
+            'mspId': identity.msp_id,
+            'txId': tx_id,
+            'timings': timings
+        }
+
+    def _error_result(self, error, user_role):
+        if isinstance(error, grpc.RpcError):
+            message = f"{error.code().name}: {error.details()}"
+        else:
+            message = str(error)
+        return {'success': False, 'error': message, 'returnCode': 1, 'userRole': user_role}
+
+    def execute(self, chaincode_call, is_query=False, user_role='admin'):
+        """Evaluate or submit a chaincode call, returning the peer CLI result shape"""
+        try:
+            identity = self.get_identity(user_role)
+            tx_id, proposal, header, signed_proposal = self.create_proposal(identity, chaincode_call)
+
+            print(f"🔄 gRPC {'evaluate' if is_query else 'submit'} {chaincode_call['function']} as {user_role} ({identity.msp_id})")
+            started = time.time()
+
+            if is_query:
+                responses = self.endorse(signed_proposal, self.select_peers(True), is_query=True)
+                endorsed = ordered = time.time()
+            else:
+                responses = self.endorse(signed_proposal, self.select_peers(False))
+                endorsed = time.time()
+                self.broadcast(self.create_transaction(identity, proposal, header, responses))
+                ordered = time.time()
+
+            print(f"✅ gRPC {chaincode_call['function']} completed in {(ordered - started) * 1000:.1f} ms")
+            return self._success_result(responses, identity, tx_id, user_role,
+                                        self._timings(started, endorsed, ordered))
+
+        except Exception as e:
+            return self._error_result(e, user_role)
+
+    async def execute_async(self, chaincode_call, is_query=False, user_role='admin'):
+        """Asyncio variant of execute(); endorsements run concurrently on the event loop"""
+        try:
+            identity = self.get_identity(user_role)
+            tx_id, proposal, header, signed_proposal = self.create_proposal(identity, chaincode_call)
+
+            started = time.time()
+            if is_query:
+                responses = await self.endorse_async(signed_proposal, self.select_peers(True), is_query=True)
+                endorsed = ordered = time.time()
+            else:
+                responses = await self.endorse_async(signed_proposal, self.select_peers(False))
+                endorsed = time.time()
+                await self.broadcast_async(self.create_transaction(identity, proposal, header, responses))
+                ordered = time.time()
+
+            return self._success_result(responses, identity, tx_id, user_role,
+                                        self._timings(started, endorsed, ordered))
+
+        except Exception as e:
+            return self._error_result(e, user_role)
+
+    def close(self):
+        """Close all synchronous gRPC channels"""
+        with self._lock:
+            for channel in self._channels.values():
+                channel.close()
+            self._channels.clear()
+
+    async def close_async(self):
+        """Close all asyncio gRPC channels"""
+        for channel in self._aio_channels.values():
+            await channel.close()
+        self._aio_channels.clear()
@@ -0,0 +1,171 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Payload sizes from a few hundred bytes (15-sample leads) to 256 MB (12 x 1M-sample leads)
+BYTE_BUCKETS = [2 ** exponent for exponent in range(8, 29, 2)]
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'ecg_gateway_http_request_seconds', 'End-to-end HTTP request latency',
+    ['route', 'method', 'status', 'role'], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_BYTES = Histogram(
+    'ecg_gateway_http_request_bytes', 'HTTP request body size', ['route'], buckets=BYTE_BUCKETS
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    'ecg_gateway_http_response_bytes', 'HTTP response body size', ['route'], buckets=BYTE_BUCKETS
+)
+ROUTE_STAGE_SECONDS = Histogram(
+    'ecg_gateway_route_stage_seconds', 'Time spent in one stage of a route (json_parse, ipfs_add, ledger, ...)',
+    ['route', 'stage'], buckets=LATENCY_BUCKETS
+)
+
+IPFS_SECONDS = Histogram(
+    'ecg_gateway_ipfs_seconds', 'IPFS API call latency', ['operation', 'outcome'], buckets=LATENCY_BUCKETS
+)
+IPFS_BYTES = Histogram(
+    'ecg_gateway_ipfs_bytes', 'Bytes sent to or read from IPFS', ['operation'], buckets=BYTE_BUCKETS
+)
+IPFS_CACHE_LOOKUPS = Counter(
+    'ecg_gateway_ipfs_cache_lookups_total', 'IPFS read cache lookups', ['tier', 'result']
+)
+IPFS_CACHE_BYTES = Gauge(
+    'ecg_gateway_ipfs_cache_bytes', 'Bytes held by the IPFS read cache (memory is an estimate)', ['tier']
+)
+IPFS_DEDUP_LOOKUPS = Counter(
+    'ecg_gateway_ipfs_dedup_lookups_total', 'Uploads checked against the pinned CID index', ['result']
+)
+IPFS_DEDUP_BYTES_SKIPPED = Counter(
+    'ecg_gateway_ipfs_dedup_bytes_skipped_total', 'Payload bytes not re-sent because the CID was already pinned'
+)
+
+CHAINCODE_SECONDS = Histogram(
+    'ecg_gateway_chaincode_seconds', 'Chaincode call latency as seen by the gateway (peer subprocess or gRPC)',
+    ['function', 'mode', 'backend', 'outcome'], buckets=LATENCY_BUCKETS
+)
+CHAINCODE_STAGE_SECONDS = Histogram(
+    'ecg_gateway_chaincode_stage_seconds',
+    'Transaction lifecycle stages (endorse, order, commit; submit = endorse + order where only that is known)',
+    ['function', 'stage'], buckets=LATENCY_BUCKETS
+)
+CHAINCODE_ERRORS = Counter(
+    'ecg_gateway_chaincode_errors_total', 'Failed chaincode calls', ['function', 'role']
+)
+CHAINCODE_CACHE_HITS = Counter(
+    'ecg_gateway_chaincode_cache_hits_total', 'Queries answered from the ledger read cache', ['function']
+)
+TRANSACTIONS_COMMITTED = Counter(
+    'ecg_gateway_transactions_committed_total', 'Committed transactions by validation code',
+    ['function', 'validation_code']
+)
+
+VERIFICATION_QUEUE_WAIT_SECONDS = Histogram(
+    'ecg_gateway_verification_queue_wait_seconds', 'Time a verification task waited for a worker',
+    buckets=LATENCY_BUCKETS
+)
+VERIFICATION_SECONDS = Histogram(
+    'ecg_gateway_verification_seconds', 'Time from queueing to the final verification outcome',
+    ['outcome'], buckets=LATENCY_BUCKETS
+)
+VERIFICATION_RETRIES = Counter(
+    'ecg_gateway_verification_retries_total', 'Verification attempts that were rescheduled'
+)
+VERIFICATION_QUEUE_DEPTH = Gauge(
+    'ecg_gateway_verification_queue_depth', 'Verification tasks queued or waiting for a retry'
+)
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    'ecg_gateway_admission_wait_seconds', 'Time an admitted request waited for a slot',
+    ['pool', 'priority'], buckets=LATENCY_BUCKETS
+)
+ADMISSION_DECISIONS = Counter(
+    'ecg_gateway_admission_decisions_total', 'Admission outcomes (admitted, rejected, timeout)',
+    ['pool', 'priority', 'outcome']
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'ecg_gateway_admission_queue_depth', 'Requests waiting for an admission slot', ['pool']
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'ecg_gateway_admission_in_flight', 'Requests holding an admission slot', ['pool']
+)
+
+
+@contextmanager
+def time_stage(route, stage):
+    """Observe the duration of a block as one stage of a route"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ROUTE_STAGE_SECONDS.labels(route, stage).observe(time.perf_counter() - started)
+
+
+def observe_http(route, method, status, role, elapsed, request_bytes=None, response_bytes=None):
+    HTTP_REQUEST_SECONDS.labels(route, method, str(status), role).observe(elapsed)
+    if request_bytes:
+        HTTP_REQUEST_BYTES.labels(route).observe(request_bytes)
+    if response_bytes is not None:
+        HTTP_RESPONSE_BYTES.labels(route).observe(response_bytes)
+
+
+def observe_ipfs(operation, elapsed, ok, size=None):
+    IPFS_SECONDS.labels(operation, 'success' if ok else 'error').observe(elapsed)
+    if size is not None:
+        IPFS_BYTES.labels(operation).observe(size)
+
+
+def observe_dedup(hit, size=0):
+    IPFS_DEDUP_LOOKUPS.labels('hit' if hit else 'miss').inc()
+    if hit:
+        IPFS_DEDUP_BYTES_SKIPPED.inc(size)
+
+
+def observe_admission(pool, priority, outcome, waited=None):
+    ADMISSION_DECISIONS.labels(pool, priority, outcome).inc()
+    if waited is not None:
+        ADMISSION_WAIT_SECONDS.labels(pool, priority).observe(waited)
+
+
+def observe_admission_depth(pool, in_flight, queued):
+    ADMISSION_IN_FLIGHT.labels(pool).set(in_flight)
+    ADMISSION_QUEUE_DEPTH.labels(pool).set(queued)
+
+
+def observe_chaincode(chaincode_call, is_query, user_role, backend_name, result, elapsed):
+    """Record one chaincode call from the result dict returned by a backend"""
+    function = chaincode_call['function']
+    if result.get('cached'):
+        CHAINCODE_CACHE_HITS.labels(function).inc()
+        return
+
+    ok = bool(result.get('success'))
+    CHAINCODE_SECONDS.labels(
+        function, 'query' if is_query else 'submit', backend_name, 'success' if ok else 'error'
+    ).observe(elapsed)
+    if not ok:
+        CHAINCODE_ERRORS.labels(function, user_role).inc()
+
+    timings = result.get('timings') or {}
+    if timings.get('endorseMs') is not None:
+        CHAINCODE_STAGE_SECONDS.labels(function, 'endorse').observe(timings['endorseMs'] / 1000)
+    if not is_query and timings.get('orderMs') is not None:
+        CHAINCODE_STAGE_SECONDS.labels(function, 'order').observe(timings['orderMs'] / 1000)
+    if not is_query and timings.get('submitMs') is not None:
+        # Peer CLI: endorse and order are one subprocess call
+        CHAINCODE_STAGE_SECONDS.labels(function, 'submit').observe(timings['submitMs'] / 1000)
+
+
+def observe_commit(status):
+    """CommitTracker callback, status is the dict returned by get_status()"""
+    function = status.get('function') or 'unknown'
+    TRANSACTIONS_COMMITTED.labels(function, status.get('validationCode') or 'UNKNOWN').inc()
+    timings = status.get('timings') or {}
+    if timings.get('commitMs') is not None:
+        CHAINCODE_STAGE_SECONDS.labels(function, 'commit').observe(timings['commitMs'] / 1000)
+
+
+def render():
+    """Prometheus text exposition of every metric, returns (body, content type)"""
+    return generate_latest(), CONTENT_TYPE_LATEST
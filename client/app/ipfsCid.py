@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Defaults of `ipfs add` with CIDv0: size-262144 chunker, balanced DAG with at most
+# 174 links per node, dag-pb nodes carrying UnixFS File data, sha2-256 multihash
+CHUNK_SIZE = 262144
+LINKS_PER_NODE = 174
+
+_BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field_bytes(number, data):
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def _field_varint(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _base58(data):
+    number = int.from_bytes(data, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = _BASE58_ALPHABET[remainder] + encoded
+    leading_zeros = len(data) - len(data.lstrip(b'\0'))
+    return '1' * leading_zeros + encoded
+
+
+def _multihash(node):
+    return b'\x12\x20' + hashlib.sha256(node).digest()
+
+
+def _leaf(chunk):
+    """(multihash, cumulative size, file size) of one UnixFS File leaf"""
+    unixfs = _field_varint(1, 2)
+    if chunk:
+        unixfs += _field_bytes(2, chunk)
+    unixfs += _field_varint(3, len(chunk))
+    node = _field_bytes(1, unixfs)
+    return _multihash(node), len(node), len(chunk)
+
+
+def _parent(children):
+    """(multihash, cumulative size, file size) of an internal node over children"""
+    links = b''
+    unixfs = _field_varint(1, 2) + _field_varint(3, sum(child[2] for child in children))
+    for multihash, tsize, filesize in children:
+        link = _field_bytes(1, multihash) + _field_bytes(2, b'') + _field_varint(3, tsize)
+        links += _field_bytes(2, link)
+        unixfs += _field_varint(4, filesize)
+    # dag-pb puts Links (field 2) before Data (field 1)
+    node = links + _field_bytes(1, unixfs)
+    return _multihash(node), len(node) + sum(child[1] for child in children), sum(child[2] for child in children)
+
+
+def compute_cid(data, chunk_size=CHUNK_SIZE):
+    """
+    CIDv0 that `ipfs add` (default settings) would return for data, without a daemon
+
+    Args:
+        data (bytes): file content
+
+    Returns:
+        str: base58 CIDv0 (Qm...)
+    """
+    data = memoryview(data)
+    level = [_leaf(bytes(data[offset:offset + chunk_size])) for offset in range(0, len(data), chunk_size)]
+    if not level:
+        level = [_leaf(b'')]
+    # Grouping bottom-up, left to right, gives the same tree as the balanced builder
+    while len(level) > 1:
+        level = [_parent(level[index:index + LINKS_PER_NODE]) for index in range(0, len(level), LINKS_PER_NODE)]
+    return _base58(level[0][0])
+
+
+class PinnedCidIndex:
+    """
+    CIDs this gateway added (pinned) to IPFS, keyed by the locally computed CID.
+
+    The value is the CID the daemon returned; they only differ if the daemon runs
+    with non-default add settings, in which case dedup still works through the
+    mapping. Bounded LRU, optionally persisted as JSON lines so retries after a
+    restart are still deduplicated.
+    """
+
+    def __init__(self, max_entries=100000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()     # local CID -> daemon CID
+        self._lock = threading.Lock()
+        self._mismatch_reported = False
+        self.stats = {'hits': 0, 'misses': 0, 'bytesSkipped': 0, 'mismatches': 0}
+        if self.path:
+            self._load()
+
+    @classmethod
+    def from_env(cls):
+        """Build from IPFS_DEDUP_MAX_ENTRIES / IPFS_DEDUP_INDEX ('off' keeps it in memory only)"""
+        path = os.getenv('IPFS_DEDUP_INDEX', 'off')
+        return cls(
+            max_entries=int(os.getenv('IPFS_DEDUP_MAX_ENTRIES', '100000')),
+            path=None if path.lower() == 'off' else path
+        )
+
+    def _load(self):
+        try:
+            with open(self.path) as handle:
+                for line in handle:
+                    try:
+                        local_cid, daemon_cid = json.loads(line)
+                    except ValueError:
+                        continue
+                    if daemon_cid is None:
+                        # Removal record written by remove()
+                        self._entries.pop(local_cid, None)
+                        continue
+                    self._entries[local_cid] = daemon_cid
+                    self._entries.move_to_end(local_cid)
+        except FileNotFoundError:
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        # Rewrite compacted so the file does not grow without bound across restarts
+        self._rewrite()
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as handle:
+                for entry in self._entries.items():
+                    handle.write(json.dumps(entry) + '\n')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Dedup index rewrite failed: {e}")
+
+    def lookup(self, local_cid, size=0):
+        """Daemon CID of content already pinned, or None"""
+        with self._lock:
+            daemon_cid = self._entries.get(local_cid)
+            if daemon_cid is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(local_cid)
+            self.stats['hits'] += 1
+            self.stats['bytesSkipped'] += size
+            return daemon_cid
+
+    def add(self, local_cid, daemon_cid):
+        with self._lock:
+            if local_cid != daemon_cid:
+                self.stats['mismatches'] += 1
+                if not self._mismatch_reported:
+                    self._mismatch_reported = True
+                    print(f"⚠️ Local CID {local_cid} != daemon CID {daemon_cid}; IPFS add settings differ from defaults")
+            self._entries[local_cid] = daemon_cid
+            self._entries.move_to_end(local_cid)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                try:
+                    with open(self.path, 'a') as handle:
+                        handle.write(json.dumps([local_cid, daemon_cid]) + '\n')
+                except OSError as e:
+                    print(f"⚠️ Dedup index append failed: {e}")
+
+    def remove(self, cid):
+        """Forget content that was unpinned (cid may be the local or the daemon CID)"""
+        with self._lock:
+            local_cids = [local for local, daemon in self._entries.items() if cid in (local, daemon)]
+            for local_cid in local_cids:
+                del self._entries[local_cid]
+                if self.path:
+                    try:
+                        with open(self.path, 'a') as handle:
+                            handle.write(json.dumps([local_cid, None]) + '\n')
+                    except OSError as e:
+                        print(f"⚠️ Dedup index append failed: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                maxEntries=self.max_entries,
+                hitRate=round(self.stats['hits'] / lookups, 3) if lookups else None
+            )
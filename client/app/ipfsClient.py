@@ -1,24 +1,133 @@
+import contextvars
 import ipfshttpclient
 import json
+import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import admissionControl
+import ecgCodec
+import gatewayMetrics
+import ipfsCid
+from ipfsHttpBackend import IPFSHttpBackend
+from localIPFSBackend import LocalIPFSBackend
+
+class _ChunkReader:
+    """Minimal read() file object over a generator of byte chunks, for streaming add"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b'')
+        self._offset = 0
+
+    def read(self, size=-1):
+        parts = []
+        wanted = size
+        while wanted != 0:
+            if self._offset >= len(self._current):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._current, self._offset = memoryview(chunk), 0
+            end = len(self._current) if wanted < 0 else min(len(self._current), self._offset + wanted)
+            parts.append(self._current[self._offset:end])
+            if wanted > 0:
+                wanted -= end - self._offset
+            self._offset = end
+        return b''.join(parts)
+
+
+class IPFSUploadError(Exception):
+    """IPFS add failed part way; added lists the CIDs pinned before the failure"""
+
+    def __init__(self, message, added):
+        super().__init__(message)
+        self.added = added
+
+
+class IPFSReadError(Exception):
+    """ECG data could not be read from IPFS (no connection, missing CID or undecodable payload)"""
+
 
 class IPFSClient:
-    def __init__(self, ipfs_host='172.20.1.6', ipfs_port=5001):
+    def __init__(self, ipfs_host='172.20.1.6', ipfs_port=5001, payload_format='binary', cache=None,
+                 prefetch_workers=2, backend=None, max_concurrency=None, timeout=None,
+                 chunk_seconds=None, pinned_index=None, pyramid_factors=None):
         """
         Initialize IPFS client
         
         Args:
             ipfs_host: IPFS container IP in Docker network
             ipfs_port: IPFS port
+            payload_format: 'binary' (ecgCodec container) or 'json' for new uploads;
+                reads accept both
+            cache: IPFSReadCache in front of cat (None disables caching)
+            prefetch_workers: threads used by prefetch()
+            backend: 'http' (pooled session, default), 'ipfshttpclient' or 'local'
+                (LocalIPFSBackend, no daemon); default from IPFS_BACKEND
+            max_concurrency: concurrent IPFS calls and upload_many/get_many
+                workers (default IPFS_MAX_CONCURRENCY or 32)
+            timeout: read timeout per call in seconds (default IPFS_TIMEOUT or 30)
+            chunk_seconds: binary records longer than this are stored as per-lead
+                time chunks plus a manifest (default ECG_CHUNK_SECONDS or 10, 0 disables)
+            pinned_index: ipfsCid.PinnedCidIndex of content already added; payloads
+                whose locally computed CID is in it are not sent again (None disables)
+            pyramid_factors: min/max preview levels stored with chunked recordings
+                (default ECG_PYRAMID_FACTORS or 8,64,512, empty disables)
         """
+        self.payload_format = payload_format
+        self.cache = cache
+        self.pinned_index = pinned_index
+        self.api_address = f"{ipfs_host}:{ipfs_port}"
+        self.backend_name = (backend or os.getenv('IPFS_BACKEND', 'http')).lower()
+        self.max_concurrency = max_concurrency or int(os.getenv('IPFS_MAX_CONCURRENCY', '32'))
+        self.timeout = timeout or float(os.getenv('IPFS_TIMEOUT', '30'))
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix='ipfs-prefetch')
+        self._prefetching = set()
+        self._prefetch_lock = threading.Lock()
+        self.chunk_seconds = float(os.getenv('ECG_CHUNK_SECONDS', '10')) if chunk_seconds is None else chunk_seconds
+        if pyramid_factors is None:
+            pyramid_factors = [int(v) for v in os.getenv('ECG_PYRAMID_FACTORS', '8,64,512').split(',') if v.strip()]
+        self.pyramid_factors = pyramid_factors
+        self._batch_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='ipfs-batch')
+        # Separate pool for chunk adds/cats so batch workers never wait on their own pool
+        self._chunk_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='ipfs-chunk')
+        # CID -> [prepared uploads holding it, shared with another upload], guards rollback_upload()
+        self._held = {}
+        self._hold_lock = threading.Lock()
+        # True when the daemon was unreachable and IPFS_OFFLINE_FALLBACK=local swapped in the local store
+        self.fallback = False
         try:
-            self.client = ipfshttpclient.connect(f'/ip4/{ipfs_host}/tcp/{ipfs_port}')
+            if self.backend_name == 'local':
+                self.client = LocalIPFSBackend.from_env(self.max_concurrency)
+                self.api_address = self.client.root_dir
+                print(f"📦 Using local IPFS store at {self.client.root_dir}")
+                return
+            if self.backend_name == 'ipfshttpclient':
+                self.client = ipfshttpclient.connect(f'/ip4/{ipfs_host}/tcp/{ipfs_port}', timeout=self.timeout)
+            else:
+                self.client = IPFSHttpBackend(
+                    f'http://{ipfs_host}:{ipfs_port}/api/v0',
+                    max_concurrency=self.max_concurrency,
+                    timeout=self.timeout
+                )
             # Test connection
             version = self.client.version()
             print(f"✓ Connected to IPFS version: {version['Version']} at {ipfs_host}:{ipfs_port}")
         except Exception as e:
             print(f"⚠️ IPFS connection failed to {ipfs_host}:{ipfs_port} - {e}")
             self.client = None
+            # Uploads and reads fail with IPFSUploadError/IPFSReadError unless the local store is asked for
+            if self.backend_name != 'local' and os.getenv('IPFS_OFFLINE_FALLBACK', 'off').lower() == 'local':
+                self.backend_name = 'local'
+                self.fallback = True
+                self.client = LocalIPFSBackend.from_env(self.max_concurrency)
+                self.api_address = self.client.root_dir
+                print(f"⚠️ Falling back to local IPFS store at {self.client.root_dir}, data is not on the IPFS network")
 
     def upload_ecg_data(self, ecg_data):
         """
@@ -29,88 +138,711 @@ class IPFSClient:
 
         Returns:
             str: IPFS hash of the uploaded data
+
+        Raises:
+            IPFSUploadError: no IPFS connection or the add failed (blocks pinned
+                before the failure are unpinned again)
         """
         if not self.client:
-            # Return mock hash if IPFS not available
-            mock_hash = f"QmMockHash{abs(hash(str(ecg_data)))}"[:46]
-            print(f"📝 Using mock IPFS hash: {mock_hash}")
-            return mock_hash
-        
+            raise IPFSUploadError("No IPFS connection", [])
+
+        prepared = self.prepare_upload(ecg_data)
+        try:
+            return self.commit_upload(prepared)['ipfsHash']
+        except IPFSUploadError as e:
+            print(f"⚠️ IPFS upload failed: {e}")
+            if e.added:
+                self.rollback_upload(e.added)
+            raise
+        finally:
+            self.release_upload(prepared)
+
+    def prepare_upload(self, ecg_data):
+        """
+        Encode a record and compute all of its CIDs locally, without IPFS traffic
+
+        The returned ipfsHash is final as long as the daemon uses default add
+        settings, so it can be written to the ledger before commit_upload().
+        Every prepared upload must be passed to release_upload() when done.
+
+        Args:
+            ecg_data: record dict, or the bytes of an ecgCodec container
+
+        Returns:
+            dict: ipfsHash (root CID), blocks [(local CID, bytes, operation)] with
+                  the root last, manifest (chunked layout) or None, record (None
+                  for a container stored as sent)
+        """
+        started = time.perf_counter()
+        encode_stage = 'binary_encode' if self.payload_format == 'binary' else 'json_encode'
         try:
-            # Convert ECG data to JSON string
-            ecg_json = json.dumps(ecg_data, indent=2)
+            manifest = None
+            blocks = []
+            payload = None
+            if ecgCodec.is_binary(ecg_data):
+                # Pre-encoded upload (application/vnd.ecg-binary)
+                ecg_data, payload = self._accept_container(bytes(ecg_data))
+            if payload is not None:
+                pass
+            elif self.payload_format == 'binary' and self.chunk_seconds and \
+                    ecgCodec.needs_chunking(ecg_data, self.chunk_seconds):
+                # One object per lead time chunk plus a manifest that lists them
+                manifest, chunks = ecgCodec.split_ecg(ecg_data, self.chunk_seconds)
+                for lead, index, data in chunks:
+                    cid = ipfsCid.compute_cid(data)
+                    manifest['leads'][lead]['chunks'][index]['cid'] = cid
+                    blocks.append((cid, data, 'add_chunk'))
+                # Decimated copies for previews, see get_ecg_preview()
+                manifest['pyramid'] = []
+                for factor, data in ecgCodec.build_pyramid(ecg_data, self.pyramid_factors):
+                    cid = ipfsCid.compute_cid(data)
+                    manifest['pyramid'].append({'factor': factor, 'cid': cid, 'bytes': len(data)})
+                    blocks.append((cid, data, 'add_pyramid'))
+                payload = ecgCodec.dump_manifest(manifest)
+            elif self.payload_format == 'binary':
+                payload = ecgCodec.encode_ecg(ecg_data)
+            else:
+                # JSON kept for payload_format='json'
+                payload = json.dumps(ecg_data, indent=2).encode('utf-8')
+            root_cid = ipfsCid.compute_cid(payload)
+            blocks.append((root_cid, payload, 'add'))
+        except Exception:
+            gatewayMetrics.observe_ipfs(encode_stage, time.perf_counter() - started, False)
+            raise
+        gatewayMetrics.observe_ipfs(encode_stage, time.perf_counter() - started, True,
+                                    sum(len(data) for _, data, _ in blocks))
+
+        prepared = {'ipfsHash': root_cid, 'blocks': blocks, 'manifest': manifest, 'record': ecg_data}
+        with self._hold_lock:
+            for cid, _, _ in blocks:
+                hold = self._held.setdefault(cid, [0, False])
+                hold[0] += 1
+                # Stays shared until the last holder releases, see rollback_upload()
+                hold[1] = hold[1] or hold[0] > 1
+        return prepared
+
+    def _accept_container(self, raw):
+        """
+        (record, payload) of a pre-encoded upload
+
+        A valid container that needs no chunking is stored as sent, so its
+        samples are never turned into Python lists; anything else (streamed
+        containers, long recordings, payload_format='json') is decoded and
+        laid out like a JSON upload.
+        """
+        header, _ = ecgCodec.decode_header(raw)
+        if self.payload_format == 'binary' and header['version'] == ecgCodec.VERSION:
+            chunk_samples = ecgCodec.chunk_samples_for(header['record'], self.chunk_seconds) \
+                if self.chunk_seconds else None
+            if chunk_samples is None or all(lead['count'] <= chunk_samples for lead in header['leads']):
+                ecgCodec.check_container(raw)
+                return None, raw
+        return ecgCodec.decode_ecg(raw), None
+
+    def release_upload(self, prepared):
+        with self._hold_lock:
+            for cid, _, _ in prepared['blocks']:
+                hold = self._held.get(cid)
+                if hold is None:
+                    continue
+                hold[0] -= 1
+                if hold[0] <= 0:
+                    del self._held[cid]
+
+    def commit_upload(self, prepared, strict=False):
+        """
+        Add the blocks of a prepared upload to IPFS (chunks in parallel, root last)
+
+        Args:
+            strict: fail when the daemon returns a CID other than the local one
+                (required once the local CID is on the ledger)
+
+        Returns:
+            dict: ipfsHash, added (CIDs newly pinned by this call), deduplicated
+
+        Raises:
+            IPFSUploadError: with .added listing what was pinned before the failure
+        """
+        if not self.client:
+            raise IPFSUploadError("No IPFS connection", [])
+
+        added = []
+        deduplicated = 0
 
-            # Add data to IPFS
-            res = self.client.add_str(ecg_json)
-            print(f"✓ ECG data uploaded to IPFS: {res}")
-            return res
+        def add_block(block):
+            local_cid, data, operation = block
+            cid, was_added = self._add_payload(data, operation, local_cid)
+            return local_cid, cid, was_added
+
+        try:
+            chunks = prepared['blocks'][:-1]
+            # Chunk adds keep the caller's admission priority (uploads queue behind reads)
+            futures = [self._chunk_executor.submit(contextvars.copy_context().run, add_block, block)
+                       for block in chunks]
+            results = []
+            error = None
+            # Wait for every chunk so a failure still reports all blocks that were pinned
+            for future in futures:
+                try:
+                    local_cid, cid, was_added = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                results.append((local_cid, cid, was_added))
+                if was_added:
+                    added.append(cid)
+                else:
+                    deduplicated += 1
+            if error is not None:
+                raise error
+
+            root_local, root_data, root_operation = prepared['blocks'][-1]
+            mismatched = [(local, cid) for local, cid, _ in results if local != cid]
+            if mismatched:
+                if strict:
+                    raise IPFSUploadError(f"daemon CID {mismatched[0][1]} != local CID {mismatched[0][0]}", added)
+                # Non-default daemon settings: the manifest has to name the daemon's CIDs
+                daemon_cids = dict(mismatched)
+                for lead in prepared['manifest']['leads'].values():
+                    for chunk in lead['chunks']:
+                        chunk['cid'] = daemon_cids.get(chunk['cid'], chunk['cid'])
+                for level in prepared['manifest']['pyramid']:
+                    level['cid'] = daemon_cids.get(level['cid'], level['cid'])
+                root_data = ecgCodec.dump_manifest(prepared['manifest'])
+                root_local = ipfsCid.compute_cid(root_data)
+
+            _, root_cid, was_added = add_block((root_local, root_data, root_operation))
+            if was_added:
+                added.append(root_cid)
+            else:
+                deduplicated += 1
+            if strict and root_cid != root_local:
+                raise IPFSUploadError(f"daemon CID {root_cid} != local CID {root_local}", added)
+        except IPFSUploadError:
+            raise
         except Exception as e:
-            print(f"⚠️ IPFS upload failed: {e}")
-            # Return mock hash as fallback
-            mock_hash = f"QmMockHash{abs(hash(str(ecg_data)))}"[:46]
-            print(f"📝 Using mock IPFS hash: {mock_hash}")
-            return mock_hash
+            raise IPFSUploadError(str(e), added)
+
+        # Write-through: the first view of a fresh upload is served locally
+        if self.cache:
+            for (_, cid, _), (_, data, _) in zip(results, chunks):
+                self.cache.put_raw(cid, data)
+            self.cache.put_raw(root_cid, root_data)
+            if prepared['record'] is not None:
+                self.cache.put_record(root_cid, prepared['record'])
+
+        if prepared['manifest']:
+            levels = len(prepared['manifest']['pyramid'])
+            layout = f"manifest + {len(prepared['blocks']) - 1 - levels} lead chunks + {levels} preview levels"
+        else:
+            layout = f"{len(root_data)} bytes"
+        print(f"✓ ECG data uploaded to IPFS: {root_cid} ({layout}, {len(added)} added, {deduplicated} deduplicated)")
+        return {'ipfsHash': root_cid, 'added': added, 'deduplicated': deduplicated}
+
+    def rollback_upload(self, cids):
+        """
+        Unpin blocks added by an upload whose ledger write failed
+
+        Blocks that another upload held while this one was in flight are kept (it
+        may have deduplicated against them), and the unpin runs under the same
+        lock as prepare_upload() so no new upload can pick a block up meanwhile.
+
+        Returns:
+            list: CIDs that were unpinned
+        """
+        if not self.client:
+            return []
+        removed = []
+        with self._hold_lock:
+            for cid in cids:
+                hold = self._held.get(cid)
+                if hold is not None and hold[1]:
+                    continue
+                try:
+                    self._unpin(cid)
+                except Exception as e:
+                    print(f"⚠️ Unpin of {cid} failed: {e}")
+                    continue
+                if self.pinned_index is not None:
+                    self.pinned_index.remove(cid)
+                if self.cache:
+                    self.cache.discard(cid)
+                removed.append(cid)
+        if removed:
+            print(f"↩️ Rolled back {len(removed)} IPFS block(s)")
+        return removed
+
+    def _unpin(self, cid):
+        if isinstance(self.client, (IPFSHttpBackend, LocalIPFSBackend)):
+            self.client.pin_rm(cid)
+        else:
+            self.client.pin.rm(cid)
+
+    def _add_payload(self, data, operation, local_cid=None):
+        """
+        Add bytes to IPFS unless the pinned index already has them
+
+        Returns:
+            (cid, added): added is False for a dedup hit
+        """
+        if self.pinned_index is not None:
+            local_cid = local_cid or ipfsCid.compute_cid(data)
+            cid = self.pinned_index.lookup(local_cid, len(data))
+            if cid is not None:
+                gatewayMetrics.observe_dedup(True, len(data))
+                return cid, False
+            gatewayMetrics.observe_dedup(False)
+
+        started = time.perf_counter()
+        try:
+            cid = self.client.add_bytes(data)
+        except Exception:
+            gatewayMetrics.observe_ipfs(operation, time.perf_counter() - started, False)
+            raise
+        gatewayMetrics.observe_ipfs(operation, time.perf_counter() - started, True, len(data))
+        if self.pinned_index is not None:
+            self.pinned_index.add(local_cid, cid)
+        return cid, True
+
+    def upload_ecg_stream(self, record, lead_chunks):
+        """
+        Stream an ECG recording into IPFS chunk by chunk
+
+        Each chunk is encoded into a streamed ecgCodec container and sent as part
+        of one chunked HTTP add, so memory stays bounded by the largest chunk.
+
+        Args:
+            record (dict): record fields without 'leads'
+            lead_chunks: iterable of {lead name: [samples]} blocks in time order
+
+        Returns:
+            dict: {'ipfsHash', 'size', 'chunks', 'samples'}
+
+        Raises:
+            ecgCodec.ECGCodecError / ValueError: malformed chunk (nothing usable stored)
+            IPFSUploadError: no IPFS connection
+            Exception: IPFS failure
+        """
+        if not self.client:
+            raise IPFSUploadError("No IPFS connection", [])
+        encoder = ecgCodec.ECGStreamEncoder(record)
+
+        def frames():
+            yield encoder.header()
+            for leads in lead_chunks:
+                yield encoder.encode_chunk(leads)
+            yield encoder.end()
+
+        started = time.perf_counter()
+        try:
+            res = self.client.add(_ChunkReader(frames()))
+        except Exception as e:
+            gatewayMetrics.observe_ipfs('add_stream', time.perf_counter() - started, False)
+            print(f"⚠️ IPFS streaming upload failed: {e}")
+            raise
+        ipfs_hash = res['Hash']
+        gatewayMetrics.observe_ipfs('add_stream', time.perf_counter() - started, True, encoder.bytes_out)
+        print(f"✓ ECG stream uploaded to IPFS: {ipfs_hash} ({encoder.chunks} chunks, {encoder.bytes_out} bytes)")
+
+        return {
+            'ipfsHash': ipfs_hash,
+            'size': encoder.bytes_out,
+            'chunks': encoder.chunks,
+            'samples': encoder.sample_counts
+        }
 
     def get_ecg_data(self, ipfs_hash):
         """
         Retrieve ECG data from IPFS
 
         Args:
-            ipfs_hash (str): IPFS hash of the ECG data
+            ipfs_hash (str): IPFS hash of the ECG data (single payload or chunk manifest)
 
         Returns:
-            dict: ECG data as a dictionary
+            dict: ECG data as a dictionary (shared with the cache, do not modify)
+
+        Raises:
+            IPFSReadError: no IPFS connection, or the payload could not be fetched or decoded
         """
-        if not self.client:
-            # Return mock data if IPFS not available
-            return {
-                "patientInfo": {"id": "MOCK_PATIENT", "note": "IPFS not available - using mock data"},
-                "leads": {"I": [0.1, 0.2, 0.3], "II": [0.2, 0.3, 0.4]},
-                "analysis": {"heartRate": 75, "rhythm": "Normal"},
-                "mockData": True,
-                "ipfsHash": ipfs_hash
-            }
-        
+        if self.cache:
+            ecg_data = self.cache.get_record(ipfs_hash)
+            if ecg_data is not None:
+                return ecg_data
+
+        if not self.client and not (self.cache and self.cache.contains(ipfs_hash)):
+            raise IPFSReadError("No IPFS connection")
+
+        fetched = time.perf_counter()
+        raw = None
+        decode_stage = 'decode'
         try:
-            # Get data from IPFS
-            data = self.client.cat(ipfs_hash).decode('utf-8')
+            raw = self._fetch_raw(ipfs_hash)
+            fetched = time.perf_counter()
 
-            # Parse JSON data
-            ecg_data = json.loads(data)
+            decode_stage = 'binary_decode' if ecgCodec.is_binary(raw) or ecgCodec.is_manifest(raw) else 'json_decode'
+            ecg_data = self._decode_payload(raw)
+            gatewayMetrics.observe_ipfs(decode_stage, time.perf_counter() - fetched, True)
             print(f"✓ ECG data retrieved from IPFS: {ipfs_hash}")
+            if self.cache:
+                self.cache.put_record(ipfs_hash, ecg_data)
             return ecg_data
         except Exception as e:
+            if raw is not None:
+                gatewayMetrics.observe_ipfs(decode_stage, time.perf_counter() - fetched, False)
+                if self.cache:
+                    # Never keep serving a payload that does not decode
+                    self.cache.discard(ipfs_hash)
             print(f"⚠️ IPFS retrieval failed for {ipfs_hash}: {e}")
-            # Return mock data as fallback
-            return {
-                "patientInfo": {"id": "MOCK_PATIENT", "note": f"IPFS retrieval failed: {e}"},
-                "leads": {"I": [0.1, 0.2, 0.3], "II": [0.2, 0.3, 0.4]},
-                "analysis": {"heartRate": 75, "rhythm": "Normal"},
-                "mockData": True,
-                "ipfsHash": ipfs_hash,
-                "error": str(e)
+            raise IPFSReadError(f"IPFS retrieval failed for {ipfs_hash}: {e}") from e
+
+    def get_ecg_window(self, ipfs_hash, leads=None, start_s=0, end_s=None):
+        """
+        Retrieve some leads of a recording between two offsets
+
+        For chunked recordings only the manifest and the chunks overlapping the
+        window are fetched; single-payload recordings are fetched whole and cut.
+
+        Args:
+            ipfs_hash (str): IPFS hash of the recording
+            leads (list): lead names (None = all leads)
+            start_s: window start in seconds from the beginning of the recording
+            end_s: window end in seconds (None = end of the recording)
+
+        Returns:
+            dict: ipfsHash, samplingRate, startSample, endSample, leads {name: samples},
+                  missingLeads, chunksFetched, record (non-lead fields)
+
+        Raises:
+            Exception: IPFS or decoding failure
+        """
+        if self.cache:
+            record = self.cache.get_record(ipfs_hash)
+            if record is not None:
+                return self._window_from_record(ipfs_hash, record, leads, start_s, end_s)
+
+        raw = self._fetch_raw(ipfs_hash)
+        if not ecgCodec.is_manifest(raw):
+            record = self._decode_payload(raw)
+            if self.cache:
+                self.cache.put_record(ipfs_hash, record)
+            return self._window_from_record(ipfs_hash, record, leads, start_s, end_s)
+
+        manifest = ecgCodec.load_manifest(raw)
+        sampling_rate = manifest['samplingRate']
+        start_sample, end_sample = self._window_samples(sampling_rate, start_s, end_s)
+        names = leads or manifest['leadOrder']
+
+        selected = {}
+        for name in names:
+            if name in manifest['leads']:
+                selected[name] = ecgCodec.chunks_in_window(manifest, name, start_sample, end_sample)
+        cids = [chunk['cid'] for chunks in selected.values() for chunk in chunks]
+        raws = dict(zip(cids, self._chunk_executor.map(self._fetch_raw, cids)))
+
+        window = {}
+        for name in names:
+            if name in selected:
+                window[name] = ecgCodec.join_chunks(
+                    [(chunk, raws[chunk['cid']]) for chunk in selected[name]],
+                    start_sample, end_sample, manifest['leads'][name]['integer']
+                )
+            elif isinstance(manifest['jsonLeads'].get(name), list):
+                window[name] = manifest['jsonLeads'][name][start_sample:end_sample]
+
+        return {
+            'ipfsHash': ipfs_hash,
+            'samplingRate': sampling_rate,
+            'startSample': start_sample,
+            'endSample': end_sample,
+            'leads': window,
+            'missingLeads': [name for name in names if name not in window],
+            'chunksFetched': len(cids),
+            'record': manifest['record']
+        }
+
+    def get_ecg_preview(self, ipfs_hash, width, leads=None, start_s=0, end_s=None):
+        """
+        Min/max envelope of a recording with at most width points per lead
+
+        Chunked recordings are read from the coarsest stored pyramid level that
+        still has width points in the window, or from the raw chunks when no
+        level has or the chunks are fewer bytes; other recordings are decimated
+        from the decoded record.
+
+        Args:
+            width: target number of points (e.g. pixels) per lead
+            leads, start_s, end_s: as for get_ecg_window()
+
+        Returns:
+            dict: ipfsHash, samplingRate, startSample, endSample, level (stored
+                  factor read, 1 = raw samples), factor (samples per point),
+                  leads {name: {'min': [...], 'max': [...]}}, missingLeads, record
+
+        Raises:
+            Exception: IPFS or decoding failure
+        """
+        record = self.cache.get_record(ipfs_hash) if self.cache else None
+        manifest = None
+        if record is None:
+            raw = self._fetch_raw(ipfs_hash)
+            if ecgCodec.is_manifest(raw):
+                manifest = ecgCodec.load_manifest(raw)
+            else:
+                record = self._decode_payload(raw)
+                if self.cache:
+                    self.cache.put_record(ipfs_hash, record)
+
+        if manifest is not None:
+            sampling_rate = manifest['samplingRate']
+            start_sample, end_sample = self._window_samples(sampling_rate, start_s, end_s)
+            longest = max((lead['count'] for lead in manifest['leads'].values()), default=0)
+            span = min(end_sample or longest, longest) - start_sample
+            usable = [entry for entry in manifest.get('pyramid', []) if span // entry['factor'] >= width]
+            if usable:
+                entry = max(usable, key=lambda entry: entry['factor'])
+                # Levels are whole-recording objects, a short window can be cheaper from the raw chunks
+                raw_bytes = sum(
+                    chunk['length']
+                    for name in (leads or manifest['leadOrder']) if name in manifest['leads']
+                    for chunk in ecgCodec.chunks_in_window(manifest, name, start_sample, end_sample)
+                )
+                if raw_bytes < entry['bytes']:
+                    usable = []
+        else:
+            usable = []
+
+        if usable:
+            level, level_leads = entry['factor'], self._pyramid_level(entry['cid'])['leads']
+            names = leads or manifest['leadOrder']
+            first = start_sample // level
+            last = None if end_sample is None else -(-end_sample // level)
+            envelopes = {}
+            for name in names:
+                if isinstance(level_leads.get(name), list):
+                    interleaved = np.asarray(level_leads[name])
+                    envelopes[name] = (interleaved[0::2][first:last], interleaved[1::2][first:last])
+            window = {
+                'ipfsHash': ipfs_hash,
+                'samplingRate': sampling_rate,
+                'startSample': start_sample,
+                'endSample': end_sample,
+                'missingLeads': [name for name in names if name not in envelopes],
+                'record': manifest['record']
             }
+        else:
+            level = 1
+            if record is not None:
+                window = self._window_from_record(ipfs_hash, record, leads, start_s, end_s)
+            else:
+                window = self.get_ecg_window(ipfs_hash, leads, start_s, end_s)
+            envelopes = {}
+            for name, values in window['leads'].items():
+                if ecgCodec.is_numeric_lead(values):
+                    samples = np.asarray(values)
+                    envelopes[name] = (samples, samples)
+
+        points = max((len(mins) for mins, _ in envelopes.values()), default=0)
+        ratio = max(1, -(-points // max(1, width)))
+        preview = {}
+        for name, (mins, maxs) in envelopes.items():
+            mins, maxs = ecgCodec.reduce_minmax(mins, maxs, ratio)
+            preview[name] = {'min': mins.tolist(), 'max': maxs.tolist()}
+
+        return {
+            'ipfsHash': ipfs_hash,
+            'samplingRate': window['samplingRate'],
+            'startSample': window['startSample'],
+            'endSample': window['endSample'],
+            'level': level,
+            'factor': level * ratio,
+            'leads': preview,
+            'missingLeads': window['missingLeads'],
+            'record': window['record']
+        }
+
+    def _pyramid_level(self, cid):
+        """Decoded pyramid level, kept in the record cache like any other payload"""
+        level = self.cache.get_record(cid) if self.cache else None
+        if level is None:
+            level = ecgCodec.decode_ecg(self._fetch_raw(cid))
+            if self.cache:
+                self.cache.put_record(cid, level)
+        return level
+
+    @staticmethod
+    def _window_samples(sampling_rate, start_s, end_s):
+        if not sampling_rate:
+            raise ValueError("recording has no samplingRate, cannot map seconds to samples")
+        # The epsilon keeps e.g. 64.99 s * 500 Hz from flooring to 32494
+        start_sample = max(0, int(math.floor(start_s * sampling_rate + 1e-9)))
+        end_sample = None if end_s is None else max(start_sample, int(math.ceil(end_s * sampling_rate - 1e-9)))
+        return start_sample, end_sample
+
+    def _window_from_record(self, ipfs_hash, record, leads, start_s, end_s):
+        sampling_rate = (record.get('recordInfo') or {}).get('samplingRate')
+        start_sample, end_sample = self._window_samples(sampling_rate, start_s, end_s)
+        all_leads = record.get('leads') or {}
+        names = leads or list(all_leads)
+        window = {
+            name: all_leads[name][start_sample:end_sample]
+            for name in names if isinstance(all_leads.get(name), list)
+        }
+        return {
+            'ipfsHash': ipfs_hash,
+            'samplingRate': sampling_rate,
+            'startSample': start_sample,
+            'endSample': end_sample,
+            'leads': window,
+            'missingLeads': [name for name in names if name not in window],
+            'chunksFetched': 0,
+            'record': {key: value for key, value in record.items() if key != 'leads'}
+        }
+
+    def _fetch_raw(self, ipfs_hash):
+        """Raw payload bytes from the disk cache or IPFS (raises on failure)"""
+        if self.cache:
+            raw = self.cache.get_raw(ipfs_hash)
+            if raw is not None:
+                return raw
+        if not self.client:
+            raise ConnectionError("No IPFS connection")
+
+        started = time.perf_counter()
+        try:
+            raw = self.client.cat(ipfs_hash)
+        except Exception:
+            gatewayMetrics.observe_ipfs('cat', time.perf_counter() - started, False)
+            raise
+        gatewayMetrics.observe_ipfs('cat', time.perf_counter() - started, True, len(raw))
+        if self.cache:
+            self.cache.put_raw(ipfs_hash, raw)
+        return raw
+
+    def _decode_payload(self, raw):
+        # Chunk manifest, binary container or a JSON CID from before the binary format
+        if ecgCodec.is_manifest(raw):
+            manifest = ecgCodec.load_manifest(raw)
+            cids = [chunk['cid'] for lead in manifest['leads'].values() for chunk in lead['chunks']]
+            raws = dict(zip(cids, self._chunk_executor.map(self._fetch_raw, cids)))
+            decoded = dict(manifest['jsonLeads'])
+            for name, lead in manifest['leads'].items():
+                decoded[name] = ecgCodec.join_chunks(
+                    [(chunk, raws[chunk['cid']]) for chunk in lead['chunks']], integer=lead['integer']
+                )
+            ecg_data = dict(manifest['record'])
+            ecg_data['leads'] = {name: decoded[name] for name in manifest['leadOrder'] if name in decoded}
+            return ecg_data
+        if ecgCodec.is_binary(raw):
+            return ecgCodec.decode_ecg(raw)
+        return json.loads(raw.decode('utf-8'))
+
+    def prefetch(self, ipfs_hashes):
+        """
+        Warm the cache for CIDs likely to be read soon, in the background
+
+        Args:
+            ipfs_hashes: iterable of CIDs (cached CIDs and mock hashes of old records are skipped)
+
+        Returns:
+            int: number of fetches scheduled
+        """
+        if not self.cache or not self.client:
+            return 0
+        scheduled = 0
+        for ipfs_hash in ipfs_hashes:
+            if not ipfs_hash or ipfs_hash.startswith('QmMockHash') or self.cache.contains(ipfs_hash):
+                continue
+            with self._prefetch_lock:
+                if ipfs_hash in self._prefetching:
+                    continue
+                self._prefetching.add(ipfs_hash)
+            self._prefetch_executor.submit(self._prefetch_one, ipfs_hash)
+            scheduled += 1
+        return scheduled
+
+    def _prefetch_one(self, ipfs_hash):
+        try:
+            with admissionControl.prioritized(admissionControl.PRIORITY_BACKGROUND):
+                self.get_ecg_data(ipfs_hash)
+        finally:
+            with self._prefetch_lock:
+                self._prefetching.discard(ipfs_hash)
+
+    def upload_many(self, records):
+        """
+        Upload several ECG records concurrently
+
+        Args:
+            records (list): ECG data dicts
+
+        Returns:
+            list: IPFS hashes in input order
+
+        Raises:
+            IPFSUploadError: the first upload that failed
+        """
+        return list(self._batch_executor.map(self.upload_ecg_data, records))
+
+    def get_many(self, ipfs_hashes):
+        """
+        Retrieve several ECG records concurrently (cache hits are not re-fetched)
+
+        Returns:
+            dict: IPFS hash -> ECG data
+
+        Raises:
+            IPFSReadError: the first read that failed
+        """
+        unique = list(dict.fromkeys(ipfs_hashes))
+        return dict(zip(unique, self._batch_executor.map(self.get_ecg_data, unique)))
+
+    def check_availability(self, ipfs_hash):
+        """
+        Check that a CID is retrievable from IPFS without downloading it
+
+        Args:
+            ipfs_hash (str): IPFS hash to check
+
+        Returns:
+            dict: {'available': bool, 'size': cumulative size or None, 'error': ...}
+        """
+        if not self.client:
+            return {"available": False, "size": None, "error": "No IPFS connection"}
+        
+        started = time.perf_counter()
+        try:
+            stat = self.client.files.stat(f"/ipfs/{ipfs_hash}")
+            gatewayMetrics.observe_ipfs('stat', time.perf_counter() - started, True)
+            return {"available": True, "size": stat.get('CumulativeSize', stat.get('Size'))}
+        except Exception as e:
+            gatewayMetrics.observe_ipfs('stat', time.perf_counter() - started, False)
+            return {"available": False, "size": None, "error": str(e)}
     
     def get_status(self):
         """Get IPFS connection status"""
         if not self.client:
             return {
                 "status": "disconnected", 
-                "error": "No IPFS connection",
-                "fallback": "Using mock data"
+                "error": "No IPFS connection"
             }
         
         try:
             version = self.client.version()
-            return {
-                "status": "connected",
+            status = {
+                "status": "degraded" if self.fallback else "connected",
                 "version": version['Version'],
-                "api": "172.20.1.6:5001",
-                "peer_id": version.get('PeerID', 'unknown')
+                "api": self.api_address,
+                "backend": self.backend_name,
+                "peer_id": version.get('PeerID', 'unknown'),
+                "http": self.client.get_stats() if hasattr(self.client, 'get_stats') else None,
+                "cache": self.cache.get_stats() if self.cache else None,
+                "dedup": self.pinned_index.get_stats() if self.pinned_index is not None else None
             }
+            if self.fallback:
+                status["warning"] = "IPFS daemon unreachable, serving from the local fallback store"
+            return status
         except Exception as e:
             return {
                 "status": "error", 
-                "error": str(e),
-                "fallback": "Using mock data"
+                "error": str(e)
             }
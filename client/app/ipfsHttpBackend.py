@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from admissionControl import AdmissionPool, AdmissionRejected
+
+
+class IPFSHttpError(Exception):
+    pass
+
+
+class IPFSHttpBackend:
+    """
+    Thread-safe IPFS (Kubo) HTTP API client over one pooled requests session.
+
+    Keep-alive connections are shared by all Flask threads, at most
+    max_concurrency calls run at once (callers beyond that wait for a slot in
+    the priority order of admissionControl, so reads overtake bulk adds) and
+    every call has a connect and a read timeout. Exposes the subset of the
+    ipfshttpclient API that IPFSClient uses (version, add, add_bytes, cat,
+    files.stat) so the two are interchangeable.
+    """
+
+    def __init__(self, api_url='http://172.20.1.6:5001/api/v0', max_concurrency=32, timeout=30.0,
+                 connect_timeout=3.0, slot_timeout=None):
+        """
+        Args:
+            api_url: base URL of the IPFS HTTP API
+            max_concurrency: concurrent calls (also the connection pool size)
+            timeout: default read timeout per call in seconds
+            connect_timeout: TCP connect timeout in seconds
+            slot_timeout: seconds to wait for a free slot (None waits forever)
+        """
+        self.api_url = api_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.slot_timeout = slot_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._slots = AdmissionPool('ipfs', max_concurrency, max_wait=slot_timeout)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'slotWaitMs': 0.0}
+
+        # ipfshttpclient exposes MFS calls under client.files
+        self.files = self
+
+    def _call(self, command, params=None, data=None, headers=None, timeout=None, stream=False):
+        wait_started = time.perf_counter()
+        try:
+            self._slots.acquire()
+        except AdmissionRejected:
+            raise IPFSHttpError(f"no free IPFS slot within {self.slot_timeout}s ({self.max_concurrency} in flight)")
+        with self._lock:
+            self.stats['slotWaitMs'] += (time.perf_counter() - wait_started) * 1000
+            self._in_flight += 1
+            self.stats['calls'] += 1
+        try:
+            response = self.session.post(
+                f"{self.api_url}/{command}", params=params, data=data, headers=headers,
+                timeout=(self.connect_timeout, timeout or self.timeout), stream=stream
+            )
+            if response.status_code != 200:
+                try:
+                    message = response.json().get('Message', response.text)
+                except ValueError:
+                    message = response.text
+                raise IPFSHttpError(f"{command} failed ({response.status_code}): {message}")
+            return response
+        except requests.Timeout as e:
+            with self._lock:
+                self.stats['timeouts'] += 1
+                self.stats['errors'] += 1
+            raise IPFSHttpError(f"{command} timed out: {e}")
+        except Exception:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    @staticmethod
+    def _multipart(chunks):
+        """Single-file multipart/form-data body generator, so large adds are streamed"""
+        boundary = uuid.uuid4().hex
+
+        def body():
+            yield (f'--{boundary}\r\n'
+                   'Content-Disposition: form-data; name="file"; filename="ecg"\r\n'
+                   'Content-Type: application/octet-stream\r\n\r\n').encode()
+            for chunk in chunks:
+                if chunk:
+                    yield chunk
+            yield f'\r\n--{boundary}--\r\n'.encode()
+
+        return body(), {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+    def version(self, timeout=None):
+        return self._call('version', timeout=timeout).json()
+
+    def add(self, file, timeout=None, chunk_size=256 * 1024):
+        """
+        Add the content of a file-like object (read until EOF)
+
+        Returns:
+            dict: {'Name', 'Hash', 'Size'}
+        """
+        def chunks():
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+        body, headers = self._multipart(chunks())
+        response = self._call('add', params={'pin': 'true'}, data=body, headers=headers, timeout=timeout)
+        # Directory-wrapping adds return one JSON object per line, the last is the root
+        return json.loads(response.text.strip().splitlines()[-1])
+
+    def add_bytes(self, data, timeout=None):
+        """Add bytes, returns the CID"""
+        body, headers = self._multipart([data])
+        response = self._call('add', params={'pin': 'true'}, data=b''.join(body), headers=headers, timeout=timeout)
+        return json.loads(response.text.strip().splitlines()[-1])['Hash']
+
+    def cat(self, cid, timeout=None):
+        return self._call('cat', params={'arg': cid}, timeout=timeout).content
+
+    def stat(self, path, timeout=None):
+        """MFS stat, reached as files.stat('/ipfs/<cid>') like ipfshttpclient"""
+        return self._call('files/stat', params={'arg': path}, timeout=timeout).json()
+
+    def pin_rm(self, cid, timeout=None):
+        return self._call('pin/rm', params={'arg': cid}, timeout=timeout).json()
+
+    def close(self):
+        self.session.close()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                slotWaitMs=round(self.stats['slotWaitMs'], 1),
+                inFlight=self._in_flight,
+                maxConcurrency=self.max_concurrency,
+                timeout=self.timeout,
+                slots=self._slots.get_stats()
+            )
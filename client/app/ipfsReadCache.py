@@ -0,0 +1,254 @@
+import os
+import threading
+from collections import OrderedDict
+
+import gatewayMetrics
+import ipfsCid
+
+# Rough in-memory cost of one decoded sample (list slot + float object)
+SAMPLE_BYTES = 32
+RECORD_OVERHEAD_BYTES = 4096
+
+
+def estimate_record_bytes(record):
+    """Approximate memory held by a decoded ECG record"""
+    samples = 0
+    for values in (record.get('leads') or {}).values():
+        if isinstance(values, list):
+            samples += len(values)
+    return samples * SAMPLE_BYTES + RECORD_OVERHEAD_BYTES
+
+
+class IPFSReadCache:
+    """
+    Two-tier cache for immutable IPFS payloads.
+
+    Tier 1 is an LRU of decoded records bounded by an estimate of their memory
+    size. Tier 2 keeps the raw payload bytes on disk under the CID, bounded by
+    total file size and evicted least recently used first, so a restart or a
+    memory eviction does not go back to the IPFS daemon. The payloads are
+    patient data: the directory and its files are private to the gateway user,
+    and a file is only served if its content still hashes to its CID. CIDs
+    never change content, so entries are never invalidated; records handed
+    out are shared and must be treated as read-only.
+    """
+
+    def __init__(self, memory_bytes=256 * 1024 * 1024, disk_dir=None, disk_bytes=2 * 1024 * 1024 * 1024):
+        """
+        Args:
+            memory_bytes: budget for decoded records (0 disables the memory tier)
+            disk_dir: directory for raw payloads (None disables the disk tier)
+            disk_bytes: budget for files in disk_dir
+        """
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+
+        self._memory = OrderedDict()      # cid -> (record, estimated bytes)
+        self._memory_used = 0
+        self._disk = OrderedDict()        # cid -> file size, least recently used first
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'memoryHits': 0, 'memoryMisses': 0, 'diskHits': 0, 'diskMisses': 0,
+            'memoryEvictions': 0, 'diskEvictions': 0, 'diskErrors': 0
+        }
+
+        if self.disk_dir:
+            self._make_private_dir(self.disk_dir)
+            self._load_disk_index()
+
+    @classmethod
+    def from_env(cls):
+        """Build from IPFS_CACHE_* environment variables (sizes in MB, the disk tier needs IPFS_CACHE_DIR)"""
+        disk_dir = os.getenv('IPFS_CACHE_DIR', 'off')
+        return cls(
+            memory_bytes=int(float(os.getenv('IPFS_CACHE_MEMORY_MB', '256')) * 1024 * 1024),
+            disk_dir=None if disk_dir.lower() == 'off' else disk_dir,
+            disk_bytes=int(float(os.getenv('IPFS_CACHE_DISK_MB', '2048')) * 1024 * 1024)
+        )
+
+    @staticmethod
+    def _make_private_dir(path):
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        # makedirs leaves an existing directory's mode alone
+        os.chmod(path, 0o700)
+
+    def _path(self, cid):
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.disk_dir, cid[-2:], cid)
+
+    def _load_disk_index(self):
+        """Rebuild the disk index from files left by a previous run, oldest access first"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, cid, size in sorted(entries):
+            self._disk[cid] = size
+            self._disk_used += size
+        self._evict_disk()
+
+    def get_record(self, cid):
+        """Decoded record from the memory tier, or None"""
+        with self._lock:
+            entry = self._memory.get(cid)
+            if entry is None:
+                self.stats['memoryMisses'] += 1
+                gatewayMetrics.IPFS_CACHE_LOOKUPS.labels('memory', 'miss').inc()
+                return None
+            self._memory.move_to_end(cid)
+            self.stats['memoryHits'] += 1
+        gatewayMetrics.IPFS_CACHE_LOOKUPS.labels('memory', 'hit').inc()
+        return entry[0]
+
+    def put_record(self, cid, record):
+        size = estimate_record_bytes(record)
+        if size > self.memory_bytes:
+            return False
+        with self._lock:
+            previous = self._memory.pop(cid, None)
+            if previous is not None:
+                self._memory_used -= previous[1]
+            self._memory[cid] = (record, size)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_used -= evicted_size
+                self.stats['memoryEvictions'] += 1
+            gatewayMetrics.IPFS_CACHE_BYTES.labels('memory').set(self._memory_used)
+        return True
+
+    def get_raw(self, cid):
+        """Raw payload bytes from the disk tier, or None"""
+        if not self.disk_dir:
+            return None
+        with self._lock:
+            known = cid in self._disk
+            if known:
+                self._disk.move_to_end(cid)
+            else:
+                self.stats['diskMisses'] += 1
+        if not known:
+            gatewayMetrics.IPFS_CACHE_LOOKUPS.labels('disk', 'miss').inc()
+            return None
+
+        path = self._path(cid)
+        try:
+            with open(path, 'rb') as handle:
+                raw = handle.read()
+            os.utime(path)
+        except OSError:
+            # File removed behind our back, forget it
+            with self._lock:
+                self._forget_disk(cid)
+                self.stats['diskErrors'] += 1
+            gatewayMetrics.IPFS_CACHE_LOOKUPS.labels('disk', 'miss').inc()
+            return None
+
+        if ipfsCid.compute_cid(raw) != cid:
+            # Corrupted or replaced file (or a daemon CID not made with default add settings)
+            print(f"⚠️ IPFS disk cache entry for {cid} does not match its CID, dropped")
+            self.discard(cid)
+            with self._lock:
+                self.stats['diskErrors'] += 1
+            gatewayMetrics.IPFS_CACHE_LOOKUPS.labels('disk', 'miss').inc()
+            return None
+
+        with self._lock:
+            self.stats['diskHits'] += 1
+        gatewayMetrics.IPFS_CACHE_LOOKUPS.labels('disk', 'hit').inc()
+        return raw
+
+    def put_raw(self, cid, raw):
+        if not self.disk_dir or len(raw) > self.disk_bytes:
+            return False
+        if ipfsCid.compute_cid(raw) != cid:
+            # get_raw could never serve it back
+            return False
+        with self._lock:
+            if cid in self._disk:
+                self._disk.move_to_end(cid)
+                return True
+
+        path = self._path(cid)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            self._make_private_dir(os.path.dirname(path))
+            with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as handle:
+                handle.write(raw)
+            # Readers only ever see complete files
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ IPFS disk cache write failed for {cid}: {e}")
+            with self._lock:
+                self.stats['diskErrors'] += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+        with self._lock:
+            if cid not in self._disk:
+                self._disk[cid] = len(raw)
+                self._disk_used += len(raw)
+            self._evict_disk()
+        return True
+
+    def discard(self, cid):
+        """Drop a CID from both tiers (e.g. a payload that no longer decodes)"""
+        with self._lock:
+            entry = self._memory.pop(cid, None)
+            if entry is not None:
+                self._memory_used -= entry[1]
+            known = cid in self._disk
+            self._forget_disk(cid)
+        if known:
+            try:
+                os.remove(self._path(cid))
+            except OSError:
+                pass
+
+    def contains(self, cid):
+        with self._lock:
+            return cid in self._memory or cid in self._disk
+
+    def _forget_disk(self, cid):
+        size = self._disk.pop(cid, None)
+        if size is not None:
+            self._disk_used -= size
+
+    def _evict_disk(self):
+        while self._disk_used > self.disk_bytes and self._disk:
+            cid, size = self._disk.popitem(last=False)
+            self._disk_used -= size
+            self.stats['diskEvictions'] += 1
+            try:
+                os.remove(self._path(cid))
+            except OSError:
+                pass
+        gatewayMetrics.IPFS_CACHE_BYTES.labels('disk').set(self._disk_used)
+
+    def get_stats(self):
+        with self._lock:
+            memory_lookups = self.stats['memoryHits'] + self.stats['memoryMisses']
+            disk_lookups = self.stats['diskHits'] + self.stats['diskMisses']
+            return dict(
+                self.stats,
+                memoryEntries=len(self._memory),
+                memoryBytes=self._memory_used,
+                memoryLimitBytes=self.memory_bytes,
+                diskEntries=len(self._disk),
+                diskBytes=self._disk_used,
+                diskLimitBytes=self.disk_bytes,
+                diskDir=self.disk_dir,
+                memoryHitRate=round(self.stats['memoryHits'] / memory_lookups, 3) if memory_lookups else None,
+                diskHitRate=round(self.stats['diskHits'] / disk_lookups, 3) if disk_lookups else None
+            )
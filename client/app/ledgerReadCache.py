@@ -0,0 +1,129 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+
+class LedgerReadCache:
+    """
+    Size-bounded LRU cache for chaincode query results.
+
+    Entries are keyed by (function, args, user role) and indexed by the ledger
+    keys they read (the patient ID). A committed write to one of those keys,
+    seen in a block event or made by this client, drops every entry that read it.
+    A read that overlapped an invalidation is not stored, so a slow query can
+    never put a pre-commit value back into the cache.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()     # cache key -> (value, ledger keys)
+        self._by_ledger_key = {}          # ledger key -> {cache key, ...}
+        self._invalidated_at = {}         # ledger key -> sequence of its last invalidation
+        self._sequence = itertools.count(1)
+        self._last_sequence = 0
+        self._trimmed_before = 0          # invalidations older than this were forgotten
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0, 'staleSkips': 0}
+
+    @staticmethod
+    def make_key(chaincode_call, user_role):
+        return (chaincode_call['function'], tuple(chaincode_call.get('Args', [])), user_role)
+
+    def begin(self):
+        """Token taken before running a query, passed back to put()"""
+        with self._lock:
+            return self._last_sequence
+
+    def get(self, key):
+        """Cached value or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, value, ledger_keys, token):
+        """Store a query result unless one of its ledger keys changed since begin()"""
+        with self._lock:
+            if token < self._trimmed_before or any(
+                self._invalidated_at.get(ledger_key, 0) > token for ledger_key in ledger_keys
+            ):
+                self.stats['staleSkips'] += 1
+                return False
+
+            self._remove(key)
+            self._entries[key] = (value, ledger_keys)
+            for ledger_key in ledger_keys:
+                self._by_ledger_key.setdefault(ledger_key, set()).add(key)
+            self.stats['stores'] += 1
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+            return True
+
+    def invalidate(self, ledger_keys):
+        """Drop every entry that read one of the given ledger keys"""
+        with self._lock:
+            sequence = next(self._sequence)
+            self._last_sequence = sequence
+            for ledger_key in ledger_keys:
+                self._invalidated_at[ledger_key] = sequence
+                for key in list(self._by_ledger_key.get(ledger_key, ())):
+                    self._remove(key)
+                    self.stats['invalidations'] += 1
+            self._trim_invalidations()
+
+    def clear(self):
+        """Drop everything, used when block events may have been missed"""
+        with self._lock:
+            sequence = next(self._sequence)
+            self._last_sequence = sequence
+            for ledger_key in list(self._by_ledger_key):
+                self._invalidated_at[ledger_key] = sequence
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._by_ledger_key.clear()
+            self._trim_invalidations()
+
+    def handle_block(self, block_info, namespace):
+        """Block event callback, invalidates the keys written by valid transactions"""
+        written = set()
+        for tx in block_info['transactions']:
+            if tx['valid']:
+                written.update(tx.get('writeSet', {}).get(namespace, ()))
+        if written:
+            self.invalidate(written)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                maxEntries=self.max_entries,
+                hitRate=round(self.stats['hits'] / lookups, 3) if lookups else None
+            )
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for ledger_key in entry[1]:
+            keys = self._by_ledger_key.get(ledger_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_ledger_key[ledger_key]
+
+    def _trim_invalidations(self):
+        # Only reads still in flight care about old invalidations; keep the map bounded
+        limit = self.max_entries * 4
+        if len(self._invalidated_at) > limit:
+            cutoff = sorted(self._invalidated_at.values())[-limit]
+            self._trimmed_before = cutoff
+            self._invalidated_at = {k: v for k, v in self._invalidated_at.items() if v >= cutoff}
@@ -0,0 +1,191 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+import ipfsCid
+from admissionControl import AdmissionPool
+
+
+class LocalIPFSError(Exception):
+    pass
+
+
+class LocalIPFSBackend:
+    """
+    In-process stand-in for the IPFS daemon.
+
+    Content is stored on disk under the CID `ipfs add` would return (see
+    ipfsCid.compute_cid), so hashes on the ledger stay valid once the data is
+    pushed to a real node. Exposes the same interface as IPFSHttpBackend
+    (version, add, add_bytes, cat, files.stat, pin_rm) and simulates a round
+    trip latency per call and a shared link bandwidth for the bytes moved, so
+    IPFS-bound throughput can be benchmarked without a daemon.
+    """
+
+    def __init__(self, root_dir, latency=0.0, bandwidth=0.0, jitter=0.2, max_concurrency=32):
+        """
+        Args:
+            root_dir: directory holding one file per CID
+            latency: simulated round trip per call in seconds
+            bandwidth: simulated link bandwidth in bytes per second (0 is unlimited)
+            jitter: +/- fraction applied to the simulated latency
+            max_concurrency: concurrent calls, like IPFSHttpBackend
+        """
+        self.root_dir = root_dir
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        # Holds patient ECG payloads, private to the gateway user
+        os.makedirs(self.root_dir, mode=0o700, exist_ok=True)
+        os.chmod(self.root_dir, 0o700)
+
+        self._slots = AdmissionPool('ipfs', max_concurrency)
+        self._lock = threading.Lock()
+        self._link_free_at = 0.0          # monotonic time the simulated link is idle again
+        self._in_flight = 0
+        self.stats = {'calls': 0, 'errors': 0, 'bytesIn': 0, 'bytesOut': 0, 'shapedMs': 0.0}
+
+        # ipfshttpclient exposes MFS calls under client.files
+        self.files = self
+
+    @classmethod
+    def from_env(cls, max_concurrency=32):
+        """Build from LOCAL_IPFS_* environment variables (latency in ms, bandwidth in Mbit/s)"""
+        return cls(
+            os.getenv('LOCAL_IPFS_DIR', os.path.join(tempfile.gettempdir(), 'ecg-local-ipfs')),
+            latency=float(os.getenv('LOCAL_IPFS_LATENCY_MS', '0')) / 1000,
+            bandwidth=float(os.getenv('LOCAL_IPFS_BANDWIDTH_MBPS', '0')) * 1000 * 1000 / 8,
+            jitter=float(os.getenv('LOCAL_IPFS_JITTER', '0.2')),
+            max_concurrency=max_concurrency
+        )
+
+    def _path(self, cid):
+        # Same two-character fan-out as the IPFS read cache
+        return os.path.join(self.root_dir, cid[-2:], cid)
+
+    def _shape(self, size):
+        """Sleep for one round trip plus the transfer time of size bytes on the shared link"""
+        delay = self.latency * random.uniform(1 - self.jitter, 1 + self.jitter) if self.latency else 0.0
+        now = time.monotonic()
+        if self.bandwidth and size:
+            with self._lock:
+                # Transfers queue behind each other, concurrent calls share the bandwidth
+                start = max(now, self._link_free_at)
+                self._link_free_at = start + size / self.bandwidth
+                delay += self._link_free_at - now
+        if delay > 0:
+            time.sleep(delay)
+            with self._lock:
+                self.stats['shapedMs'] += delay * 1000
+
+    def _call(self, operation, size_in=0):
+        self._slots.acquire()
+        with self._lock:
+            self._in_flight += 1
+            self.stats['calls'] += 1
+            self.stats['bytesIn'] += size_in
+        try:
+            result = operation()
+        except Exception:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+        return result
+
+    def version(self, timeout=None):
+        return {'Version': 'local', 'Repo': self.root_dir}
+
+    def add(self, file, timeout=None, chunk_size=256 * 1024):
+        """
+        Add the content of a file-like object (read until EOF)
+
+        Returns:
+            dict: {'Name', 'Hash', 'Size'}
+        """
+        data = bytearray()
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            data += chunk
+        cid = self.add_bytes(bytes(data), timeout)
+        return {'Name': cid, 'Hash': cid, 'Size': str(len(data))}
+
+    def add_bytes(self, data, timeout=None):
+        """Add bytes, returns the CID"""
+        def operation():
+            self._shape(len(data))
+            cid = ipfsCid.compute_cid(data)
+            path = self._path(cid)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as handle:
+                    handle.write(data)
+                os.replace(tmp_path, path)
+            return cid
+
+        return self._call(operation, len(data))
+
+    def cat(self, cid, timeout=None):
+        def operation():
+            try:
+                with open(self._path(cid), 'rb') as handle:
+                    data = handle.read()
+            except OSError:
+                self._shape(0)
+                raise LocalIPFSError(f"cat failed: {cid} not found")
+            self._shape(len(data))
+            with self._lock:
+                self.stats['bytesOut'] += len(data)
+            return data
+
+        return self._call(operation)
+
+    def stat(self, path, timeout=None):
+        """MFS stat, reached as files.stat('/ipfs/<cid>') like ipfshttpclient"""
+        cid = path.rsplit('/', 1)[-1]
+
+        def operation():
+            self._shape(0)
+            try:
+                size = os.path.getsize(self._path(cid))
+            except OSError:
+                raise LocalIPFSError(f"files/stat failed: {cid} not found")
+            return {'Hash': cid, 'Size': size, 'CumulativeSize': size, 'Type': 'file'}
+
+        return self._call(operation)
+
+    def pin_rm(self, cid, timeout=None):
+        """Unpin, the content is removed right away (no separate GC)"""
+        def operation():
+            self._shape(0)
+            try:
+                os.remove(self._path(cid))
+            except OSError:
+                raise LocalIPFSError(f"pin/rm failed: {cid} is not pinned")
+            return {'Pins': [cid]}
+
+        return self._call(operation)
+
+    def close(self):
+        pass
+
+    def get_stats(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                shapedMs=round(self.stats['shapedMs'], 1),
+                inFlight=self._in_flight,
+                maxConcurrency=self.max_concurrency,
+                latencyMs=self.latency * 1000,
+                bandwidthMbps=round(self.bandwidth * 8 / 1000 / 1000, 3) if self.bandwidth else None,
+                slots=self._slots.get_stats()
+            )
@@ -0,0 +1,680 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# Upper bound on records per storeECGDataBatch transaction (same as ecg.js)
+MAX_BATCH_SIZE = 1000
+
+
+class ChaincodeError(Exception):
+    """Raised by the emulated contract, becomes an endorsement failure"""
+
+
+def _dumps(value):
+    # JSON.stringify output: no whitespace, insertion order
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _iso_timestamp(seconds):
+    # Date.prototype.toISOString()
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + f"{int(seconds * 1000) % 1000:03d}Z"
+
+
+def _is_blank(value):
+    return not value or str(value).strip() == ''
+
+
+class _TxContext:
+    """Minimal ctx.stub / ctx.clientIdentity for one simulated transaction"""
+
+    def __init__(self, ledger, client_id, tx_timestamp, tx_id=None):
+        self.ledger = ledger
+        self.tx_id = tx_id
+        self.client_id = client_id
+        self.tx_timestamp = tx_timestamp
+        self.read_set = {}      # key -> version read (None = absent)
+        self.write_set = {}     # key -> value
+        self.event = None       # Fabric keeps the last event set per transaction
+
+    def get_state(self, key):
+        # Like Fabric, reads see committed state only, not this transaction's writes
+        value, version = self.ledger._read(key)
+        self.read_set.setdefault(key, version)
+        return value
+
+    def put_state(self, key, value):
+        self.write_set[key] = value
+
+    def set_event(self, name, payload):
+        self.event = {'eventName': name, 'payload': payload}
+
+
+class ECGContractEmulator:
+    """
+    Python port of chaincode/ecg_chaincode/lib/ecg.js.
+    Keeps the same validation rules, state layout, events and error messages.
+    """
+
+    TRANSACTIONS = (
+        'initLedger', 'storeECGData', 'storeECGDataBatch', 'confirmECGData', 'grantAccess',
+        'revokeAccess', 'accessECGData', 'getDataStatus', 'getAuditTrail', 'getMyIdentity'
+    )
+
+    def invoke(self, ctx, function, args):
+        if function not in self.TRANSACTIONS:
+            raise ChaincodeError(f"You've asked to invoke a function that does not exist: {function}")
+        return getattr(self, function)(ctx, *args)
+
+    def _get_ecg_data(self, ctx, patient_id):
+        value = ctx.get_state(patient_id)
+        if not value:
+            raise ChaincodeError(f"Patient data for {patient_id} not found")
+        return json.loads(value)
+
+    def _tx_timestamp(self, ctx):
+        return _iso_timestamp(ctx.tx_timestamp)
+
+    def _build_ecg_data(self, patient_id, ipfs_hash, timestamp, parsed_metadata, owner_id, input_by):
+        return {
+            'patientID': patient_id,
+            'ipfsHash': ipfs_hash,
+            'timestamp': timestamp,
+            'metadata': parsed_metadata,
+            'status': 'PENDING_VERIFICATION',
+            'accessControl': {
+                'owner': owner_id,
+                'authorizedUsers': []
+            },
+            'accessHistory': [],
+            'inputBy': input_by,
+            'createdAt': timestamp,
+            'lastStatusUpdate': timestamp
+        }
+
+    def _validate_batch_record(self, record, seen_patient_ids):
+        if not isinstance(record, dict):
+            return 'Record must be an object'
+        if _is_blank(record.get('patientID')):
+            return 'patientID is required'
+        if _is_blank(record.get('ipfsHash')):
+            return 'ipfsHash is required'
+        if _is_blank(record.get('patientOwnerClientID')):
+            return 'Patient owner client ID is required'
+        if record['patientID'] in seen_patient_ids:
+            return f"Duplicate patientID {record['patientID']} in batch"
+        if isinstance(record.get('metadata'), str):
+            try:
+                json.loads(record['metadata'] or '{}')
+            except ValueError as e:
+                return f"Invalid metadata JSON: {e}"
+        return None
+
+    def initLedger(self, ctx):
+        return ''
+
+    def storeECGData(self, ctx, patient_id, ipfs_hash, timestamp, metadata, owner_id):
+        input_by = ctx.client_id
+        if _is_blank(owner_id):
+            raise ChaincodeError('Patient owner client ID is required')
+
+        try:
+            parsed_metadata = json.loads(metadata or '{}')
+        except ValueError as e:
+            raise ChaincodeError(str(e))
+        timestamp = timestamp or self._tx_timestamp(ctx)
+
+        ecg_data = self._build_ecg_data(patient_id, ipfs_hash, timestamp, parsed_metadata, owner_id, input_by)
+        ctx.put_state(patient_id, _dumps(ecg_data))
+
+        # ecg.js sets ECGDataStored first; Fabric only keeps the last event
+        ctx.set_event('VerifyIPFSData', {
+            'eventType': 'VERIFY_IPFS_DATA',
+            'patientID': patient_id,
+            'ipfsHash': ipfs_hash,
+            'timestamp': timestamp,
+            'requestedBy': input_by,
+            'owner': owner_id,
+            'verificationTimeout': 300
+        })
+
+        return _dumps({
+            'txId': ctx.tx_id,
+            'status': 'success',
+            'message': 'ECG data stored successfully with PENDING verification status',
+            'patientID': patient_id,
+            'owner': owner_id,
+            'inputBy': input_by,
+            'verificationStatus': 'PENDING_VERIFICATION',
+            'eventEmitted': True
+        })
+
+    def storeECGDataBatch(self, ctx, records_json):
+        input_by = ctx.client_id
+
+        try:
+            records = json.loads(records_json or '[]')
+        except ValueError as e:
+            raise ChaincodeError(f"Invalid batch payload: {e}")
+        if not isinstance(records, list) or not records:
+            raise ChaincodeError('Batch must be a non-empty array of ECG records')
+        if len(records) > MAX_BATCH_SIZE:
+            raise ChaincodeError(f"Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})")
+
+        batch_timestamp = self._tx_timestamp(ctx)
+        seen_patient_ids = set()
+        results = []
+        stored_records = []
+
+        for index, record in enumerate(records):
+            error = self._validate_batch_record(record, seen_patient_ids)
+            if error:
+                results.append({
+                    'index': index,
+                    'patientID': record.get('patientID') if isinstance(record, dict) else None,
+                    'status': 'REJECTED',
+                    'error': error
+                })
+                continue
+            seen_patient_ids.add(record['patientID'])
+
+            metadata = record.get('metadata')
+            parsed_metadata = json.loads(metadata or '{}') if isinstance(metadata, str) else (metadata or {})
+            record_timestamp = record.get('timestamp') or batch_timestamp
+
+            ecg_data = self._build_ecg_data(record['patientID'], record['ipfsHash'], record_timestamp,
+                                            parsed_metadata, record['patientOwnerClientID'], input_by)
+            ctx.put_state(record['patientID'], _dumps(ecg_data))
+
+            stored_records.append({'patientID': record['patientID'], 'ipfsHash': record['ipfsHash'],
+                                   'owner': record['patientOwnerClientID']})
+            results.append({
+                'index': index,
+                'patientID': record['patientID'],
+                'ipfsHash': record['ipfsHash'],
+                'status': 'PENDING_VERIFICATION'
+            })
+
+        if stored_records:
+            ctx.set_event('VerifyIPFSData', {
+                'eventType': 'VERIFY_IPFS_DATA_BATCH',
+                'records': stored_records,
+                'timestamp': batch_timestamp,
+                'requestedBy': input_by,
+                'verificationTimeout': 300
+            })
+
+        return _dumps({
+            'txId': ctx.tx_id,
+            'status': 'success',
+            'message': f"ECG batch processed: {len(stored_records)} stored, {len(records) - len(stored_records)} rejected",
+            'total': len(records),
+            'stored': len(stored_records),
+            'rejected': len(records) - len(stored_records),
+            'inputBy': input_by,
+            'results': results
+        })
+
+    def confirmECGData(self, ctx, patient_id, is_valid, verification_details):
+        ecg_data = self._get_ecg_data(ctx, patient_id)
+        verifier = ctx.client_id
+
+        if ecg_data['status'] != 'PENDING_VERIFICATION':
+            raise ChaincodeError(
+                f"ECG data for patient {patient_id} is not in PENDING_VERIFICATION status. Current status: {ecg_data['status']}"
+            )
+
+        timestamp = self._tx_timestamp(ctx)
+        new_status = 'CONFIRMED' if is_valid in ('true', True) else 'FAILED'
+        ecg_data['status'] = new_status
+        ecg_data['lastStatusUpdate'] = timestamp
+        ecg_data['verificationDetails'] = {
+            'verifiedBy': verifier,
+            'verifiedAt': timestamp,
+            'isValid': new_status == 'CONFIRMED',
+            'details': verification_details or 'Automated verification'
+        }
+        ctx.put_state(patient_id, _dumps(ecg_data))
+
+        ctx.set_event('ECGVerificationCompleted', {
+            'eventType': 'ECG_VERIFICATION_COMPLETED',
+            'patientID': patient_id,
+            'verificationResult': new_status,
+            'verifiedBy': verifier,
+            'timestamp': timestamp,
+            'ipfsHash': ecg_data['ipfsHash'],
+            'notificationMessage': f"ECG data verification {new_status.lower()} for patient {patient_id}"
+        })
+
+        return _dumps({
+            'txId': ctx.tx_id,
+            'status': 'success',
+            'message': f"ECG data verification completed for patient {patient_id}",
+            'verificationResult': new_status,
+            'verifiedBy': verifier,
+            'verifiedAt': timestamp
+        })
+
+    def grantAccess(self, ctx, patient_id, doctor_id):
+        ecg_data = self._get_ecg_data(ctx, patient_id)
+        caller = ctx.client_id
+        access_control = ecg_data['accessControl']
+
+        if ecg_data['status'] != 'CONFIRMED':
+            raise ChaincodeError(
+                f"Cannot grant access to unverified ECG data. Current status: {ecg_data['status']}. Data must be CONFIRMED first."
+            )
+        if caller != access_control['owner']:
+            raise ChaincodeError(
+                f"Only the patient owner ({access_control['owner']}) can grant access to their data. Current caller: {caller}"
+            )
+        if doctor_id in access_control['authorizedUsers']:
+            raise ChaincodeError(f"Doctor {doctor_id} already has access to patient {patient_id} data")
+
+        access_control['authorizedUsers'].append(doctor_id)
+        timestamp = self._tx_timestamp(ctx)
+        ecg_data['lastStatusUpdate'] = timestamp
+        ctx.put_state(patient_id, _dumps(ecg_data))
+
+        ctx.set_event('AccessGranted', {
+            'eventType': 'ACCESS_GRANTED',
+            'patientID': patient_id,
+            'grantedTo': doctor_id,
+            'grantedBy': caller,
+            'timestamp': timestamp,
+            'ipfsHash': ecg_data['ipfsHash'],
+            'notificationMessage': f"Access granted to {doctor_id} for patient {patient_id}"
+        })
+
+        return _dumps({
+            'txId': ctx.tx_id,
+            'status': 'success',
+            'message': f"Access granted to doctor {doctor_id} for patient {patient_id}",
+            'grantedBy': caller,
+            'grantedTo': doctor_id,
+            'currentAuthorizedUsers': access_control['authorizedUsers']
+        })
+
+    def revokeAccess(self, ctx, patient_id, doctor_id):
+        ecg_data = self._get_ecg_data(ctx, patient_id)
+        caller = ctx.client_id
+        access_control = ecg_data['accessControl']
+
+        if caller != access_control['owner']:
+            raise ChaincodeError(
+                f"Only the patient owner ({access_control['owner']}) can revoke access to their data. Current caller: {caller}"
+            )
+        if doctor_id not in access_control['authorizedUsers']:
+            raise ChaincodeError(f"Doctor {doctor_id} does not have access to patient {patient_id} data")
+
+        access_control['authorizedUsers'].remove(doctor_id)
+        timestamp = self._tx_timestamp(ctx)
+        ecg_data['lastStatusUpdate'] = timestamp
+        ctx.put_state(patient_id, _dumps(ecg_data))
+
+        ctx.set_event('AccessRevoked', {
+            'eventType': 'ACCESS_REVOKED',
+            'patientID': patient_id,
+            'revokedFrom': doctor_id,
+            'revokedBy': caller,
+            'timestamp': timestamp,
+            'ipfsHash': ecg_data['ipfsHash'],
+            'notificationMessage': f"Access revoked from {doctor_id} for patient {patient_id}"
+        })
+
+        return _dumps({
+            'txId': ctx.tx_id,
+            'status': 'success',
+            'message': f"Access revoked from doctor {doctor_id} for patient {patient_id}",
+            'revokedBy': caller,
+            'revokedFrom': doctor_id,
+            'currentAuthorizedUsers': access_control['authorizedUsers']
+        })
+
+    def accessECGData(self, ctx, patient_id):
+        ecg_data = self._get_ecg_data(ctx, patient_id)
+        accessor = ctx.client_id
+
+        if ecg_data['status'] != 'CONFIRMED':
+            raise ChaincodeError(
+                f"ECG data for patient {patient_id} is not verified. Current status: {ecg_data['status']}. Only CONFIRMED data can be accessed."
+            )
+
+        is_owner = accessor == ecg_data['accessControl']['owner']
+        if not is_owner and accessor not in ecg_data['accessControl']['authorizedUsers']:
+            raise ChaincodeError('Access denied. Only the patient owner or authorized doctors can access this ECG data.')
+
+        timestamp = self._tx_timestamp(ctx)
+        access_record = {
+            'accessorID': accessor,
+            'accessTime': timestamp,
+            'accessType': 'OWNER_ACCESS' if is_owner else 'AUTHORIZED_ACCESS',
+            'ipfsHash': ecg_data['ipfsHash']
+        }
+        ecg_data['accessHistory'].append(access_record)
+        ecg_data['lastStatusUpdate'] = timestamp
+        ctx.put_state(patient_id, _dumps(ecg_data))
+
+        ctx.set_event('ECGDataAccessed', {
+            'eventType': 'ECG_DATA_ACCESSED',
+            'patientID': patient_id,
+            'accessedBy': accessor,
+            'accessType': access_record['accessType'],
+            'timestamp': timestamp,
+            'ipfsHash': ecg_data['ipfsHash'],
+            'notificationMessage': f"ECG data accessed by {accessor} for patient {patient_id}"
+        })
+
+        result = {
+            'patientID': ecg_data['patientID'],
+            'ipfsHash': ecg_data['ipfsHash'],
+            'timestamp': ecg_data['timestamp'],
+            'metadata': ecg_data['metadata'],
+            'status': ecg_data['status'],
+            'accessorType': access_record['accessType'],
+            'accessTime': access_record['accessTime']
+        }
+        # JSON.stringify drops undefined values
+        if 'verificationDetails' in ecg_data:
+            result['verificationDetails'] = ecg_data['verificationDetails']
+        return _dumps(result)
+
+    def getDataStatus(self, ctx, patient_id):
+        ecg_data = self._get_ecg_data(ctx, patient_id)
+        accessor = ctx.client_id
+
+        is_owner = accessor == ecg_data['accessControl']['owner']
+        if not is_owner and accessor not in ecg_data['accessControl']['authorizedUsers']:
+            raise ChaincodeError('Access denied. Only the patient owner or authorized doctors can check data status.')
+
+        return _dumps({
+            'patientID': ecg_data['patientID'],
+            'status': ecg_data['status'],
+            'createdAt': ecg_data['createdAt'],
+            'lastStatusUpdate': ecg_data['lastStatusUpdate'],
+            'verificationDetails': ecg_data.get('verificationDetails'),
+            'accessibleForDataAccess': ecg_data['status'] == 'CONFIRMED'
+        })
+
+    def getAuditTrail(self, ctx, patient_id):
+        ecg_data = self._get_ecg_data(ctx, patient_id)
+        accessor = ctx.client_id
+
+        if accessor != ecg_data['accessControl']['owner']:
+            raise ChaincodeError(
+                f"Only the patient owner can view the complete audit trail. Owner: {ecg_data['accessControl']['owner']}"
+            )
+
+        result = {
+            'patientID': patient_id,
+            'currentStatus': ecg_data['status'],
+            'auditTrail': ecg_data['accessHistory'],
+            'currentAuthorizedUsers': ecg_data['accessControl']['authorizedUsers'],
+            'dataInputBy': ecg_data['inputBy'],
+            'owner': ecg_data['accessControl']['owner']
+        }
+        if 'verificationDetails' in ecg_data:
+            result['verificationDetails'] = ecg_data['verificationDetails']
+        result['createdAt'] = ecg_data['createdAt']
+        result['lastStatusUpdate'] = ecg_data['lastStatusUpdate']
+        return _dumps(result)
+
+    def getMyIdentity(self, ctx):
+        return ctx.client_id
+
+
+class LocalLedgerBackend:
+    """
+    In-process stand-in for the Fabric network.
+
+    Executes the ECGContract rules against an in-memory world state with
+    Fabric's MVCC validation: a transaction records the versions it read at
+    endorsement, and is committed as MVCC_READ_CONFLICT if any of those keys
+    changed before its block was cut. Endorsement and ordering latency are
+    simulated, blocks are cut by size or timeout and delivered to block
+    callbacks in the same shape as fabricBlockEvents.parse_block, so the
+    commit tracker, read cache and verification scheduler behave as on the
+    real network.
+    """
+
+    def __init__(self, chaincode_name, identity_mappings, endorse_latency=0.0, order_latency=0.0,
+                 batch_size=10, batch_timeout=0.2, jitter=0.2):
+        """
+        Args:
+            chaincode_name: namespace used in block write sets
+            identity_mappings: role -> {'msp_id', 'msp_path'} from FabricGatewayClient
+            endorse_latency: simulated proposal round trip in seconds
+            order_latency: simulated orderer broadcast round trip in seconds
+            batch_size: transactions per block (orderer BatchSize.MaxMessageCount)
+            batch_timeout: seconds before a partial block is cut (orderer BatchTimeout)
+            jitter: +/- fraction applied to the simulated latencies
+        """
+        self.chaincode_name = chaincode_name
+        self.identity_mappings = identity_mappings
+        self.endorse_latency = endorse_latency
+        self.order_latency = order_latency
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.jitter = jitter
+
+        self.contract = ECGContractEmulator()
+        self.connected = True
+
+        self._state = {}          # key -> (value, (block number, tx number))
+        self._state_lock = threading.Lock()
+        self._height = 0
+
+        self._pending = []        # ordered transactions waiting for the next block
+        self._first_pending = None
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        self._callbacks = []
+        self.stats = {'blocks': 0, 'transactions': 0, 'mvccConflicts': 0, 'endorsementFailures': 0}
+
+        self._block_thread = threading.Thread(target=self._run_block_cutter, name='local-ledger-blocks', daemon=True)
+        self._block_thread.start()
+
+        print(f"🧪 LocalLedgerBackend started (endorse {endorse_latency * 1000:.0f} ms, "
+              f"order {order_latency * 1000:.0f} ms, block {batch_size} tx / {batch_timeout * 1000:.0f} ms)")
+
+    @classmethod
+    def from_env(cls, chaincode_name, identity_mappings):
+        """Build from LOCAL_LEDGER_* environment variables (latencies in ms)"""
+        return cls(
+            chaincode_name,
+            identity_mappings,
+            endorse_latency=float(os.getenv('LOCAL_LEDGER_ENDORSE_MS', '0')) / 1000,
+            order_latency=float(os.getenv('LOCAL_LEDGER_ORDER_MS', '0')) / 1000,
+            batch_size=int(os.getenv('LOCAL_LEDGER_BATCH_SIZE', '10')),
+            batch_timeout=float(os.getenv('LOCAL_LEDGER_BATCH_TIMEOUT_MS', '200')) / 1000,
+            jitter=float(os.getenv('LOCAL_LEDGER_JITTER', '0.2'))
+        )
+
+    # Block event listener interface (see fabricBlockEvents.BlockEventListener)
+
+    def add_callback(self, callback):
+        """Register callback(block_info) for every committed block"""
+        self._callbacks.append(callback)
+
+    def add_disconnect_callback(self, callback):
+        # Blocks are delivered in-process and can never be missed
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def client_id(self, user_role):
+        """X.509 client ID string the chaincode would see for a role"""
+        mapping = self.identity_mappings.get(user_role, self.identity_mappings['admin'])
+        user = os.path.basename(os.path.dirname(mapping['msp_path'].rstrip('/')))
+        org = user.split('@', 1)[1]
+        ou = 'admin' if user.startswith('Admin@') else 'client'
+        return (f"x509::/C=US/ST=California/L=San Francisco/OU={ou}/CN={user}"
+                f"::/C=US/ST=California/L=San Francisco/O={org}/CN=ca.{org}")
+
+    def _read(self, key):
+        with self._state_lock:
+            return self._state.get(key, (None, None))
+
+    def _delay(self, base):
+        if base <= 0:
+            return 0.0
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _simulate(self, chaincode_call, user_role):
+        """Run the contract function, returns (tx_id, ctx, output) or raises ChaincodeError"""
+        tx_id = hashlib.sha256(os.urandom(24) + user_role.encode('utf-8')).hexdigest()
+        ctx = _TxContext(self, self.client_id(user_role), time.time(), tx_id)
+        output = self.contract.invoke(ctx, chaincode_call['function'], chaincode_call.get('Args', []))
+        return tx_id, ctx, output
+
+    def _order(self, tx_id, ctx):
+        with self._condition:
+            if not self._pending:
+                self._first_pending = time.monotonic()
+            self._pending.append((tx_id, ctx))
+            self._condition.notify()
+
+    def _run_block_cutter(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._pending:
+                        remaining = self._first_pending + self.batch_timeout - time.monotonic()
+                        if len(self._pending) >= self.batch_size or remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                batch = self._pending[:self.batch_size]
+                self._pending = self._pending[self.batch_size:]
+                self._first_pending = time.monotonic() if self._pending else None
+
+            self._commit_block(batch)
+
+    def _commit_block(self, batch):
+        transactions = []
+        with self._state_lock:
+            block_number = self._height
+            for tx_number, (tx_id, ctx) in enumerate(batch):
+                conflict = any(
+                    self._state.get(key, (None, None))[1] != version
+                    for key, version in ctx.read_set.items()
+                )
+                if conflict:
+                    self.stats['mvccConflicts'] += 1
+                else:
+                    for key, value in ctx.write_set.items():
+                        self._state[key] = (value, (block_number, tx_number))
+
+                transactions.append({
+                    'txId': tx_id,
+                    'validationCode': 'MVCC_READ_CONFLICT' if conflict else 'VALID',
+                    'valid': not conflict,
+                    'chaincodeEvents': [dict(ctx.event, chaincodeId=self.chaincode_name)] if ctx.event else [],
+                    'writeSet': {self.chaincode_name: list(ctx.write_set)} if ctx.write_set else {}
+                })
+            self._height += 1
+            self.stats['blocks'] += 1
+            self.stats['transactions'] += len(batch)
+
+        block_info = {'blockNumber': block_number, 'transactions': transactions}
+        for callback in self._callbacks:
+            try:
+                callback(block_info)
+            except Exception as e:
+                print(f"⚠️ Block callback error: {e}")
+
+    def _success_result(self, output, tx_id, user_role, timings):
+        try:
+            payload_data = json.loads(output) if output else None
+        except ValueError:
+            payload_data = output
+
+        return {
+            'success': True,
+            'output': output,
+            'error': '',
+            'returnCode': 0,
+            'payload': payload_data,
+            'userRole': user_role,
+            'mspId': self.identity_mappings[user_role]['msp_id'],
+            'txId': tx_id,
+            'timings': timings
+        }
+
+    def _error_result(self, error, user_role):
+        if isinstance(error, ChaincodeError):
+            self.stats['endorsementFailures'] += 1
+            message = f"endorsement failure: chaincode response 500, {error}"
+        else:
+            message = str(error)
+        return {'success': False, 'error': message, 'returnCode': 1, 'userRole': user_role}
+
+    def _timings(self, started, endorsed, ordered):
+        return {
+            'startedAt': started,
+            'orderedAt': ordered,
+            'endorseMs': round((endorsed - started) * 1000, 1),
+            'orderMs': round((ordered - endorsed) * 1000, 1)
+        }
+
+    def execute(self, chaincode_call, is_query=False, user_role='admin'):
+        """Evaluate or submit a chaincode call, returning the peer CLI result shape"""
+        try:
+            started = time.time()
+            time.sleep(self._delay(self.endorse_latency))
+            tx_id, ctx, output = self._simulate(chaincode_call, user_role)
+            endorsed = ordered = time.time()
+
+            if not is_query:
+                time.sleep(self._delay(self.order_latency))
+                self._order(tx_id, ctx)
+                ordered = time.time()
+
+            return self._success_result(output, tx_id, user_role, self._timings(started, endorsed, ordered))
+
+        except Exception as e:
+            return self._error_result(e, user_role)
+
+    async def execute_async(self, chaincode_call, is_query=False, user_role='admin'):
+        """Asyncio variant of execute(); latencies are awaited instead of slept"""
+        try:
+            started = time.time()
+            await asyncio.sleep(self._delay(self.endorse_latency))
+            tx_id, ctx, output = self._simulate(chaincode_call, user_role)
+            endorsed = ordered = time.time()
+
+            if not is_query:
+                await asyncio.sleep(self._delay(self.order_latency))
+                self._order(tx_id, ctx)
+                ordered = time.time()
+
+            return self._success_result(output, tx_id, user_role, self._timings(started, endorsed, ordered))
+
+        except Exception as e:
+            return self._error_result(e, user_role)
+
+    def get_stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        with self._state_lock:
+            return dict(self.stats, height=self._height, keys=len(self._state), pendingTransactions=pending)
+
+    def close(self):
+        self.stop()
+
+    async def close_async(self):
+        pass
@@ -0,0 +1,174 @@
+import random
+import re
+import threading
+import time
+
+# Peer CLI / gRPC messages that mean the peer itself was unreachable or too slow,
+# as opposed to the chaincode rejecting the call
+CONNECTIVITY_ERROR_PATTERNS = re.compile(
+    r'UNAVAILABLE|DEADLINE_EXCEEDED|deadline exceeded|connection refused|failed to connect|'
+    r'failed to create new connection|error getting endorser client|no route to host|'
+    r'connection reset|transport is closing|i/o timeout|timed out',
+    re.IGNORECASE
+)
+
+
+class PeerSelector:
+    """
+    Tracks latency and health of every peer and picks peers for each call.
+
+    Latency is an exponentially weighted moving average (EWMA) per peer. Queries
+    use power-of-two-choices over healthy peers, weighted by EWMA and calls in
+    flight, so reads spread over all peers while slow ones get less traffic.
+    Submits take the best healthy peer of each organization. A peer with
+    failure_threshold consecutive connectivity failures is skipped for a
+    cooldown that doubles up to max_cooldown, then it gets a single trial call.
+    """
+
+    def __init__(self, peers, alpha=0.3, failure_threshold=2, cooldown=5.0, max_cooldown=60.0):
+        """
+        Args:
+            peers (dict): peer name -> {'address', 'mspId', 'tlsRootCert'}
+            alpha: EWMA weight of the newest latency sample
+            failure_threshold: consecutive failures before a peer is marked down
+            cooldown: first down period in seconds
+            max_cooldown: upper bound for the down period
+        """
+        self.peers = peers
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._state = {
+            name: {
+                'ewmaMs': None,
+                'inFlight': 0,
+                'consecutiveFailures': 0,
+                'downUntil': 0.0,
+                'downCount': 0,
+                'successes': 0,
+                'failures': 0,
+                'lastError': None
+            }
+            for name in peers
+        }
+
+    @staticmethod
+    def is_connectivity_error(message):
+        return bool(message) and CONNECTIVITY_ERROR_PATTERNS.search(str(message)) is not None
+
+    def peer_for_address(self, message):
+        """Name of the peer whose address appears in an error message, if any"""
+        for name, peer in self.peers.items():
+            if peer['address'] in str(message):
+                return name
+        return None
+
+    def _score(self, name):
+        state = self._state[name]
+        # Unmeasured peers score 0 so they get probed early
+        ewma = state['ewmaMs'] or 0.0
+        return ewma * (1 + state['inFlight'])
+
+    def _candidates(self, names, exclude):
+        """Healthy peers first; if none is healthy, the ones that come back soonest"""
+        now = time.monotonic()
+        names = [name for name in names if name not in exclude]
+        healthy = [name for name in names if self._state[name]['downUntil'] <= now]
+        if healthy:
+            return healthy
+        return sorted(names, key=lambda name: self._state[name]['downUntil'])[:1]
+
+    def select_query_peer(self, exclude=()):
+        """Peer to evaluate a query on, or None when every peer is excluded"""
+        with self._lock:
+            candidates = self._candidates(self.peers, exclude)
+            if not candidates:
+                return None
+            if len(candidates) == 1:
+                return candidates[0]
+            first, second = random.sample(candidates, 2)
+            return first if self._score(first) <= self._score(second) else second
+
+    def select_endorsers(self, exclude=()):
+        """Best peer of every organization, in a stable org order"""
+        with self._lock:
+            by_org = {}
+            for name, peer in self.peers.items():
+                by_org.setdefault(peer['mspId'], []).append(name)
+
+            endorsers = []
+            for msp_id in sorted(by_org):
+                candidates = self._candidates(by_org[msp_id], exclude)
+                if candidates:
+                    endorsers.append(min(candidates, key=self._score))
+            return endorsers
+
+    def select_endorser(self, msp_id, exclude=()):
+        """Best peer of one organization, or None"""
+        with self._lock:
+            names = [name for name, peer in self.peers.items() if peer['mspId'] == msp_id]
+            candidates = self._candidates(names, exclude)
+            return min(candidates, key=self._score) if candidates else None
+
+    def start(self, name):
+        """Mark a call as in flight, returns the start time for finish()"""
+        with self._lock:
+            self._state[name]['inFlight'] += 1
+        return time.monotonic()
+
+    def finish(self, name, started, ok, error=None, record_latency=True):
+        """
+        Record the outcome of a call started with start()
+
+        Args:
+            ok: False only for connectivity failures (chaincode errors still mean the peer is up)
+            record_latency: False when the duration is not the peer's alone (e.g. CLI invoke)
+        """
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            state = self._state[name]
+            state['inFlight'] = max(0, state['inFlight'] - 1)
+
+            if ok:
+                state['successes'] += 1
+                state['consecutiveFailures'] = 0
+                state['downCount'] = 0
+                if record_latency:
+                    if state['ewmaMs'] is None:
+                        state['ewmaMs'] = elapsed_ms
+                    else:
+                        state['ewmaMs'] = self.alpha * elapsed_ms + (1 - self.alpha) * state['ewmaMs']
+                return
+
+            state['failures'] += 1
+            state['consecutiveFailures'] += 1
+            state['lastError'] = str(error)[:200] if error else None
+            # A failing call is at least as slow as it took to fail
+            state['ewmaMs'] = max(state['ewmaMs'] or 0.0, elapsed_ms)
+            if state['consecutiveFailures'] >= self.failure_threshold:
+                down_for = min(self.max_cooldown, self.cooldown * (2 ** state['downCount']))
+                state['downUntil'] = time.monotonic() + down_for
+                state['downCount'] += 1
+                # One trial call after the cooldown decides whether it stays down
+                state['consecutiveFailures'] = self.failure_threshold - 1
+                print(f"⚠️ Peer {name} marked down for {down_for:.0f}s: {state['lastError']}")
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    'address': self.peers[name]['address'],
+                    'mspId': self.peers[name]['mspId'],
+                    'healthy': state['downUntil'] <= now,
+                    'ewmaMs': round(state['ewmaMs'], 1) if state['ewmaMs'] is not None else None,
+                    'inFlight': state['inFlight'],
+                    'successes': state['successes'],
+                    'failures': state['failures'],
+                    'lastError': state['lastError']
+                }
+                for name, state in self._state.items()
+            }
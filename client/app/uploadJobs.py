@@ -0,0 +1,335 @@
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import admissionControl
+from admissionControl import AdmissionRejected
+from ipfsClient import IPFSUploadError
+
+
+class JobStageError(Exception):
+    def __init__(self, stage, error):
+        super().__init__(f"{stage} failed: {error}")
+        self.stage = stage
+
+
+class UploadJobManager:
+    """
+    Asynchronous /ecg/upload jobs.
+
+    A job is accepted right away and processed on a bounded worker pool
+    through the stages accepted, ipfs_stored, endorsed (storeECGData),
+    committed and verified (outcome reported by the VerificationScheduler). Each stage is retried
+    with exponential backoff before the job fails; pins of a failed job are
+    rolled back when none of its storeECGData transactions can have reached
+    the ledger. Job states are kept in memory
+    (bounded history) and looked up by ID.
+    """
+
+    def __init__(self, ipfs_client, fabric_client, workers=8, max_queued=1000, max_attempts=4,
+                 base_delay=1.0, max_delay=30.0, commit_timeout=60.0, history_size=10000):
+        """
+        Args:
+            ipfs_client: IPFSClient used for the add
+            fabric_client: FabricGatewayClient used for storeECGData
+            workers: jobs processed at once
+            max_queued: accepted jobs not finished processing before submit() rejects
+            max_attempts: attempts per stage before the job fails
+            base_delay: first retry delay in seconds, doubled per attempt
+            max_delay: upper bound for the retry delay in seconds
+            commit_timeout: seconds to wait for the commit of one submit attempt
+            history_size: finished jobs remembered
+        """
+        self.ipfs_client = ipfs_client
+        self.fabric_client = fabric_client
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.commit_timeout = commit_timeout
+        self.history_size = history_size
+
+        self._jobs = OrderedDict()        # job ID -> job dict
+        self._by_record = {}              # (patient ID, IPFS hash) -> job ID waiting for verification
+        self._idempotency = {}            # Idempotency-Key -> job ID
+        self._active = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ecg-upload-job')
+        self.stats = {'accepted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0, 'retries': 0, 'deduplicated': 0}
+
+        fabric_client.verification_scheduler.add_listener(self._on_verification)
+
+    @classmethod
+    def from_env(cls, ipfs_client, fabric_client):
+        """Build from ECG_UPLOAD_JOB_* environment variables"""
+        return cls(
+            ipfs_client,
+            fabric_client,
+            workers=int(os.getenv('ECG_UPLOAD_JOB_WORKERS', '8')),
+            max_queued=int(os.getenv('ECG_UPLOAD_JOB_MAX_QUEUED', '1000')),
+            max_attempts=int(os.getenv('ECG_UPLOAD_JOB_MAX_ATTEMPTS', '4')),
+            commit_timeout=float(os.getenv('ECG_UPLOAD_JOB_COMMIT_TIMEOUT', '60'))
+        )
+
+    def submit(self, patient_id, ecg_data, metadata, patient_owner_id, user_role, idempotency_key=None):
+        """
+        Accept an upload job
+
+        Args:
+            idempotency_key: client supplied key; a retried request with the same
+                key gets the existing job instead of a second upload
+
+        Returns:
+            dict: the job (see get())
+
+        Raises:
+            AdmissionRejected: max_queued jobs are already being processed
+        """
+        now = time.time()
+        with self._lock:
+            if idempotency_key and self._idempotency.get(idempotency_key) in self._jobs:
+                self.stats['deduplicated'] += 1
+                return self._snapshot(self._jobs[self._idempotency[idempotency_key]])
+            if self._active >= self.max_queued:
+                self.stats['rejected'] += 1
+                # Roughly the time the workers need to get through a queue's worth of jobs
+                retry_after = max(1, min(60, self._active // self.workers))
+                raise AdmissionRejected('jobs', 'queue full', retry_after)
+
+            job = {
+                'jobId': uuid.uuid4().hex,
+                'status': 'queued',
+                'stage': 'accepted',
+                'patientId': patient_id,
+                'userRole': user_role,
+                'ipfsHash': None,
+                'txId': None,
+                'verification': None,
+                'error': None,
+                'stages': {'accepted': {'at': now, 'attempts': 1}},
+                'createdAt': now,
+                'updatedAt': now
+            }
+            self._jobs[job['jobId']] = job
+            if idempotency_key:
+                job['idempotencyKey'] = idempotency_key
+                self._idempotency[idempotency_key] = job['jobId']
+            self._active += 1
+            self.stats['accepted'] += 1
+            self._trim()
+            snapshot = self._snapshot(job)
+
+        self._executor.submit(self._run, job, ecg_data, metadata, patient_owner_id)
+        return snapshot
+
+    def get(self, job_id):
+        """Job state, or None for an unknown (or long finished) job ID"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def get_stats(self):
+        with self._lock:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job['status']] = by_status.get(job['status'], 0) + 1
+            return dict(self.stats, active=self._active, workers=self.workers,
+                        maxQueued=self.max_queued, jobs=by_status)
+
+    def _snapshot(self, job):
+        return dict(job, stages={name: dict(stage) for name, stage in job['stages'].items()})
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond history_size (lock must be held)"""
+        excess = len(self._jobs) - self.history_size
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            job = self._jobs[job_id]
+            if job['status'] in ('succeeded', 'failed'):
+                del self._jobs[job_id]
+                self._idempotency.pop(job.get('idempotencyKey'), None)
+                excess -= 1
+
+    def _update(self, job, **changes):
+        with self._lock:
+            job.update(changes)
+            job['updatedAt'] = time.time()
+
+    def _advance(self, job, stage, attempts, **changes):
+        """Record a completed stage, returns the verification outcome seen so far"""
+        with self._lock:
+            job.update(changes)
+            job['stage'] = stage
+            job['stages'][stage] = dict(job['stages'].get(stage, {}), at=time.time(), attempts=attempts)
+            job['updatedAt'] = time.time()
+            return job['verification']
+
+    def _finish(self, job, status, error=None):
+        with self._lock:
+            if job['status'] in ('succeeded', 'failed'):
+                return
+            job['status'] = status
+            job['error'] = error
+            job['updatedAt'] = time.time()
+            self._by_record.pop((job['patientId'], job['ipfsHash']), None)
+            self.stats[status] += 1
+        print(f"{'✅' if status == 'succeeded' else '❌'} Upload job {job['jobId'][:8]} {status}"
+              f"{': ' + error if error else ''}")
+
+    def _attempt(self, job, stage, operation):
+        """Run operation until it succeeds or max_attempts is reached, returns (result, attempts)"""
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return operation(), attempt
+            except Exception as e:
+                error = e
+            if attempt < self.max_attempts:
+                delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1))) * random.uniform(0.8, 1.2)
+                with self._lock:
+                    self.stats['retries'] += 1
+                    job['stages'].setdefault(stage, {})['lastError'] = str(error)
+                print(f"🔁 Upload job {job['jobId'][:8]} {stage} retry in {delay:.1f}s: {error}")
+                time.sleep(delay)
+        raise JobStageError(stage, error)
+
+    def _add_to_ipfs(self, prepared, added):
+        try:
+            result = self.ipfs_client.commit_upload(prepared)
+        except IPFSUploadError as e:
+            added.extend(e.added)
+            raise
+        added.extend(result['added'])
+        return result['ipfsHash']
+
+    def _previous_commit(self, job, tx_id, timestamp, patient_owner_id):
+        """
+        Commit of an earlier storeECGData attempt that is still worth keeping, or None
+
+        The transaction may have committed after its wait timed out, possibly
+        without the block event being seen; the record then carries the job's
+        timestamp as createdAt. A status read that fails leaves that open, so
+        it raises and the check is retried instead of submitting again.
+        """
+        commit = self.fabric_client.wait_for_commit(tx_id, 0)
+        if commit['status'] == 'COMMITTED':
+            return commit if commit['valid'] else None
+        # getDataStatus only answers the record's owner and authorized users
+        role = self.fabric_client.role_for_client_id(patient_owner_id) or job['userRole']
+        result = self.fabric_client.get_data_status(job['patientId'], role)
+        if result.get('status') != 'success':
+            raise RuntimeError(f"outcome of transaction {tx_id} unknown, status read failed: {result.get('error')}")
+        data_status = result.get('dataStatus')
+        if isinstance(data_status, dict) and data_status.get('createdAt') == timestamp:
+            print(f"🔎 Upload job {job['jobId'][:8]}: transaction {tx_id} committed late, not resubmitted")
+            return {'txId': tx_id, 'status': 'COMMITTED', 'valid': True, 'validationCode': 'VALID', 'blockNumber': None}
+        return None
+
+    def _store(self, job, ipfs_hash, metadata, patient_owner_id, timestamp, submitted):
+        """
+        storeECGData and wait for its commit
+
+        storeECGData overwrites the record unconditionally, so a retry first
+        checks the previous attempt and only submits again when that one was
+        invalidated or never reached the ledger. Every submitted txId is
+        appended to submitted.
+        """
+        if job.get('txId'):
+            commit = self._previous_commit(job, job['txId'], timestamp, patient_owner_id)
+            if commit is not None:
+                return commit
+
+        result = self.fabric_client.store_ecg_data(
+            job['patientId'], ipfs_hash, metadata, patient_owner_id, job['userRole'], timestamp
+        )
+        if result.get('status') != 'success':
+            raise RuntimeError(result.get('error') or result.get('message'))
+        tx_id = result.get('txId')
+        if tx_id:
+            submitted.append(tx_id)
+        self._advance(job, 'endorsed', job['stages'].get('endorsed', {}).get('attempts', 0) + 1, txId=tx_id)
+        if not tx_id:
+            return None
+
+        commit = self.fabric_client.wait_for_commit(tx_id, self.commit_timeout)
+        if commit['status'] != 'COMMITTED':
+            raise RuntimeError(f"transaction {tx_id} not committed within {self.commit_timeout}s")
+        if not commit['valid']:
+            raise RuntimeError(f"transaction {tx_id} invalidated: {commit['validationCode']}")
+        return commit
+
+    def _all_invalidated(self, tx_ids):
+        """True when every submitted storeECGData committed as invalid (or none was submitted)"""
+        for tx_id in tx_ids:
+            commit = self.fabric_client.wait_for_commit(tx_id, 0)
+            if commit['status'] != 'COMMITTED' or commit['valid']:
+                return False
+        return True
+
+    def _run(self, job, ecg_data, metadata, patient_owner_id):
+        added = []
+        submitted = []
+        prepared = None
+        ledger_written = False
+        try:
+            with admissionControl.prioritized(admissionControl.PRIORITY_BULK):
+                self._update(job, status='running')
+
+                if not self.ipfs_client.client:
+                    raise JobStageError('ipfs_stored', IPFSUploadError("No IPFS connection", []))
+                prepared = self.ipfs_client.prepare_upload(ecg_data)
+                ipfs_hash, attempts = self._attempt(job, 'ipfs_stored', lambda: self._add_to_ipfs(prepared, added))
+                ecg_data = None
+                self._advance(job, 'ipfs_stored', attempts, ipfsHash=ipfs_hash)
+
+                with self._lock:
+                    # The verification outcome may arrive before the commit is seen
+                    self._by_record[(job['patientId'], ipfs_hash)] = job['jobId']
+                # One timestamp for every attempt, it identifies the job's write on the ledger
+                timestamp = datetime.now().isoformat()
+                commit, attempts = self._attempt(
+                    job, 'committed', lambda: self._store(job, ipfs_hash, metadata, patient_owner_id, timestamp, submitted)
+                )
+                ledger_written = True
+                verification = self._advance(job, 'committed', attempts,
+                                             blockNumber=commit.get('blockNumber') if commit else None)
+
+                if verification is not None:
+                    self._apply_verification(job, verification)
+                elif not self.fabric_client.start_verification(job['patientId'], ipfs_hash, owner_id=patient_owner_id):
+                    self._update(job, error='verification queue full, record stays PENDING_VERIFICATION')
+        except Exception as e:
+            # A transaction whose outcome is unknown may still have put the record on the ledger
+            if added and not ledger_written and self._all_invalidated(submitted):
+                self.ipfs_client.rollback_upload(added)
+            self._finish(job, 'failed', str(e))
+        finally:
+            if prepared is not None:
+                self.ipfs_client.release_upload(prepared)
+            with self._lock:
+                self._active -= 1
+
+    def _on_verification(self, patient_id, ipfs_hash, outcome):
+        """VerificationScheduler listener: completes the job of the record"""
+        with self._lock:
+            job = self._jobs.get(self._by_record.get((patient_id, ipfs_hash)))
+            if job is None:
+                return
+            job['verification'] = outcome
+            committed = job['stage'] == 'committed'
+        if committed:
+            self._apply_verification(job, outcome)
+
+    def _apply_verification(self, job, outcome):
+        if outcome == 'confirmed':
+            self._advance(job, 'verified', 1)
+            self._finish(job, 'succeeded')
+        else:
+            self._finish(job, 'failed', f"verification {outcome}")
@@ -0,0 +1,349 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import admissionControl
+import gatewayMetrics
+
+
+class VerificationScheduler:
+    """
+    Bounded worker pool that confirms PENDING_VERIFICATION records.
+
+    Each task stats the CID on IPFS and calls confirmECGData as soon as the
+    content is available, with the signal analysis from the analysis pool (if
+    any) in the verification details. A task only counts as confirmed once its
+    confirmECGData transaction committed as VALID (or the record's status reads
+    CONFIRMED); invalidated confirms are submitted again. Unavailable content
+    and failed confirms are retried with exponential backoff; after
+    max_attempts unavailable content is confirmed as FAILED. Tasks come from
+    the VerifyIPFSData event of a committed store, or from store_ecg_data once
+    its commit is known when no block events are received.
+    """
+
+    def __init__(self, fabric_client, ipfs_client=None, workers=4, max_queue=10000,
+                 max_attempts=6, base_delay=0.5, max_delay=30.0, analysis_pool=None,
+                 analysis_seconds=None, analysis_timeout=None, commit_timeout=None):
+        """
+        Args:
+            fabric_client: FabricGatewayClient used for confirmECGData
+            ipfs_client: IPFSClient used to check the CID (None skips the check)
+            workers: number of verification threads
+            max_queue: maximum queued + retrying tasks
+            max_attempts: attempts (IPFS checks and confirms) before the task fails;
+                unavailable content is then marked FAILED on the ledger
+            base_delay: first retry delay in seconds, doubled per attempt
+            max_delay: upper bound for the retry delay in seconds
+            analysis_pool: ecgAnalysis.ECGAnalysisPool (None skips the analysis)
+            analysis_seconds: leading part of the recording that is analysed
+                (default ECG_ANALYSIS_MAX_SECONDS or 120)
+            analysis_timeout: seconds to wait for the analysis
+                (default ECG_ANALYSIS_TIMEOUT or 30)
+            commit_timeout: seconds to wait for the commit of a confirmECGData
+                before the record's status is read instead
+                (default ECG_VERIFICATION_COMMIT_TIMEOUT or 60)
+        """
+        self.fabric_client = fabric_client
+        self.ipfs_client = ipfs_client
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.analysis_pool = analysis_pool
+        self.analysis_seconds = analysis_seconds or float(os.getenv('ECG_ANALYSIS_MAX_SECONDS', '120'))
+        self.analysis_timeout = analysis_timeout or float(os.getenv('ECG_ANALYSIS_TIMEOUT', '30'))
+        self.commit_timeout = commit_timeout or float(os.getenv('ECG_VERIFICATION_COMMIT_TIMEOUT', '60'))
+
+        self._heap = []                 # (due monotonic time, seq, task)
+        self._tracked = set()           # (patient_id, ipfs_hash) queued or in flight
+        self._cancelled = set()         # tracked keys to drop when they next come up
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._in_flight = 0
+        self._listeners = []
+
+        self.stats = {'submitted': 0, 'rejected': 0, 'confirmed': 0, 'failed': 0, 'retries': 0, 'cancelled': 0,
+                      'analyzed': 0, 'analysisErrors': 0, 'invalidatedConfirms': 0}
+        self._queue_waits = deque(maxlen=1000)
+        self._latencies = deque(maxlen=1000)
+
+        gatewayMetrics.VERIFICATION_QUEUE_DEPTH.set_function(lambda: len(self._heap))
+
+        self._workers = []
+        for index in range(workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'ecg-verifier-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        print(f"🔍 VerificationScheduler started ({workers} workers, queue limit {max_queue})")
+
+    def submit(self, patient_id, ipfs_hash, owner_id=None):
+        """
+        Queue a record for verification, returns False when the queue is full
+
+        Args:
+            owner_id: patientOwnerClientID of the record; its status is read with the
+                identity that owns it (default: the patient role)
+        """
+        key = (patient_id, ipfs_hash)
+        now = time.monotonic()
+        with self._condition:
+            if key in self._tracked:
+                # A new VerifyIPFSData for the record outranks an earlier cancel
+                self._cancelled.discard(key)
+                return True
+            if len(self._heap) >= self.max_queue:
+                self.stats['rejected'] += 1
+                print(f"⚠️ Verification queue full, {patient_id} stays PENDING_VERIFICATION")
+                return False
+
+            task = {
+                'patientId': patient_id,
+                'ipfsHash': ipfs_hash,
+                'ownerId': owner_id,
+                'attempts': 0,
+                'enqueuedAt': now
+            }
+            self._tracked.add(key)
+            heapq.heappush(self._heap, (now, next(self._sequence), task))
+            self.stats['submitted'] += 1
+            self._condition.notify()
+        return True
+
+    def cancel(self, patient_id, ipfs_hash):
+        """Drop a queued verification (e.g. the IPFS add failed and the record is marked FAILED)"""
+        key = (patient_id, ipfs_hash)
+        with self._condition:
+            if key not in self._tracked:
+                return False
+            self._cancelled.add(key)
+        return True
+
+    def add_listener(self, callback):
+        """Call callback(patient_id, ipfs_hash, outcome) when a task ends ('confirmed', 'failed', 'cancelled')"""
+        self._listeners.append(callback)
+
+    def handle_chaincode_event(self, event_name, payload):
+        """Feed a VerifyIPFSData event (single record or batch) into the queue"""
+        if event_name != 'VerifyIPFSData' or not isinstance(payload, dict):
+            return
+        records = payload.get('records') or [payload]
+        for record in records:
+            if record.get('patientID') and record.get('ipfsHash'):
+                self.submit(record['patientID'], record['ipfsHash'], record.get('owner'))
+
+    def get_stats(self):
+        """Queue depth, throughput counters and latency summary"""
+        with self._condition:
+            queued = len(self._heap)
+            in_flight = self._in_flight
+            queue_waits = list(self._queue_waits)
+            latencies = list(self._latencies)
+
+        return dict(
+            self.stats,
+            queueDepth=queued,
+            inFlight=in_flight,
+            workers=len(self._workers),
+            queueWaitMs=self._summarize(queue_waits),
+            latencyMs=self._summarize(latencies)
+        )
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _summarize(self, samples):
+        if not samples:
+            return {'avg': None, 'p95': None, 'max': None}
+        ordered = sorted(samples)
+        return {
+            'avg': round(sum(ordered) / len(ordered) * 1000, 1),
+            'p95': round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1),
+            'max': round(ordered[-1] * 1000, 1)
+        }
+
+    def _worker_loop(self):
+        # IPFS stats from verification yield to request traffic
+        admissionControl.set_priority(admissionControl.PRIORITY_BACKGROUND)
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._heap:
+                        delay = self._heap[0][0] - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                _, _, task = heapq.heappop(self._heap)
+                self._in_flight += 1
+
+            try:
+                self._process(task)
+            except Exception as e:
+                print(f"❌ Verification error for {task['patientId']}: {e}")
+                self._retry_or_fail(task, str(e), mark_failed=False)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+
+    def _check_ipfs(self, ipfs_hash):
+        if self.ipfs_client is None:
+            return {'available': True, 'size': None, 'checked': False}
+        return self.ipfs_client.check_availability(ipfs_hash)
+
+    def _process(self, task):
+        if task.get('confirmTxId'):
+            self._check_confirm_commit(task)
+            return
+
+        with self._condition:
+            cancelled = (task['patientId'], task['ipfsHash']) in self._cancelled
+        if cancelled:
+            self._finish(task, 'cancelled')
+            print(f"🚫 Verification cancelled for {task['patientId']}")
+            return
+
+        if task['attempts'] == 0:
+            queue_wait = time.monotonic() - task['enqueuedAt']
+            self._queue_waits.append(queue_wait)
+            gatewayMetrics.VERIFICATION_QUEUE_WAIT_SECONDS.observe(queue_wait)
+        task['attempts'] += 1
+
+        availability = self._check_ipfs(task['ipfsHash'])
+        if not availability.get('available'):
+            self._retry_or_fail(task, availability.get('error', 'CID not available'), mark_failed=True)
+            return
+
+        details = task.get('details')
+        if details is None:
+            details = f"IPFS verified - Hash: {task['ipfsHash'][:20]}..."
+            if availability.get('size') is not None:
+                details += f" ({availability['size']} bytes, attempt {task['attempts']})"
+            analysis = self._analyze(task)
+            if analysis is not None:
+                details += f"; analysis {json.dumps(analysis, separators=(',', ':'))}"
+            # Kept for the confirms submitted again after an invalidation
+            task['details'] = details
+
+        result = self.fabric_client.confirm_ecg_data(task['patientId'], True, details)
+        if result.get('status') == 'success' and result.get('txId'):
+            self._await_commit(task, result['txId'])
+        elif result.get('status') == 'success':
+            # No transaction to follow: the record decides
+            self._resolve_from_ledger(task, "Ledger confirmation not visible: no txId")
+        else:
+            # Rejected confirms include records an earlier confirm already moved out of
+            # PENDING_VERIFICATION, so the record decides here too
+            self._resolve_from_ledger(task, f"Ledger confirmation failed: {result.get('error')}")
+
+    def _await_commit(self, task, tx_id):
+        """Park the task until its confirmECGData commits, polled so no worker blocks on it"""
+        now = time.monotonic()
+        task['confirmTxId'] = tx_id
+        task['commitDeadline'] = now + self.commit_timeout
+        task['commitPoll'] = 0.1
+        with self._condition:
+            heapq.heappush(self._heap, (now + task['commitPoll'], next(self._sequence), task))
+            self._condition.notify()
+
+    def _check_confirm_commit(self, task):
+        tx_id = task['confirmTxId']
+        commit = self.fabric_client.wait_for_commit(tx_id, 0)
+        if commit['status'] != 'COMMITTED' and time.monotonic() < task['commitDeadline']:
+            task['commitPoll'] = min(2.0, task['commitPoll'] * 2)
+            with self._condition:
+                heapq.heappush(self._heap, (time.monotonic() + task['commitPoll'], next(self._sequence), task))
+                self._condition.notify()
+            return
+
+        del task['confirmTxId'], task['commitDeadline'], task['commitPoll']
+        if commit['status'] != 'COMMITTED':
+            # No commit event in time (block stream down, or the transaction was dropped)
+            self._resolve_from_ledger(task, f"confirmECGData {tx_id} not committed within {self.commit_timeout}s")
+        elif commit['valid']:
+            self._finish(task, 'confirmed')
+            print(f"✅ Verification completed: {task['patientId']} after {task['attempts']} attempt(s)")
+        else:
+            # e.g. MVCC_READ_CONFLICT: the record is still PENDING_VERIFICATION
+            with self._condition:
+                self.stats['invalidatedConfirms'] += 1
+            self._retry_or_fail(task, f"confirmECGData {tx_id} invalidated: {commit['validationCode']}",
+                                mark_failed=False)
+
+    def _resolve_from_ledger(self, task, error):
+        """Finish the task from the record's status, retry while it is still pending"""
+        # getDataStatus only answers the record's owner and authorized users
+        role = self.fabric_client.role_for_client_id(task.get('ownerId')) or 'patient'
+        result = self.fabric_client.get_data_status(task['patientId'], role)
+        data_status = result.get('dataStatus') if result.get('status') == 'success' else None
+        status = data_status.get('status') if isinstance(data_status, dict) else None
+        if status == 'CONFIRMED':
+            self._finish(task, 'confirmed')
+            print(f"✅ Verification completed: {task['patientId']} (ledger status CONFIRMED)")
+        elif status == 'FAILED':
+            self._finish(task, 'failed')
+            print(f"❌ Verification failed for {task['patientId']}: ledger status FAILED")
+        else:
+            self._retry_or_fail(task, f"{error}, ledger status {status or result.get('error')}", mark_failed=False)
+
+    def _analyze(self, task):
+        """Signal analysis of the leading analysis_seconds, None when there is no pool"""
+        if self.analysis_pool is None or self.ipfs_client is None:
+            return None
+        try:
+            window = self.ipfs_client.get_ecg_window(task['ipfsHash'], None, 0, self.analysis_seconds)
+            reported = (window['record'].get('analysis') or {}).get('heartRate')
+            result = self.analysis_pool.analyze(
+                window['samplingRate'], window['leads'], reported, timeout=self.analysis_timeout
+            )
+        except Exception as e:
+            # The payload is available, an analysis failure does not fail the verification
+            result = {'error': str(e) or type(e).__name__}
+        with self._condition:
+            self.stats['analysisErrors' if 'error' in result else 'analyzed'] += 1
+        return result
+
+    def _retry_or_fail(self, task, error, mark_failed):
+        if task['attempts'] < self.max_attempts:
+            delay = min(self.max_delay, self.base_delay * (2 ** (task['attempts'] - 1)))
+            delay *= random.uniform(0.8, 1.2)
+            with self._condition:
+                heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), task))
+                self.stats['retries'] += 1
+                self._condition.notify()
+            gatewayMetrics.VERIFICATION_RETRIES.inc()
+            print(f"🔁 Verification retry for {task['patientId']} in {delay:.1f}s: {error}")
+            return
+
+        if mark_failed:
+            self.fabric_client.confirm_ecg_data(
+                task['patientId'], False,
+                f"IPFS data unavailable after {task['attempts']} attempts: {error}"
+            )
+        self._finish(task, 'failed')
+        print(f"❌ Verification failed for {task['patientId']}: {error}")
+
+    def _finish(self, task, outcome):
+        with self._condition:
+            self._tracked.discard((task['patientId'], task['ipfsHash']))
+            self._cancelled.discard((task['patientId'], task['ipfsHash']))
+            self.stats[outcome] += 1
+            latency = time.monotonic() - task['enqueuedAt']
+            self._latencies.append(latency)
+        gatewayMetrics.VERIFICATION_SECONDS.labels(outcome).observe(latency)
+        for callback in self._listeners:
+            try:
+                callback(task['patientId'], task['ipfsHash'], outcome)
+            except Exception as e:
+                print(f"⚠️ Verification listener error: {e}")
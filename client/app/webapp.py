@@ -1,16 +1,88 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+import asyncio
 import json
 import os
+import time
 from datetime import datetime
 
-from ipfsClient import IPFSClient
+import admissionControl
+import ecgCodec
+import ecgMediaTypes
+import gatewayMetrics
+from admissionControl import AdmissionController, AdmissionRejected
+from ecgAnalysis import ECGAnalysisPool
+from ecgBatchUploader import ECGBatchUploader
+from eventStream import ChaincodeEventHub
+from uploadJobs import UploadJobManager
+from ipfsCid import PinnedCidIndex
+from ipfsClient import IPFSClient, IPFSReadError, IPFSUploadError
+from ipfsReadCache import IPFSReadCache
 from fabricGatewayClient import FabricGatewayClient
+from asyncFabricGatewayClient import AsyncFabricGatewayClient
 
 app = Flask(__name__)
+# orjson for jsonify()/request.json when installed
+app.json = ecgMediaTypes.FastJSONProvider(app)
+
+# Forks the analysis workers, so it comes before any client starts a thread
+analysis_pool = ECGAnalysisPool.from_env()
 
 # Initialize clients
-ipfs_client = IPFSClient(ipfs_host='172.20.1.6', ipfs_port=5001)
-fabric_client = FabricGatewayClient(peer_address="10.34.100.126:7051")
+ipfs_client = IPFSClient(
+    ipfs_host=os.getenv('IPFS_HOST', '172.20.1.6'),
+    ipfs_port=int(os.getenv('IPFS_PORT', '5001')),
+    payload_format=os.getenv('ECG_PAYLOAD_FORMAT', 'binary'),
+    cache=IPFSReadCache.from_env(),
+    pinned_index=PinnedCidIndex.from_env()
+)
+fabric_client = FabricGatewayClient(
+    peer_address=os.getenv('FABRIC_PEER_ADDRESS', '10.34.100.126:7051'),
+    ipfs_client=ipfs_client,
+    analysis_pool=analysis_pool
+)
+async_fabric_client = AsyncFabricGatewayClient(fabric_client)
+batch_uploader = ECGBatchUploader.from_env(ipfs_client, fabric_client)
+upload_jobs = UploadJobManager.from_env(ipfs_client, fabric_client)
+
+# Bounded submit/evaluate pools in front of the ledger, so a burst of uploads
+# cannot fork unbounded peer processes or starve doctor reads
+admission = AdmissionController.from_env()
+
+# Admission pool and priority per route; routes not listed are not limited
+ROUTE_ADMISSION = {
+    '/ecg/access/<patient_id>': ('evaluate', admissionControl.PRIORITY_INTERACTIVE),
+    '/ecg/audit/<patient_id>': ('evaluate', admissionControl.PRIORITY_INTERACTIVE),
+    '/ecg/status/<patient_id>': ('evaluate', admissionControl.PRIORITY_NORMAL),
+    '/ecg/window/<patient_id>': ('evaluate', admissionControl.PRIORITY_NORMAL),
+    '/ecg/preview/<patient_id>': ('evaluate', admissionControl.PRIORITY_NORMAL),
+    '/ecg/grant-access': ('submit', admissionControl.PRIORITY_INTERACTIVE),
+    '/ecg/revoke-access': ('submit', admissionControl.PRIORITY_INTERACTIVE),
+    '/ecg/upload': ('submit', admissionControl.PRIORITY_BULK),
+    '/ecg/upload/stream': ('submit', admissionControl.PRIORITY_BULK),
+    '/ecg/upload/batch': ('submit', admissionControl.PRIORITY_BULK)
+}
+
+# Chaincode events that announce an upcoming read of the record's ECG payload
+PREFETCH_EVENTS = ('AccessGranted', 'ECGVerificationCompleted')
+
+def prefetch_from_block(block_info):
+    """Block listener: warm the IPFS cache when a doctor is granted access to a record"""
+    ipfs_hashes = []
+    for tx in block_info['transactions']:
+        if not tx['valid']:
+            continue
+        for event in tx['chaincodeEvents']:
+            payload = event.get('payload')
+            if event['eventName'] in PREFETCH_EVENTS and isinstance(payload, dict):
+                ipfs_hashes.append(payload.get('ipfsHash'))
+    if ipfs_hashes:
+        ipfs_client.prefetch(ipfs_hashes)
+
+fabric_client.add_block_listener(prefetch_from_block)
+
+# Chaincode events for /ecg/events clients, fed by the gateway's one block subscription
+event_hub = ChaincodeEventHub.from_env()
+fabric_client.add_block_listener(event_hub.handle_block)
 
 def get_user_role():
     """Extract user role from header dengan default fallback"""
@@ -19,6 +91,184 @@ def get_user_role():
         user_role = 'admin'
     return user_role
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def admission_rejected_response(e):
+    """429 with Retry-After for an AdmissionRejected"""
+    response = jsonify({
+        "status": "error",
+        "message": "Gateway busy, retry later",
+        "pool": e.pool,
+        "reason": e.reason,
+        "retryAfter": e.retry_after,
+        "userRole": get_user_role()
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def ipfs_unavailable_response(user_role):
+    """503 when there is no IPFS connection (and no local fallback store)"""
+    return jsonify({
+        "status": "error",
+        "message": "IPFS unavailable",
+        "ipfs": ipfs_client.get_status(),
+        "userRole": user_role
+    }), 503
+
+@app.before_request
+def admit_request():
+    """Take the route's admission slot before the body is read, 429 when the pool is saturated"""
+    route = request.url_rule.rule if request.url_rule else None
+    if route not in ROUTE_ADMISSION:
+        return None
+    pool_name, priority = ROUTE_ADMISSION[route]
+    # IPFS calls made for this request queue at the same priority
+    g.admission_priority = admissionControl.set_priority(priority)
+    try:
+        admission.pool(pool_name).acquire(priority)
+    except AdmissionRejected as e:
+        print(f"⏳ Admission rejected: {route} ({e})")
+        return admission_rejected_response(e)
+    g.admission = (pool_name, time.perf_counter())
+    return None
+
+@app.teardown_request
+def release_admission(exc):
+    admitted = g.pop('admission', None)
+    if admitted is not None:
+        pool_name, started = admitted
+        admission.pool(pool_name).release(time.perf_counter() - started)
+    token = g.pop('admission_priority', None)
+    if token is not None:
+        admissionControl.reset_priority(token)
+
+@app.after_request
+def record_request_metrics(response):
+    """Per-route latency, payload size and status for /metrics"""
+    started = g.pop('request_started', None)
+    if started is not None and request.path != '/metrics':
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        gatewayMetrics.observe_http(
+            route, request.method, response.status_code, get_user_role(),
+            time.perf_counter() - started,
+            request_bytes=request.content_length,
+            # Measuring a streamed body would buffer it (NDJSON results, SSE)
+            response_bytes=None if response.is_streamed else response.calculate_content_length()
+        )
+    return response
+
+# Largest single NDJSON line accepted by /ecg/upload/stream (one block of samples)
+STREAM_MAX_LINE_BYTES = int(os.getenv('ECG_STREAM_MAX_LINE_BYTES', str(16 * 1024 * 1024)))
+
+def read_ndjson_line(stream):
+    """Next JSON object from an NDJSON request stream, None at the end"""
+    while True:
+        line = stream.readline(STREAM_MAX_LINE_BYTES + 1)
+        if not line:
+            return None
+        if len(line) > STREAM_MAX_LINE_BYTES:
+            raise ValueError(f"NDJSON line longer than {STREAM_MAX_LINE_BYTES} bytes")
+        if line.strip():
+            return json.loads(line)
+
+def iter_lead_chunks(stream, first_leads=None):
+    """Lead blocks of a streamed upload: {"leads": {...}} per line after the envelope"""
+    if first_leads:
+        yield first_leads
+    while True:
+        line = read_ndjson_line(stream)
+        if line is None:
+            return
+        if not isinstance(line, dict) or not isinstance(line.get('leads'), dict):
+            raise ValueError('every line after the first must be {"leads": {name: [samples]}}')
+        yield line['leads']
+
+def iter_batch_records():
+    """
+    (index, record) pairs of a /ecg/upload/batch body: NDJSON, or a multipart
+    bundle of .ndjson parts and .json parts (one record or a list of records).
+    Unreadable records come through as the exception so the rest still uploads.
+    """
+    if request.mimetype == 'multipart/form-data':
+        parts = [part for _, part in request.files.items(multi=True)]
+    else:
+        parts = [None]
+
+    index = 0
+    for part in parts:
+        if part is not None and (part.mimetype == 'application/json' or (part.filename or '').endswith('.json')):
+            try:
+                records = json.load(part.stream)
+            except ValueError as e:
+                records = [e]
+            for record in records if isinstance(records, list) else [records]:
+                yield index, record if isinstance(record, (dict, Exception)) else ValueError("record must be a JSON object")
+                index += 1
+            continue
+
+        stream = request.stream if part is None else part.stream
+        while True:
+            try:
+                record = read_ndjson_line(stream)
+            except json.JSONDecodeError as e:
+                record = e
+            except ValueError as e:
+                # Oversized line, the rest of this part cannot be split into records
+                yield index, e
+                break
+            if record is None:
+                break
+            yield index, record if isinstance(record, (dict, Exception)) else ValueError("record must be a JSON object")
+            index += 1
+
+def read_upload_body():
+    """
+    Upload document from a JSON, msgpack or ECG binary request body
+
+    An application/vnd.ecg-binary body is the ecgCodec container of ecgData,
+    with patientId, patientOwnerClientID and metadata (JSON) in the query string.
+
+    Raises:
+        ecgMediaTypes.UnsupportedMediaType: unknown Content-Type or msgpack not installed
+        ValueError: the body does not decode
+    """
+    media_type = ecgMediaTypes.request_type(request.content_type)
+    if media_type != ecgMediaTypes.ECG_BINARY:
+        return ecgMediaTypes.loads(request.get_data(), media_type)
+
+    ecg_data = request.get_data()
+    header, _ = ecgCodec.decode_header(ecg_data)
+    if header['version'] == ecgCodec.VERSION:
+        # Kept as bytes, IPFSClient stores a valid container as sent
+        ecgCodec.check_container(ecg_data)
+    else:
+        ecg_data = ecgCodec.decode_ecg(ecg_data)
+    data = {
+        'patientId': request.args.get('patientId'),
+        'patientOwnerClientID': request.args.get('patientOwnerClientID'),
+        'metadata': json.loads(request.args['metadata']) if request.args.get('metadata') else None,
+        'ecgData': ecg_data
+    }
+    return {key: value for key, value in data.items() if value is not None}
+
+def negotiated_response(document, leads_path=None):
+    """
+    document as JSON, msgpack or (with leads_path) ECG binary, per the Accept header
+
+    Args:
+        leads_path: keys of the lead samples inside document, see ecgMediaTypes.dumps()
+    """
+    media_type = ecgMediaTypes.negotiate(request.accept_mimetypes, waveform=leads_path is not None)
+    if media_type == ecgMediaTypes.JSON:
+        response = jsonify(document)
+    else:
+        response = Response(ecgMediaTypes.dumps(document, media_type, leads_path), mimetype=media_type)
+    response.vary.add('Accept')
+    return response
+
 def get_patient_owner_id(user_role):
     """Generate patient owner ID berdasarkan role"""
     if user_role == 'patient':
@@ -43,12 +293,20 @@ def health_check():
         "currentUserRole": user_role,
         "services": {
             "ipfs": ipfs_status,
-            "blockchain": fabric_info
+            "blockchain": fabric_info,
+            "verification": fabric_client.verification_scheduler.get_stats(),
+            "admission": admission.get_stats(),
+            "batchUpload": batch_uploader.get_stats(),
+            "uploadJobs": upload_jobs.get_stats(),
+            "events": event_hub.get_stats(),
+            "analysis": analysis_pool.get_stats() if analysis_pool else None
         },
         "features": {
             "dynamicIdentity": "ENABLED",
             "escrowPattern": "ENABLED",
-            "environment": "Multi-Role Authentication"
+            "environment": "Multi-Role Authentication",
+            "contentTypes": ecgMediaTypes.response_types(waveform=True),
+            "fastJson": ecgMediaTypes.orjson is not None
         }
     })
 
@@ -90,14 +348,105 @@ def test_connectivity():
     
     return jsonify(results)
 
+# Submit the ledger write in parallel with the IPFS add (override per request with ?pipeline=)
+UPLOAD_PIPELINE = os.getenv('ECG_UPLOAD_PIPELINE', 'false').lower() == 'true'
+# Answer uploads with 202 and a job ID (override per request with ?async= or Prefer: respond-async)
+UPLOAD_ASYNC = os.getenv('ECG_UPLOAD_ASYNC', 'false').lower() == 'true'
+
+async def pipelined_upload(patient_id, ecg_data, metadata, patient_owner_id, user_role):
+    """
+    Store the locally computed CID on the ledger while the IPFS add runs
+
+    When only one side succeeds the other is compensated: a record stored
+    without its payload is confirmed FAILED, and blocks this upload pinned are
+    unpinned when the ledger write failed.
+    """
+    with gatewayMetrics.time_stage('/ecg/upload', 'cid_compute'):
+        prepared = ipfs_client.prepare_upload(ecg_data)
+    ipfs_hash = prepared['ipfsHash']
+    try:
+        with gatewayMetrics.time_stage('/ecg/upload', 'ipfs_add_ledger'):
+            ipfs_result, blockchain_result = await asyncio.gather(
+                asyncio.to_thread(ipfs_client.commit_upload, prepared, True),
+                async_fabric_client.store_ecg_data(patient_id, ipfs_hash, metadata, patient_owner_id, user_role),
+                return_exceptions=True
+            )
+        ipfs_ok = not isinstance(ipfs_result, Exception)
+        if isinstance(blockchain_result, Exception):
+            blockchain_result = {'status': 'error', 'error': str(blockchain_result)}
+        ledger_ok = blockchain_result.get('status') == 'success'
+        print(f"✅ IPFS: {ipfs_hash} (pipelined, ipfs {'ok' if ipfs_ok else 'failed'}, ledger {'ok' if ledger_ok else 'failed'})")
+
+        if ipfs_ok and ledger_ok:
+            return negotiated_response({
+                "status": "success",
+                "message": f"ECG uploaded by {user_role}",
+                "patientId": patient_id,
+                "ipfsHash": ipfs_hash,
+                "userRole": user_role,
+                "txId": blockchain_result.get('txId'),
+                "pipeline": {"added": len(ipfs_result['added']), "deduplicated": ipfs_result['deduplicated']},
+                "blockchainResult": blockchain_result,
+                "verificationStatus": "PENDING_VERIFICATION"
+            })
+
+        compensation = {}
+        if ledger_ok:
+            # The record points at a CID that never made it to IPFS
+            fabric_client.verification_scheduler.cancel(patient_id, ipfs_hash)
+            with gatewayMetrics.time_stage('/ecg/upload', 'compensate_ledger'):
+                if blockchain_result.get('txId'):
+                    # confirmECGData only sees the record once the store is committed
+                    await async_fabric_client.wait_for_commit(blockchain_result['txId'])
+                confirm_result = await async_fabric_client.confirm_ecg_data(
+                    patient_id, False, f"IPFS add failed: {ipfs_result}"
+                )
+            compensation['ledger'] = 'FAILED' if confirm_result.get('status') == 'success' else confirm_result
+        added = ipfs_result['added'] if ipfs_ok else getattr(ipfs_result, 'added', [])
+        if added:
+            with gatewayMetrics.time_stage('/ecg/upload', 'compensate_ipfs'):
+                compensation['unpinned'] = await asyncio.to_thread(ipfs_client.rollback_upload, added)
+
+        if not ipfs_ok:
+            return jsonify({
+                "status": "error",
+                "message": "IPFS upload failed",
+                "userRole": user_role,
+                "ipfsHash": ipfs_hash,
+                "error": str(ipfs_result),
+                "blockchainResult": blockchain_result,
+                "compensation": compensation
+            }), 502
+        return jsonify({
+            "status": "error",
+            "message": "Blockchain storage failed",
+            "userRole": user_role,
+            "ipfsHash": ipfs_hash,
+            "error": blockchain_result,
+            "compensation": compensation
+        }), 500
+    finally:
+        ipfs_client.release_upload(prepared)
+
 @app.route('/ecg/upload', methods=['POST'])
-def upload_ecg():
+async def upload_ecg():
     """Upload ECG dengan role-based identity"""
     try:
         user_role = get_user_role()
         print(f"📊 ECG Upload request by {user_role}")
         
-        data = request.json
+        try:
+            with gatewayMetrics.time_stage('/ecg/upload', 'json_parse'):
+                data = read_upload_body()
+        except ecgMediaTypes.UnsupportedMediaType as e:
+            return jsonify({
+                "error": str(e),
+                "supported": [ecgMediaTypes.JSON, ecgMediaTypes.MSGPACK, ecgMediaTypes.ECG_BINARY]
+            }), 415
+        except ValueError as e:
+            return jsonify({"error": "Invalid request body", "details": str(e)}), 400
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be an object", "userRole": user_role}), 400
         patient_id = data.get('patientId')
         ecg_data = data.get('ecgData')
         metadata = data.get('metadata', {})
@@ -114,22 +463,64 @@ def upload_ecg():
         
         print(f"📊 Processing: Patient {patient_id} by {user_role}")
         
+        async_mode = request.args.get('async', str(UPLOAD_ASYNC)).lower() == 'true' or \
+            'respond-async' in request.headers.get('Prefer', '')
+        if async_mode:
+            try:
+                job = upload_jobs.submit(
+                    patient_id, ecg_data, metadata, patient_owner_id, user_role,
+                    idempotency_key=request.headers.get('Idempotency-Key')
+                )
+            except AdmissionRejected as e:
+                return admission_rejected_response(e)
+            status_url = f"/ecg/jobs/{job['jobId']}"
+            response = negotiated_response({
+                "status": "accepted",
+                "message": f"ECG upload queued by {user_role}",
+                "patientId": patient_id,
+                "userRole": user_role,
+                "jobId": job['jobId'],
+                "statusUrl": status_url,
+                "job": job
+            })
+            response.status_code = 202
+            response.headers['Location'] = status_url
+            return response
+        
+        if not ipfs_client.client:
+            return ipfs_unavailable_response(user_role)
+
+        pipeline = request.args.get('pipeline', str(UPLOAD_PIPELINE)).lower() == 'true'
+        if pipeline:
+            return await pipelined_upload(patient_id, ecg_data, metadata, patient_owner_id, user_role)
+        
         # Upload to IPFS
-        ipfs_hash = ipfs_client.upload_ecg_data(ecg_data)
+        try:
+            with gatewayMetrics.time_stage('/ecg/upload', 'ipfs_add'):
+                ipfs_hash = ipfs_client.upload_ecg_data(ecg_data)
+        except IPFSUploadError as e:
+            return jsonify({
+                "status": "error",
+                "message": "IPFS upload failed",
+                "userRole": user_role,
+                "error": str(e)
+            }), 502
         print(f"✅ IPFS: {ipfs_hash}")
         
         # Store to blockchain dengan role
-        blockchain_result = fabric_client.store_ecg_data(
-            patient_id, ipfs_hash, metadata, patient_owner_id, user_role
-        )
+        with gatewayMetrics.time_stage('/ecg/upload', 'ledger'):
+            blockchain_result = await async_fabric_client.store_ecg_data(
+                patient_id, ipfs_hash, metadata, patient_owner_id, user_role
+            )
         
         if blockchain_result.get('status') == 'success':
-            return jsonify({
+            return negotiated_response({
                 "status": "success",
                 "message": f"ECG uploaded by {user_role}",
                 "patientId": patient_id,
                 "ipfsHash": ipfs_hash,
                 "userRole": user_role,
+                "txId": blockchain_result.get('txId'),
                 "blockchainResult": blockchain_result,
                 "verificationStatus": "PENDING_VERIFICATION"
             })
@@ -149,8 +540,142 @@ def upload_ecg():
             "endpoint": "/ecg/upload"
         }), 500
 
+@app.route('/ecg/jobs/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    """
+    Progress of an async upload: stage accepted -> ipfs_stored -> endorsed ->
+    committed -> verified, status queued|running|succeeded|failed
+    """
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job", "jobId": job_id, "userRole": get_user_role()}), 404
+    return jsonify(job)
+
+@app.route('/ecg/upload/stream', methods=['POST'])
+async def upload_ecg_stream():
+    """
+    Streaming upload untuk rekaman panjang (Holter)
+
+    Body is NDJSON, typically sent with chunked transfer encoding. The first line
+    is the envelope {"patientId", "ecgData" (without or with initial leads),
+    "metadata", "patientOwnerClientID"}; every following line is one block of
+    samples {"leads": {"I": [...], "II": [...]}}. Blocks are encoded and piped
+    into IPFS as they arrive, then the CID is stored on the ledger.
+    """
+    try:
+        user_role = get_user_role()
+        print(f"📊 ECG streaming upload request by {user_role}")
+
+        try:
+            envelope = read_ndjson_line(request.stream)
+        except ValueError as e:
+            return jsonify({"error": "Invalid stream envelope", "details": str(e)}), 400
+
+        envelope = envelope if isinstance(envelope, dict) else {}
+        patient_id = envelope.get('patientId')
+        ecg_data = envelope.get('ecgData')
+        metadata = envelope.get('metadata', {})
+        patient_owner_id = envelope.get('patientOwnerClientID') or get_patient_owner_id(user_role)
+
+        if not patient_id or not isinstance(ecg_data, dict):
+            return jsonify({
+                "error": "Missing required fields",
+                "required": ["patientId", "ecgData"],
+                "received": list(envelope.keys())
+            }), 400
+
+        print(f"📊 Streaming: Patient {patient_id} by {user_role}")
+        if not ipfs_client.client:
+            return ipfs_unavailable_response(user_role)
+
+        try:
+            with gatewayMetrics.time_stage('/ecg/upload/stream', 'ipfs_add_stream'):
+                upload = ipfs_client.upload_ecg_stream(
+                    ecg_data, iter_lead_chunks(request.stream, ecg_data.get('leads'))
+                )
+        except ValueError as e:
+            return jsonify({"error": "Invalid ECG stream", "details": str(e), "userRole": user_role}), 400
+        except Exception as e:
+            return jsonify({"error": "IPFS streaming upload failed", "details": str(e), "userRole": user_role}), 502
+
+        if not upload['samples']:
+            return jsonify({"error": "No lead samples received", "userRole": user_role}), 400
+
+        ipfs_hash = upload['ipfsHash']
+        print(f"✅ IPFS: {ipfs_hash} ({upload['chunks']} chunks)")
+
+        with gatewayMetrics.time_stage('/ecg/upload/stream', 'ledger'):
+            blockchain_result = await async_fabric_client.store_ecg_data(
+                patient_id, ipfs_hash, metadata, patient_owner_id, user_role
+            )
+
+        if blockchain_result.get('status') == 'success':
+            return jsonify({
+                "status": "success",
+                "message": f"ECG streamed by {user_role}",
+                "patientId": patient_id,
+                "ipfsHash": ipfs_hash,
+                "userRole": user_role,
+                "txId": blockchain_result.get('txId'),
+                "stream": {
+                    "chunks": upload['chunks'],
+                    "bytes": upload['size'],
+                    "samples": upload['samples']
+                },
+                "blockchainResult": blockchain_result,
+                "verificationStatus": "PENDING_VERIFICATION"
+            })
+        else:
+            return jsonify({
+                "status": "error",
+                "message": "Blockchain storage failed",
+                "userRole": user_role,
+                "ipfsHash": ipfs_hash,
+                "error": blockchain_result
+            }), 500
+
+    except Exception as e:
+        print(f"❌ Streaming upload error: {str(e)}")
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e),
+            "endpoint": "/ecg/upload/stream"
+        }), 500
+
+@app.route('/ecg/upload/batch', methods=['POST'])
+def upload_ecg_batch():
+    """
+    Bulk upload: one record per NDJSON line ({"patientId", "ecgData", "metadata",
+    "patientOwnerClientID"}) or a multipart bundle of .ndjson/.json files
+
+    The response is NDJSON too: one result line per record as soon as it is
+    stored on the ledger or failed (completion order, see "index"), then a
+    {"summary": ...} line. Records share storeECGDataBatch transactions.
+    """
+    user_role = get_user_role()
+    default_owner_id = get_patient_owner_id(user_role)
+    print(f"📦 ECG batch upload request by {user_role}")
+
+    def generate():
+        started = time.perf_counter()
+        summary = {'total': 0, 'stored': 0, 'failed': 0}
+        try:
+            for result in batch_uploader.run(iter_batch_records(), user_role, default_owner_id):
+                summary['total'] += 1
+                summary['stored' if result.get('status') == 'success' else 'failed'] += 1
+                yield json.dumps(result, separators=(',', ':')) + '\n'
+        except Exception as e:
+            # Records already reported stay valid, the client resumes after the last index
+            print(f"❌ Batch upload error: {str(e)}")
+            summary['error'] = str(e)
+        summary['elapsedMs'] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Batch upload: {summary['stored']}/{summary['total']} stored by {user_role}")
+        yield json.dumps({'summary': summary, 'userRole': user_role}, separators=(',', ':')) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/ecg/grant-access', methods=['POST'])
-def grant_access():
+async def grant_access():
     """Grant access dengan patient identity validation"""
     try:
         user_role = get_user_role()
@@ -176,7 +701,7 @@ def grant_access():
                 "hint": "Use header: X-User-Role: patient"
             }), 403
         
-        result = fabric_client.grant_access(patient_id, doctor_id, user_role)
+        result = await async_fabric_client.grant_access(patient_id, doctor_id, user_role)
         
         if result.get('status') == 'success':
             return jsonify({
@@ -203,23 +728,43 @@ def grant_access():
         }), 500
 
 @app.route('/ecg/access/<patient_id>', methods=['GET'])
-def access_ecg_data(patient_id):
+async def access_ecg_data(patient_id):
     """Access ECG dengan role validation"""
     try:
         user_role = get_user_role()
         print(f"📖 Access request: Patient {patient_id} by {user_role}")
         
-        result = fabric_client.access_ecg_data(patient_id, user_role)
+        include_ecg = request.args.get('includeEcg', 'false').lower() in ('1', 'true', 'yes')
+        result = await async_fabric_client.access_ecg_data(patient_id, user_role)
         
         if result.get('status') == 'success':
-            return jsonify({
+            data = result.get('data')
+            ipfs_hash = data.get('ipfsHash') if isinstance(data, dict) else None
+            response = {
                 "status": "success",
                 "message": f"ECG data accessed by {user_role}",
                 "patientId": patient_id,
                 "userRole": user_role,
-                "data": result.get('data'),
+                "data": data,
                 "accessRecorded": True
-            })
+            }
+            if include_ecg and ipfs_hash:
+                # Served from the IPFS read cache after the first view
+                try:
+                    response["ecgData"] = ipfs_client.get_ecg_data(ipfs_hash)
+                except IPFSReadError as e:
+                    if not ipfs_client.client:
+                        return ipfs_unavailable_response(user_role)
+                    return jsonify({
+                        "error": "IPFS retrieval failed",
+                        "details": str(e),
+                        "patientId": patient_id,
+                        "userRole": user_role
+                    }), 502
+                return negotiated_response(response, leads_path=('ecgData', 'leads'))
+            elif ipfs_hash:
+                ipfs_client.prefetch([ipfs_hash])
+            return negotiated_response(response)
         else:
             return jsonify({
                 "status": "error",
@@ -242,8 +787,130 @@ def access_ecg_data(patient_id):
             "userRole": get_user_role()
         }), 500
 
+def parse_window_args():
+    """leads, start and end (seconds) query parameters shared by /ecg/window and /ecg/preview"""
+    leads = [name.strip() for name in request.args.get('leads', '').split(',') if name.strip()] or None
+    try:
+        start_s = float(request.args.get('start', '0'))
+        end_s = float(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        raise ValueError("start and end must be numbers of seconds")
+    if start_s < 0 or (end_s is not None and end_s < start_s):
+        raise ValueError(f"Invalid window: start {start_s}, end {end_s}")
+    return leads, start_s, end_s
+
+async def get_record_ipfs_hash(patient_id, user_role):
+    """Access-checked IPFS hash of a patient record, or an error response"""
+    result = await async_fabric_client.access_ecg_data(patient_id, user_role)
+    if result.get('status') != 'success':
+        return None, (jsonify({
+            "status": "error",
+            "message": "Access denied or data not found",
+            "patientId": patient_id,
+            "userRole": user_role,
+            "error": result
+        }), 403)
+
+    data = result.get('data')
+    ipfs_hash = data.get('ipfsHash') if isinstance(data, dict) else None
+    if not ipfs_hash:
+        return None, (jsonify({"error": "Ledger record has no IPFS hash", "userRole": user_role}), 404)
+    return ipfs_hash, None
+
+@app.route('/ecg/window/<patient_id>', methods=['GET'])
+async def get_ecg_window(patient_id):
+    """
+    Sebagian rekaman: ?leads=II,V1&start=10&end=20 (seconds)
+
+    Same access check as /ecg/access, then only the lead chunks overlapping the
+    window are read from IPFS.
+    """
+    try:
+        user_role = get_user_role()
+        try:
+            leads, start_s, end_s = parse_window_args()
+        except ValueError as e:
+            return jsonify({"error": str(e), "userRole": user_role}), 400
+
+        print(f"📖 Window request: Patient {patient_id} leads {leads or 'all'} {start_s}-{end_s}s by {user_role}")
+        ipfs_hash, error_response = await get_record_ipfs_hash(patient_id, user_role)
+        if error_response:
+            return error_response
+
+        try:
+            window = ipfs_client.get_ecg_window(ipfs_hash, leads, start_s, end_s)
+        except ValueError as e:
+            return jsonify({"error": "Cannot cut window", "details": str(e), "userRole": user_role}), 422
+        except Exception as e:
+            return jsonify({"error": "IPFS retrieval failed", "details": str(e), "userRole": user_role}), 502
+
+        return negotiated_response({
+            "status": "success",
+            "patientId": patient_id,
+            "userRole": user_role,
+            "window": window,
+            "accessRecorded": True
+        }, leads_path=('window', 'leads'))
+
+    except Exception as e:
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e),
+            "userRole": get_user_role()
+        }), 500
+
+PREVIEW_MAX_WIDTH = int(os.getenv('ECG_PREVIEW_MAX_WIDTH', '20000'))
+
+@app.route('/ecg/preview/<patient_id>', methods=['GET'])
+async def get_ecg_preview(patient_id):
+    """
+    Ringkasan rekaman untuk tampilan: ?width=1200&leads=II&start=0&end=30
+
+    Min/max envelope with at most width points per lead, read from the stored
+    pyramid level that matches the window so long recordings cost a few KB.
+    """
+    try:
+        user_role = get_user_role()
+        try:
+            leads, start_s, end_s = parse_window_args()
+        except ValueError as e:
+            return jsonify({"error": str(e), "userRole": user_role}), 400
+        try:
+            width = int(request.args.get('width', '1000'))
+        except ValueError:
+            width = 0
+        if not 0 < width <= PREVIEW_MAX_WIDTH:
+            return jsonify({"error": f"width must be between 1 and {PREVIEW_MAX_WIDTH}", "userRole": user_role}), 400
+
+        print(f"📖 Preview request: Patient {patient_id} leads {leads or 'all'} width {width} by {user_role}")
+        ipfs_hash, error_response = await get_record_ipfs_hash(patient_id, user_role)
+        if error_response:
+            return error_response
+
+        try:
+            preview = ipfs_client.get_ecg_preview(ipfs_hash, width, leads, start_s, end_s)
+        except ValueError as e:
+            return jsonify({"error": "Cannot build preview", "details": str(e), "userRole": user_role}), 422
+        except Exception as e:
+            return jsonify({"error": "IPFS retrieval failed", "details": str(e), "userRole": user_role}), 502
+
+        return negotiated_response({
+            "status": "success",
+            "patientId": patient_id,
+            "userRole": user_role,
+            "preview": preview,
+            "accessRecorded": True
+        })
+
+    except Exception as e:
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e),
+            "userRole": get_user_role()
+        }), 500
+
 @app.route('/ecg/revoke-access', methods=['POST'])
-def revoke_access():
+async def revoke_access():
     """Revoke access dengan patient identity validation"""
     try:
         user_role = get_user_role()
@@ -269,7 +936,7 @@ def revoke_access():
                 "hint": "Use header: X-User-Role: patient"
             }), 403
         
-        result = fabric_client.revoke_access(patient_id, doctor_id, user_role)
+        result = await async_fabric_client.revoke_access(patient_id, doctor_id, user_role)
         
         if result.get('status') == 'success':
             return jsonify({
@@ -296,13 +963,13 @@ def revoke_access():
         }), 500
 
 @app.route('/ecg/audit/<patient_id>', methods=['GET'])
-def get_audit_trail(patient_id):
+async def get_audit_trail(patient_id):
     """Get audit trail dengan role validation"""
     try:
         user_role = get_user_role()
         print(f"📋 Audit request: Patient {patient_id} by {user_role}")
         
-        result = fabric_client.get_audit_trail(patient_id, user_role)
+        result = await async_fabric_client.get_audit_trail(patient_id, user_role)
         
         if result.get('status') == 'success':
             return jsonify({
@@ -329,21 +996,151 @@ def get_audit_trail(patient_id):
             "userRole": get_user_role()
         }), 500
 
+# Comment line sent on idle event streams so proxies keep the connection open
+EVENT_HEARTBEAT_SECONDS = float(os.getenv('ECG_EVENT_HEARTBEAT', '15'))
+
+@app.route('/ecg/events', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of chaincode events: ?patientId=P1,P2&events=AccessGranted
+
+    Lets UIs react to grants, accesses and verifications instead of polling
+    /ecg/access and /ecg/audit. Events are limited to what the caller's role
+    may see; a reconnecting client sends Last-Event-ID to get what it missed.
+    Roles other than admin must name their patients, and may only stream the
+    records getDataStatus answers them for.
+    """
+    user_role = get_user_role()
+    patient_ids = [value.strip() for value in request.args.get('patientId', '').split(',') if value.strip()]
+    event_names = [value.strip() for value in request.args.get('events', '').split(',') if value.strip()]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+
+    if user_role != 'admin':
+        if not patient_ids:
+            return jsonify({
+                "status": "error",
+                "message": "patientId is required",
+                "userRole": user_role
+            }), 400
+        for patient_id in patient_ids:
+            # Owner or authorized users only, checked once when the stream opens
+            status = fabric_client.get_data_status(patient_id, user_role)
+            if status.get('status') != 'success':
+                return jsonify({
+                    "status": "error",
+                    "message": "Access denied or data not found",
+                    "patientId": patient_id,
+                    "userRole": user_role,
+                    "error": status.get('error')
+                }), 403
+
+    try:
+        subscription = event_hub.subscribe(user_role, patient_ids or None, event_names or None, last_event_id)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    print(f"📡 Event stream opened by {user_role} (patients {patient_ids or 'all'})")
+
+    def generate():
+        try:
+            yield f"retry: 3000\n: subscribed as {user_role}\n\n"
+            while True:
+                # Once events were dropped, flush what is queued and make the client resume
+                event = subscription.get(0 if subscription.overflowed else EVENT_HEARTBEAT_SECONDS)
+                if event is None:
+                    if subscription.overflowed:
+                        yield "event: overflow\ndata: {\"message\": \"Too slow, reconnect with Last-Event-ID\"}\n\n"
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['eventName']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics (per-stage latency histograms and error counters)"""
+    body, content_type = gatewayMetrics.render()
+    return Response(body, content_type=content_type)
+
+@app.route('/ecg/status/<patient_id>', methods=['GET'])
+async def get_data_status(patient_id):
+    """Get verification status of a record (served from the read cache when fresh)"""
+    try:
+        user_role = get_user_role()
+        result = await async_fabric_client.get_data_status(patient_id, user_role)
+        
+        if result.get('status') == 'success':
+            return jsonify({
+                "status": "success",
+                "patientId": patient_id,
+                "userRole": user_role,
+                "dataStatus": result.get('dataStatus'),
+                "cached": result.get('cached', False)
+            })
+        else:
+            return jsonify({
+                "status": "error",
+                "message": "Failed to retrieve data status",
+                "patientId": patient_id,
+                "userRole": user_role,
+                "error": result
+            }), 403
+        
+    except Exception as e:
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e),
+            "userRole": get_user_role()
+        }), 500
+
+@app.route('/ecg/tx/<tx_id>', methods=['GET'])
+async def get_transaction_status(tx_id):
+    """Wait for a submitted transaction to commit and report its validation code"""
+    try:
+        timeout = min(float(request.args.get('timeout', 30)), 120)
+        status = await async_fabric_client.wait_for_commit(tx_id, timeout)
+        
+        if status['status'] == 'COMMITTED':
+            return jsonify(status), 200 if status['valid'] else 409
+        return jsonify(status), 202
+        
+    except Exception as e:
+        return jsonify({
+            "error": "Internal server error",
+            "details": str(e),
+            "txId": tx_id
+        }), 500
+
 if __name__ == '__main__':
     print("🚀 ECG Blockchain System - Multi-Role Authentication")
     print("📋 Available endpoints:")
     print("  - GET  /health")
+    print("  - GET  /metrics")
     print("  - GET  /test/connectivity")
-    print("  - POST /ecg/upload")
+    print("  - POST /ecg/upload  (?async=true: 202 + job)")
+    print("  - GET  /ecg/jobs/<job_id>")
+    print("  - POST /ecg/upload/stream")
+    print("  - POST /ecg/upload/batch")
     print("  - POST /ecg/grant-access")
     print("  - GET  /ecg/access/<patient_id>")
+    print("  - GET  /ecg/window/<patient_id>?leads=II&start=0&end=10")
+    print("  - GET  /ecg/preview/<patient_id>?width=1000")
     print("  - POST /ecg/revoke-access")
     print("  - GET  /ecg/audit/<patient_id>")
+    print("  - GET  /ecg/status/<patient_id>")
+    print("  - GET  /ecg/events?patientId=<id>  (Server-Sent Events)")
+    print("  - GET  /ecg/tx/<tx_id>?timeout=30")
     print("")
     print("🔐 Role-based Authentication:")
     print("  - Header: X-User-Role: patient|doctor|admin")
     print("  - Default: admin")
     print("")
+    print("📦 Content types (Content-Type / Accept on upload, access, window, preview):")
+    print(f"  - {', '.join(ecgMediaTypes.response_types(waveform=True))}")
+    print("")
     print("⛓  Network: ECG Healthcare Consortium")
     print("🔒 Security: Dynamic Identity Management")
     
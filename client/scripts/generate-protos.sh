@@ -0,0 +1,38 @@
+#!/bin/bash
+
+set -e
+
+# Generates Python gRPC stubs for the Fabric protos used by app/fabricGrpcBackend.py
+
+FABRIC_PROTOS_VERSION=${FABRIC_PROTOS_VERSION:-0.3.3}
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+OUT_DIR="${SCRIPT_DIR}/../app/protos"
+
+if [ -f "${OUT_DIR}/.version" ] && [ "$(cat "${OUT_DIR}/.version")" = "${FABRIC_PROTOS_VERSION}" ]; then
+    echo "Fabric protos v${FABRIC_PROTOS_VERSION} already generated"
+    exit 0
+fi
+
+WORK_DIR=$(mktemp -d)
+trap 'rm -rf "${WORK_DIR}"' EXIT
+
+echo "Downloading fabric-protos v${FABRIC_PROTOS_VERSION}..."
+wget -q -O "${WORK_DIR}/fabric-protos.tar.gz" \
+    "https://github.com/hyperledger/fabric-protos/archive/refs/tags/v${FABRIC_PROTOS_VERSION}.tar.gz"
+tar -xzf "${WORK_DIR}/fabric-protos.tar.gz" -C "${WORK_DIR}"
+SRC_DIR="${WORK_DIR}/fabric-protos-${FABRIC_PROTOS_VERSION}"
+
+rm -rf "${OUT_DIR}"
+mkdir -p "${OUT_DIR}"
+
+PROTO_FILES=$(cd "${SRC_DIR}" && find common gateway ledger msp orderer peer -name '*.proto')
+
+echo "Generating Python stubs into ${OUT_DIR}..."
+(cd "${SRC_DIR}" && python -m grpc_tools.protoc \
+    -I . \
+    --python_out="${OUT_DIR}" \
+    --grpc_python_out="${OUT_DIR}" \
+    ${PROTO_FILES})
+
+echo "${FABRIC_PROTOS_VERSION}" > "${OUT_DIR}/.version"
+echo "Fabric protos generated"
@@ -17,8 +17,8 @@ export CORE_PEER_TLS_ENABLED=true
 export CHANNEL_NAME=ecgchannel
 export CC_NAME=ecgcontract
 export CC_SRC_PATH=../chaincode/ecg_chaincode
-export CC_VERSION=1.8
-export CC_SEQUENCE=6
+export CC_VERSION=1.9
+export CC_SEQUENCE=7
 
 ORDERER_TLS_ROOTCERT_FILE_FOR_CLIENT="${PWD}/crypto-config/ordererOrganizations/example.com/tlsca/tlsca.example.com-cert.pem"
 
@@ -0,0 +1,362 @@
+"""
+Benchmark for the gateway upload and read paths.
+
+Sweeps ECG lead length, concurrency and user role over /ecg/upload,
+/ecg/access/<id> and /ecg/audit/<id>. Prints one JSON document with
+throughput, latency percentiles and the gateway's peak RSS per sweep point.
+
+By default the gateway runs as a subprocess on 127.0.0.1 with local
+stand-ins: FABRIC_BACKEND=local (in-process ledger, see
+client/app/localLedgerBackend.py) and IPFS_BACKEND=local (CID-addressed store
+in a temporary directory, see client/app/localIPFSBackend.py) with optional
+latency and bandwidth shaping. No VM or container is needed. Use --url to
+benchmark a running gateway instead. Peak RSS is only reported for the local
+subprocess.
+
+Examples:
+    python test/benchmark_upload_path.py
+    python test/benchmark_upload_path.py --lead-lengths 15,1000,100000,1000000 --concurrency 1,16,64
+    python test/benchmark_upload_path.py --url http://10.34.100.125:3000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_APP_DIR = os.path.join(REPO_ROOT, 'client', 'app')
+
+ENDPOINTS = ('upload', 'access', 'audit')
+LEAD_NAMES = ('I', 'II', 'III', 'aVR', 'aVL', 'aVF', 'V1', 'V2', 'V3', 'V4', 'V5', 'V6')
+REQUEST_TIMEOUT = 300
+SEED_TIMEOUT = 60
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(port):
+    """Run the gateway with local stand-ins (subprocess entry point)"""
+    os.environ.setdefault('FABRIC_BACKEND', 'local')
+    os.environ.setdefault('IPFS_BACKEND', 'local')
+    sys.path.insert(0, CLIENT_APP_DIR)
+
+    import webapp
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', port, webapp.app, threaded=True)
+    print(f"READY {port}", flush=True)
+    server.serve_forever()
+
+
+# --- Gateway process handling ---
+
+class LocalGateway:
+    def __init__(self, stand_in_env, log_path=None):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        # Fresh IPFS store and read cache per run, removed in stop()
+        self.ipfs_dir = tempfile.mkdtemp(prefix='ecg-bench-ipfs-')
+        env = dict(os.environ, **stand_in_env)
+        env.setdefault('LOCAL_IPFS_DIR', os.path.join(self.ipfs_dir, 'store'))
+        env.setdefault('IPFS_CACHE_DIR', os.path.join(self.ipfs_dir, 'cache'))
+        log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(self.port)],
+            env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout=120):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Gateway exited with code {self.process.returncode}")
+            try:
+                if requests.get(f"{self.url}/health", timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError('Gateway did not become ready')
+
+    def reset_peak_rss(self):
+        # Writing 5 to clear_refs resets VmHWM (Linux >= 4.0)
+        try:
+            with open(f"/proc/{self.process.pid}/clear_refs", 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+    def peak_rss_mb(self):
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.ipfs_dir, ignore_errors=True)
+
+
+# --- Load generation ---
+
+def build_ecg_json(lead_length, lead_count):
+    """Serialized ecgData, built once per lead length and reused for every request"""
+    rng = random.Random(lead_length)
+    leads = {
+        name: [round(rng.uniform(-1.0, 1.5), 3) for _ in range(lead_length)]
+        for name in LEAD_NAMES[:lead_count]
+    }
+    return json.dumps({
+        'recordInfo': {'deviceId': 'ECG-BENCH', 'samplingRate': 500},
+        'leads': leads,
+        'analysis': {'heartRate': 72, 'rhythm': 'Normal Sinus Rhythm'}
+    }, separators=(',', ':'))
+
+
+def upload_body(patient_id, ecg_json):
+    metadata = json.dumps({'hospital': 'Benchmark', 'doctor': 'Benchmark', 'device': 'ECG-BENCH'})
+    return f'{{"patientId":"{patient_id}","metadata":{metadata},"ecgData":{ecg_json}}}'.encode('utf-8')
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return round(ordered[index] * 1000, 2)
+
+
+def run_point(base_url, concurrency, total_requests, make_request):
+    """Fire total_requests with the given concurrency, returns latency and status stats"""
+    sessions = threading.local()
+    latencies = []
+    status_codes = {}
+    lock = threading.Lock()
+
+    def one(index):
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        method, path, headers, body = make_request(index)
+        started = time.perf_counter()
+        try:
+            response = sessions.session.request(method, base_url + path, headers=headers, data=body,
+                                                timeout=REQUEST_TIMEOUT)
+            code = str(response.status_code)
+        except requests.RequestException as e:
+            code = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total_requests)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    ok = status_codes.get('200', 0)
+    return {
+        'requests': total_requests,
+        'ok': ok,
+        'errors': total_requests - ok,
+        'statusCodes': status_codes,
+        'durationS': round(duration, 3),
+        'throughputRps': round(total_requests / duration, 2) if duration else None,
+        'latencyMs': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            'max': round(latencies[-1] * 1000, 2) if latencies else None
+        }
+    }
+
+
+def seed_records(base_url, count, ecg_json):
+    """Upload records, wait until they are CONFIRMED and grant the doctor access"""
+    session = requests.Session()
+    patient_ids = []
+    for _ in range(count):
+        patient_id = f"BENCH-{uuid.uuid4().hex[:10].upper()}"
+        response = session.post(f"{base_url}/ecg/upload", data=upload_body(patient_id, ecg_json),
+                                headers={'Content-Type': 'application/json', 'X-User-Role': 'admin'},
+                                timeout=REQUEST_TIMEOUT)
+        if response.status_code == 200:
+            patient_ids.append(patient_id)
+
+    deadline = time.time() + SEED_TIMEOUT
+    pending = list(patient_ids)
+    while pending and time.time() < deadline:
+        still_pending = []
+        for patient_id in pending:
+            response = session.get(f"{base_url}/ecg/status/{patient_id}", headers={'X-User-Role': 'patient'},
+                                   timeout=REQUEST_TIMEOUT)
+            status = (response.json().get('dataStatus') or {}) if response.status_code == 200 else {}
+            if status.get('status') != 'CONFIRMED':
+                still_pending.append(patient_id)
+        pending = still_pending
+        if pending:
+            time.sleep(0.5)
+
+    confirmed = [patient_id for patient_id in patient_ids if patient_id not in pending]
+    for patient_id in confirmed:
+        session.post(f"{base_url}/ecg/grant-access", json={'patientId': patient_id},
+                     headers={'X-User-Role': 'patient'}, timeout=REQUEST_TIMEOUT)
+    # Let the grants commit before the read phase
+    time.sleep(1.0)
+    return confirmed
+
+
+def benchmark(args):
+    gateway = None
+    base_url = args.url
+    if base_url is None:
+        stand_in_env = {
+            'LOCAL_LEDGER_ENDORSE_MS': str(args.endorse_ms),
+            'LOCAL_LEDGER_ORDER_MS': str(args.order_ms),
+            'LOCAL_LEDGER_BATCH_TIMEOUT_MS': str(args.batch_timeout_ms),
+            'LOCAL_IPFS_LATENCY_MS': str(args.ipfs_latency_ms),
+            'LOCAL_IPFS_BANDWIDTH_MBPS': str(args.ipfs_bandwidth_mbps)
+        }
+        gateway = LocalGateway(stand_in_env, args.server_log)
+        gateway.wait_ready()
+        base_url = gateway.url
+
+    lead_lengths = [int(v) for v in args.lead_lengths.split(',')]
+    concurrencies = [int(v) for v in args.concurrency.split(',')]
+    roles = args.roles.split(',')
+    endpoints = args.endpoints.split(',')
+
+    report = {
+        'benchmark': 'upload_path',
+        'startedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'target': args.url or 'local-stand-ins',
+        'config': {
+            'leadLengths': lead_lengths,
+            'leadCount': args.leads,
+            'concurrency': concurrencies,
+            'roles': roles,
+            'endpoints': endpoints,
+            'requestsPerPoint': args.requests,
+            'endorseMs': args.endorse_ms,
+            'orderMs': args.order_ms,
+            'batchTimeoutMs': args.batch_timeout_ms,
+            'ipfsLatencyMs': args.ipfs_latency_ms,
+            'ipfsBandwidthMbps': args.ipfs_bandwidth_mbps
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'results': []
+    }
+
+    try:
+        for lead_length in lead_lengths:
+            ecg_json = build_ecg_json(lead_length, args.leads)
+            seeded = None
+
+            for endpoint in endpoints:
+                if endpoint in ('access', 'audit') and seeded is None:
+                    seeded = seed_records(base_url, args.seed_records, ecg_json)
+                    print(f"seeded {len(seeded)} confirmed records (lead length {lead_length})", file=sys.stderr)
+
+                for concurrency in concurrencies:
+                    for role in roles:
+                        if endpoint == 'upload':
+                            body_size = len(upload_body('BENCH-XXXXXXXXXX', ecg_json))
+
+                            def make_request(index, role=role):
+                                patient_id = f"BENCH-{uuid.uuid4().hex[:10].upper()}"
+                                headers = {'Content-Type': 'application/json', 'X-User-Role': role}
+                                return 'POST', '/ecg/upload', headers, upload_body(patient_id, ecg_json)
+                        else:
+                            if not seeded:
+                                continue
+                            body_size = 0
+
+                            def make_request(index, role=role, endpoint=endpoint):
+                                patient_id = seeded[index % len(seeded)]
+                                return 'GET', f"/ecg/{endpoint}/{patient_id}", {'X-User-Role': role}, None
+
+                        if gateway:
+                            gateway.reset_peak_rss()
+                        result = run_point(base_url, concurrency, args.requests, make_request)
+                        result.update({
+                            'endpoint': endpoint,
+                            'leadLength': lead_length,
+                            'concurrency': concurrency,
+                            'role': role,
+                            'requestBytes': body_size,
+                            'peakRssMb': gateway.peak_rss_mb() if gateway else None
+                        })
+                        report['results'].append(result)
+                        print(f"{endpoint:7s} lead={lead_length:<8d} c={concurrency:<4d} role={role:8s} "
+                              f"{result['throughputRps']} req/s p95={result['latencyMs']['p95']} ms "
+                              f"errors={result['errors']}", file=sys.stderr)
+    finally:
+        if gateway:
+            gateway.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark /ecg/upload, /ecg/access and /ecg/audit')
+    parser.add_argument('--url', help='benchmark a running gateway instead of local stand-ins')
+    parser.add_argument('--lead-lengths', default='15,1000,100000', help='samples per lead, comma separated')
+    parser.add_argument('--leads', type=int, default=2, help='number of leads per record (max 12)')
+    parser.add_argument('--concurrency', default='1,8,32', help='concurrent clients, comma separated')
+    parser.add_argument('--roles', default='admin,doctor,patient', help='X-User-Role values, comma separated')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='upload,access,audit')
+    parser.add_argument('--requests', type=int, default=100, help='requests per sweep point')
+    parser.add_argument('--seed-records', type=int, default=20, help='confirmed records used by access/audit')
+    parser.add_argument('--endorse-ms', type=float, default=20, help='local ledger endorsement latency')
+    parser.add_argument('--order-ms', type=float, default=10, help='local ledger ordering latency')
+    parser.add_argument('--batch-timeout-ms', type=float, default=200, help='local ledger block cut timeout')
+    parser.add_argument('--ipfs-latency-ms', type=float, default=0, help='local IPFS stand-in latency per call')
+    parser.add_argument('--ipfs-bandwidth-mbps', type=float, default=0,
+                        help='local IPFS stand-in link bandwidth in Mbit/s (0 is unlimited)')
+    parser.add_argument('--server-log', help='write the local gateway output to this file')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.serve:
+        serve(args.port)
+    else:
+        benchmark(args)
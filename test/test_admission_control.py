@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client', 'app'))
+
+import admissionControl  # noqa: E402
+from admissionControl import (PRIORITY_BACKGROUND, PRIORITY_BULK, PRIORITY_INTERACTIVE,  # noqa: E402
+                              PRIORITY_NORMAL, AdmissionPool, AdmissionRejected, prioritized)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+def queue_waiter(pool, priority, admitted, timeout=None):
+    """Start a thread that acquires at priority and appends it to admitted"""
+    def run():
+        pool.acquire(priority, timeout)
+        admitted.append(priority)
+
+    queued_before = pool.get_stats()['queued']
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_until(lambda: pool.get_stats()['queued'] == queued_before + 1)
+    return thread
+
+
+def test_free_slots_are_taken_without_waiting():
+    pool = AdmissionPool('test', limit=2)
+
+    assert pool.acquire(PRIORITY_BULK) == 0.0
+    assert pool.acquire(PRIORITY_BULK) == 0.0
+    assert pool.get_stats()['inFlight'] == 2
+
+
+def test_release_hands_the_slot_over_in_priority_order():
+    pool = AdmissionPool('test', limit=1)
+    pool.acquire(PRIORITY_BULK)
+    admitted = []
+    threads = [queue_waiter(pool, priority, admitted)
+               for priority in (PRIORITY_BACKGROUND, PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_BULK)]
+
+    for expected in (PRIORITY_INTERACTIVE, PRIORITY_BULK, PRIORITY_BULK, PRIORITY_BACKGROUND):
+        count = len(admitted)
+        pool.release()
+        wait_until(lambda: len(admitted) == count + 1)
+        assert admitted[-1] == expected
+        # The slot moved to the waiter, it was never free in between
+        assert pool.get_stats()['inFlight'] == 1
+
+    for thread in threads:
+        thread.join(1)
+    pool.release()
+    assert pool.get_stats()['inFlight'] == 0
+
+
+def test_priority_defaults_to_the_current_context():
+    pool = AdmissionPool('test', limit=1)
+    pool.acquire()
+    admitted = []
+
+    def run():
+        with prioritized(PRIORITY_INTERACTIVE):
+            pool.acquire()
+        admitted.append('interactive')
+
+    queue_waiter(pool, PRIORITY_NORMAL, admitted)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_until(lambda: pool.get_stats()['queued'] == 2)
+    assert pool.get_stats()['queuedByPriority'] == {'interactive': 1, 'normal': 1, 'bulk': 0, 'background': 0}
+
+    pool.release()
+    wait_until(lambda: admitted)
+    assert admitted == ['interactive']
+
+
+def test_full_queue_is_rejected_right_away():
+    pool = AdmissionPool('submit', limit=1, max_queue=1)
+    pool.acquire(PRIORITY_BULK)
+    admitted = []
+    queue_waiter(pool, PRIORITY_BULK, admitted)
+
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejected:
+        pool.acquire(PRIORITY_INTERACTIVE, timeout=5)
+    assert time.monotonic() - started < 1
+    assert rejected.value.pool == 'submit'
+    assert rejected.value.reason == 'queue full'
+    assert 1 <= rejected.value.retry_after <= 60
+    assert pool.get_stats()['rejected'] == 1
+
+    pool.release()
+    wait_until(lambda: admitted)
+
+
+def test_wait_timeout_is_rejected_and_the_slot_is_not_leaked():
+    pool = AdmissionPool('test', limit=1)
+    pool.acquire(PRIORITY_BULK)
+
+    with pytest.raises(AdmissionRejected, match='no free slot'):
+        pool.acquire(PRIORITY_INTERACTIVE, timeout=0.05)
+    stats = pool.get_stats()
+    assert stats['timedOut'] == 1
+    assert stats['queued'] == 0
+
+    # The cancelled waiter is skipped, so the slot becomes free
+    pool.release()
+    assert pool.get_stats()['inFlight'] == 0
+    assert pool.acquire(PRIORITY_BULK, timeout=0) == 0.0
+
+
+def test_slot_handed_over_while_the_wait_times_out_is_kept(monkeypatch):
+    pool = AdmissionPool('test', limit=1)
+    pool.acquire(PRIORITY_BULK)
+
+    class RacingFuture(Future):
+        """Times out, but release() hands the slot over before acquire() can cancel"""
+
+        def result(self, timeout=None):
+            if timeout is not None and not self.done():
+                pool.release()
+                raise FutureTimeoutError()
+            return super().result(timeout)
+
+    monkeypatch.setattr(admissionControl, 'Future', RacingFuture)
+
+    pool.acquire(PRIORITY_INTERACTIVE, timeout=0.05)
+    stats = pool.get_stats()
+    assert stats['inFlight'] == 1
+    assert stats['queued'] == 0
+    assert stats['timedOut'] == 0
+    assert stats['admitted'] == 2
+
+    pool.release()
+    assert pool.get_stats()['inFlight'] == 0
+
+
+def test_slot_context_manager_releases_on_error():
+    pool = AdmissionPool('test', limit=1)
+
+    with pytest.raises(RuntimeError):
+        with pool.slot(PRIORITY_NORMAL):
+            assert pool.get_stats()['inFlight'] == 1
+            raise RuntimeError("ledger call failed")
+    assert pool.get_stats()['inFlight'] == 0
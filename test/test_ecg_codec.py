@@ -0,0 +1,145 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client', 'app'))
+
+from ecgCodec import (ECGCodecError, ECGStreamEncoder, check_container, decode_ecg,  # noqa: E402
+                      decode_header, encode_ecg, is_binary)
+
+
+def make_record(leads):
+    return {
+        'patientInfo': {'patientId': 'PATIENT-TEST-001', 'age': 54},
+        'recordInfo': {'samplingRate': 500, 'duration': 10},
+        'leads': leads
+    }
+
+
+def lead_descriptors(raw):
+    header, _ = decode_header(raw)
+    return {descriptor['name']: descriptor for descriptor in header['leads']}
+
+
+@pytest.mark.parametrize('compression', ['none', 'zlib'])
+def test_integer_lead_round_trip(compression):
+    record = make_record({'I': [0, 5, -3, 120, -120, 7] * 50})
+    raw = encode_ecg(record, compression=compression)
+
+    assert is_binary(raw)
+    assert lead_descriptors(raw)['I']['dtype'] == '<i2'
+    decoded = decode_ecg(raw)
+    assert decoded == record
+    assert all(isinstance(value, int) for value in decoded['leads']['I'])
+
+
+def test_quantized_float_lead_round_trip():
+    record = make_record({'II': [0.12, -0.5, 1.25, 3.07, -2.99] * 40})
+    raw = encode_ecg(record)
+
+    descriptor = lead_descriptors(raw)['II']
+    assert descriptor['scale'] == 100
+    assert descriptor['dtype'] == '<i2'
+    assert decode_ecg(raw) == record
+
+
+def test_non_quantizable_float_lead_is_stored_as_float64():
+    values = [0.1 + i / 3.0 for i in range(100)]
+    record = make_record({'V1': values})
+    raw = encode_ecg(record)
+
+    assert lead_descriptors(raw)['V1']['dtype'] == '<f8'
+    assert decode_ecg(raw)['leads']['V1'] == values
+
+
+def test_float32_is_lossy_for_non_quantizable_leads():
+    values = [0.1 + i / 3.0 for i in range(100)]
+    raw = encode_ecg(make_record({'V1': values}), float32=True)
+
+    assert lead_descriptors(raw)['V1']['dtype'] == '<f4'
+    decoded = decode_ecg(raw)['leads']['V1']
+    assert np.allclose(decoded, values, rtol=1e-6)
+
+
+@pytest.mark.parametrize('values, dtype', [
+    ([32767, -32768, 32767, -32768, 0, 32767], '<i2'),
+    ([2147483647, -2147483648, 2147483647, 0, -2147483648], '<i4'),
+])
+def test_delta_wraps_around_at_the_integer_limits(values, dtype):
+    record = make_record({'I': values})
+    raw = encode_ecg(record, delta=True, compression='none')
+
+    descriptor = lead_descriptors(raw)['I']
+    assert descriptor['dtype'] == dtype
+    assert descriptor['delta'] is True
+    assert decode_ecg(raw) == record
+
+
+def test_json_leads_are_returned_unchanged():
+    record = make_record({
+        'I': [1, 2, 3],
+        'annotations': [{'type': 'R', 'sample': 12}],
+        'empty': [],
+        'III': [1, 2, 3]
+    })
+    raw = encode_ecg(record)
+
+    header, _ = decode_header(raw)
+    assert set(header['jsonLeads']) == {'annotations', 'empty'}
+    decoded = decode_ecg(raw)
+    assert decoded == record
+    assert list(decoded['leads']) == ['I', 'annotations', 'empty', 'III']
+
+
+def test_streamed_container_round_trip():
+    encoder = ECGStreamEncoder(make_record({}), compression='zlib')
+    chunks = [{'I': [1, 2, 3], 'II': [0.5, 0.25, 0.125]},
+              {'I': [4, 5], 'II': [1.0, 2.0]}]
+    raw = encoder.header() + b''.join(encoder.encode_chunk(chunk) for chunk in chunks) + encoder.end()
+
+    assert encoder.bytes_out == len(raw)
+    assert encoder.sample_counts == {'I': 5, 'II': 5}
+    decoded = decode_ecg(raw)
+    assert decoded['leads'] == {'I': [1, 2, 3, 4, 5], 'II': [0.5, 0.25, 0.125, 1.0, 2.0]}
+    assert decoded['patientInfo'] == {'patientId': 'PATIENT-TEST-001', 'age': 54}
+
+
+def test_streamed_container_without_end_frame_is_truncated():
+    encoder = ECGStreamEncoder(make_record({}))
+    raw = encoder.header() + encoder.encode_chunk({'I': [1, 2, 3]})
+
+    with pytest.raises(ECGCodecError):
+        decode_ecg(raw)
+
+
+def test_check_container_accepts_a_valid_container():
+    raw = encode_ecg(make_record({'I': list(range(200)), 'II': [0.5] * 200}))
+
+    header = check_container(raw)
+    assert [descriptor['name'] for descriptor in header['leads']] == ['I', 'II']
+
+
+def test_check_container_rejects_a_truncated_container():
+    raw = encode_ecg(make_record({'I': list(range(200))}), compression='none')
+
+    with pytest.raises(ECGCodecError, match='truncated'):
+        check_container(raw[:-10])
+    with pytest.raises(ECGCodecError):
+        check_container(raw[:5])
+
+
+def test_check_container_rejects_trailing_bytes():
+    raw = encode_ecg(make_record({'I': list(range(200))}))
+
+    with pytest.raises(ECGCodecError, match='unexpected bytes'):
+        check_container(raw + b'\x00\x01')
+
+
+def test_check_container_rejects_streamed_containers():
+    encoder = ECGStreamEncoder(make_record({}))
+    raw = encoder.header() + encoder.encode_chunk({'I': [1, 2, 3]}) + encoder.end()
+
+    with pytest.raises(ECGCodecError):
+        check_container(raw)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client', 'app'))
+
+from ipfsCid import CHUNK_SIZE, LINKS_PER_NODE, PinnedCidIndex, compute_cid  # noqa: E402
+
+_BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+# --- Known `ipfs add` (CIDv0, default settings) vectors ---
+
+def test_empty_file():
+    assert compute_cid(b'') == 'QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH'
+
+
+def test_hello_world():
+    assert compute_cid(b'hello world\n') == 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'
+
+
+# --- Multi-level tree, checked against a dag-pb node built from the spec ---
+
+def varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def length_delimited(tag, data):
+    return bytes([tag]) + varint(len(data)) + data
+
+
+def base58_decode(text):
+    number = 0
+    for char in text:
+        number = number * 58 + _BASE58_ALPHABET.index(char)
+    return number.to_bytes(34, 'big')
+
+
+def leaf_node(chunk):
+    # PBNode.Data(1) = UnixFS{Type(1)=File, Data(2)=chunk, filesize(3)}
+    return length_delimited(0x0a, b'\x08\x02' + length_delimited(0x12, chunk) + b'\x18' + varint(len(chunk)))
+
+
+def parent_node(children):
+    """children: (multihash, cumulative size, file size); returns (node, cumulative size, file size)"""
+    links = b''
+    blocksizes = b''
+    for multihash, tsize, filesize in children:
+        # PBLink: Hash(1), Name(2) = '', Tsize(3)
+        links += length_delimited(0x12, length_delimited(0x0a, multihash) + b'\x12\x00' + b'\x18' + varint(tsize))
+        blocksizes += b'\x20' + varint(filesize)
+    filesize = sum(child[2] for child in children)
+    node = links + length_delimited(0x0a, b'\x08\x02\x18' + varint(filesize) + blocksizes)
+    return node, len(node) + sum(child[1] for child in children), filesize
+
+
+def multihash(node):
+    return b'\x12\x20' + hashlib.sha256(node).digest()
+
+
+def test_more_than_one_node_of_links_builds_a_second_level():
+    chunk = bytes(range(256)) * (CHUNK_SIZE // 256)
+    tail = b'tail of the recording'
+    data = chunk * LINKS_PER_NODE + tail
+
+    leaf = leaf_node(chunk)
+    full = [(multihash(leaf), len(leaf), len(chunk))] * LINKS_PER_NODE
+    full_node, full_tsize, full_size = parent_node(full)
+    tail_leaf = leaf_node(tail)
+    tail_node, tail_tsize, tail_size = parent_node([(multihash(tail_leaf), len(tail_leaf), len(tail))])
+    root, _, _ = parent_node([(multihash(full_node), full_tsize, full_size),
+                              (multihash(tail_node), tail_tsize, tail_size)])
+
+    cid = compute_cid(data)
+    assert base58_decode(cid) == multihash(root)
+    # The first subtree is the tree of the first 174 chunks on their own
+    assert base58_decode(compute_cid(data[:CHUNK_SIZE * LINKS_PER_NODE])) == multihash(full_node)
+
+
+def test_cid_does_not_depend_on_the_input_type():
+    data = b'\x01\x02' * 1000
+    assert compute_cid(data) == compute_cid(bytearray(data)) == compute_cid(memoryview(data))
+
+
+# --- PinnedCidIndex ---
+
+def read_lines(path):
+    with open(path) as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_index_is_reloaded_from_disk(tmp_path):
+    path = str(tmp_path / 'dedup.jsonl')
+    index = PinnedCidIndex(path=path)
+    index.add('QmLocalA', 'QmLocalA')
+    index.add('QmLocalB', 'QmDaemonB')
+
+    reloaded = PinnedCidIndex(path=path)
+    assert reloaded.lookup('QmLocalA') == 'QmLocalA'
+    assert reloaded.lookup('QmLocalB', size=10) == 'QmDaemonB'
+    assert reloaded.lookup('QmMissing') is None
+    assert reloaded.get_stats()['bytesSkipped'] == 10
+
+
+def test_load_skips_corrupt_lines(tmp_path):
+    path = tmp_path / 'dedup.jsonl'
+    path.write_text('["QmA", "QmA"]\nnot json\n["QmB", "QmB"]\n')
+
+    index = PinnedCidIndex(path=str(path))
+    assert index.get_stats()['entries'] == 2
+
+
+def test_load_compacts_the_file(tmp_path):
+    path = tmp_path / 'dedup.jsonl'
+    path.write_text(''.join(json.dumps(entry) + '\n' for entry in [
+        ['QmA', 'QmA'], ['QmB', 'QmB'], ['QmA', 'QmA2'], ['QmC', 'QmC'], ['QmB', None], ['QmD', 'QmD']
+    ]))
+
+    index = PinnedCidIndex(max_entries=2, path=str(path))
+    # Latest value wins, QmB was removed and the oldest entry beyond max_entries is dropped
+    assert read_lines(str(path)) == [['QmC', 'QmC'], ['QmD', 'QmD']]
+    assert index.lookup('QmA') is None
+    assert index.lookup('QmD') == 'QmD'
+
+
+def test_add_evicts_the_least_recently_used_entry():
+    index = PinnedCidIndex(max_entries=2)
+    index.add('QmA', 'QmA')
+    index.add('QmB', 'QmB')
+    index.lookup('QmA')
+    index.add('QmC', 'QmC')
+
+    assert index.lookup('QmB') is None
+    assert index.lookup('QmA') == 'QmA'
+    assert index.lookup('QmC') == 'QmC'
+
+
+@pytest.mark.parametrize('cid', ['QmLocal', 'QmDaemon'])
+def test_remove_by_local_or_daemon_cid_is_persisted(tmp_path, cid):
+    path = str(tmp_path / 'dedup.jsonl')
+    index = PinnedCidIndex(path=path)
+    index.add('QmLocal', 'QmDaemon')
+    index.add('QmOther', 'QmOther')
+
+    index.remove(cid)
+    assert index.lookup('QmLocal') is None
+    assert read_lines(path)[-1] == ['QmLocal', None]
+
+    reloaded = PinnedCidIndex(path=path)
+    assert reloaded.lookup('QmLocal') is None
+    assert reloaded.lookup('QmOther') == 'QmOther'
+
+
+def test_mismatches_are_counted():
+    index = PinnedCidIndex()
+    index.add('QmLocal', 'QmDaemon')
+    index.add('QmSame', 'QmSame')
+
+    assert index.get_stats()['mismatches'] == 1
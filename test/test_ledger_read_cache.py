@@ -0,0 +1,118 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client', 'app'))
+
+from ledgerReadCache import LedgerReadCache  # noqa: E402
+
+NAMESPACE = 'ecgcc'
+
+
+def query(function, patient_id):
+    return {'function': function, 'Args': [patient_id]}
+
+
+def store(cache, function, patient_id, value, role='doctor'):
+    key = LedgerReadCache.make_key(query(function, patient_id), role)
+    assert cache.put(key, value, [patient_id], cache.begin())
+    return key
+
+
+def block(*transactions):
+    return {'transactions': [
+        {'valid': valid, 'writeSet': {NAMESPACE: keys}} for valid, keys in transactions
+    ]}
+
+
+def test_key_includes_function_args_and_role():
+    call = query('getECGData', 'PATIENT-001')
+    assert LedgerReadCache.make_key(call, 'doctor') != LedgerReadCache.make_key(call, 'patient')
+    assert LedgerReadCache.make_key(call, 'doctor') == ('getECGData', ('PATIENT-001',), 'doctor')
+
+
+def test_invalidate_drops_every_entry_that_read_the_key():
+    cache = LedgerReadCache()
+    data = store(cache, 'getECGData', 'PATIENT-001', {'ipfsHash': 'QmA'})
+    status = store(cache, 'getDataStatus', 'PATIENT-001', {'status': 'PENDING'})
+    other = store(cache, 'getECGData', 'PATIENT-002', {'ipfsHash': 'QmB'})
+
+    cache.invalidate(['PATIENT-001'])
+
+    assert cache.get(data) is None
+    assert cache.get(status) is None
+    assert cache.get(other) == {'ipfsHash': 'QmB'}
+    assert cache.get_stats()['invalidations'] == 2
+
+
+def test_block_write_set_invalidates_only_valid_transactions():
+    cache = LedgerReadCache()
+    first = store(cache, 'getECGData', 'PATIENT-001', 'first')
+    second = store(cache, 'getECGData', 'PATIENT-002', 'second')
+
+    cache.handle_block(block((False, ['PATIENT-001']), (True, ['PATIENT-002'])), NAMESPACE)
+
+    assert cache.get(first) == 'first'
+    assert cache.get(second) is None
+
+
+def test_block_writes_to_other_namespaces_are_ignored():
+    cache = LedgerReadCache()
+    key = store(cache, 'getECGData', 'PATIENT-001', 'value')
+
+    cache.handle_block({'transactions': [{'valid': True, 'writeSet': {'lscc': ['PATIENT-001']}}]}, NAMESPACE)
+
+    assert cache.get(key) == 'value'
+
+
+def test_read_overlapping_an_invalidation_is_not_stored():
+    cache = LedgerReadCache()
+    key = LedgerReadCache.make_key(query('getECGData', 'PATIENT-001'), 'doctor')
+    token = cache.begin()
+    cache.invalidate(['PATIENT-001'])
+
+    assert cache.put(key, 'pre-commit value', ['PATIENT-001'], token) is False
+    assert cache.get(key) is None
+    assert cache.get_stats()['staleSkips'] == 1
+    # Invalidating another key does not block the read
+    token = cache.begin()
+    cache.invalidate(['PATIENT-002'])
+    assert cache.put(key, 'current value', ['PATIENT-001'], token) is True
+
+
+def test_clear_drops_entries_and_in_flight_reads():
+    cache = LedgerReadCache()
+    key = store(cache, 'getECGData', 'PATIENT-001', 'value')
+    token = cache.begin()
+
+    cache.clear()
+
+    assert cache.get(key) is None
+    assert cache.put(key, 'value', ['PATIENT-001'], token) is False
+
+
+def test_lru_is_bounded_and_evicts_the_least_recently_used():
+    cache = LedgerReadCache(max_entries=2)
+    first = store(cache, 'getECGData', 'PATIENT-001', 1)
+    second = store(cache, 'getECGData', 'PATIENT-002', 2)
+    cache.get(first)
+    third = store(cache, 'getECGData', 'PATIENT-003', 3)
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    assert cache.get(second) is None
+    assert cache.get(first) == 1
+    assert cache.get(third) == 3
+    # The evicted entry no longer appears in the ledger key index
+    assert 'PATIENT-002' not in cache._by_ledger_key
+
+
+def test_invalidation_history_stays_bounded():
+    cache = LedgerReadCache(max_entries=2)
+    for index in range(50):
+        cache.invalidate([f'PATIENT-{index}'])
+
+    assert len(cache._invalidated_at) <= 8
+    # Reads that began before the forgotten invalidations are not stored
+    key = LedgerReadCache.make_key(query('getECGData', 'PATIENT-999'), 'doctor')
+    assert cache.put(key, 'value', ['PATIENT-999'], 0) is False
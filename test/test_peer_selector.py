@@ -0,0 +1,139 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client', 'app'))
+
+import peerSelector  # noqa: E402
+from peerSelector import PeerSelector  # noqa: E402
+
+PEERS = {
+    'peer0.org1': {'address': 'peer0.org1.example.com:7051', 'mspId': 'Org1MSP', 'tlsRootCert': ''},
+    'peer1.org1': {'address': 'peer1.org1.example.com:8051', 'mspId': 'Org1MSP', 'tlsRootCert': ''},
+    'peer0.org2': {'address': 'peer0.org2.example.com:9051', 'mspId': 'Org2MSP', 'tlsRootCert': ''},
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(peerSelector.time, 'monotonic', fake)
+    return fake
+
+
+def call(selector, clock, name, ms, ok=True, error=None):
+    started = selector.start(name)
+    clock.now += ms / 1000.0
+    selector.finish(name, started, ok, error)
+
+
+def test_ewma_weights_the_newest_sample_by_alpha(clock):
+    selector = PeerSelector(PEERS, alpha=0.5)
+    call(selector, clock, 'peer0.org1', 100)
+    call(selector, clock, 'peer0.org1', 20)
+
+    assert selector.get_stats()['peer0.org1']['ewmaMs'] == pytest.approx(60.0)
+
+
+def test_endorsers_are_the_fastest_peer_of_each_org(clock):
+    selector = PeerSelector(PEERS)
+    call(selector, clock, 'peer0.org1', 80)
+    call(selector, clock, 'peer1.org1', 10)
+    call(selector, clock, 'peer0.org2', 30)
+
+    assert selector.select_endorsers() == ['peer1.org1', 'peer0.org2']
+    assert selector.select_endorser('Org1MSP') == 'peer1.org1'
+
+    # EWMA ordering follows the latest samples once the fast peer slows down
+    for _ in range(10):
+        call(selector, clock, 'peer1.org1', 200)
+    assert selector.select_endorser('Org1MSP') == 'peer0.org1'
+
+
+def test_in_flight_calls_count_against_a_peer(clock):
+    selector = PeerSelector(PEERS)
+    call(selector, clock, 'peer0.org1', 10)
+    call(selector, clock, 'peer1.org1', 15)
+    selector.start('peer0.org1')
+
+    assert selector.select_endorser('Org1MSP') == 'peer1.org1'
+
+
+def test_query_peer_prefers_the_lower_score(clock):
+    peers = {name: PEERS[name] for name in ('peer0.org1', 'peer1.org1')}
+    selector = PeerSelector(peers)
+    call(selector, clock, 'peer0.org1', 100)
+    call(selector, clock, 'peer1.org1', 5)
+
+    assert {selector.select_query_peer() for _ in range(20)} == {'peer1.org1'}
+    assert selector.select_query_peer(exclude=('peer1.org1',)) == 'peer0.org1'
+    assert selector.select_query_peer(exclude=tuple(peers)) is None
+
+
+def test_failover_after_consecutive_connectivity_errors(clock):
+    selector = PeerSelector(PEERS, failure_threshold=2, cooldown=5.0)
+    call(selector, clock, 'peer0.org1', 5)
+    call(selector, clock, 'peer1.org1', 50)
+
+    call(selector, clock, 'peer0.org1', 1, ok=False, error='rpc error: code = Unavailable')
+    assert selector.select_endorser('Org1MSP') == 'peer0.org1'
+    call(selector, clock, 'peer0.org1', 1, ok=False, error='rpc error: code = Unavailable')
+
+    assert selector.get_stats()['peer0.org1']['healthy'] is False
+    assert selector.select_endorser('Org1MSP') == 'peer1.org1'
+    assert selector.select_endorsers() == ['peer1.org1', 'peer0.org2']
+
+
+def test_down_peer_gets_a_trial_call_after_the_cooldown(clock):
+    selector = PeerSelector(PEERS, failure_threshold=2, cooldown=5.0, max_cooldown=60.0)
+    call(selector, clock, 'peer0.org1', 5)
+    call(selector, clock, 'peer1.org1', 50)
+    for _ in range(2):
+        call(selector, clock, 'peer0.org1', 1, ok=False, error='connection refused')
+
+    clock.now += 5.0
+    assert selector.select_endorser('Org1MSP') == 'peer0.org1'
+
+    # A failed trial call marks it down again, for twice as long
+    call(selector, clock, 'peer0.org1', 1, ok=False, error='connection refused')
+    assert selector.select_endorser('Org1MSP') == 'peer1.org1'
+    clock.now += 9.0
+    assert selector.select_endorser('Org1MSP') == 'peer1.org1'
+    clock.now += 1.0
+    assert selector.select_endorser('Org1MSP') == 'peer0.org1'
+
+    # A successful trial call brings it back for good
+    call(selector, clock, 'peer0.org1', 5)
+    call(selector, clock, 'peer0.org1', 1, ok=False, error='connection refused')
+    assert selector.get_stats()['peer0.org1']['healthy'] is True
+
+
+def test_when_every_peer_is_down_the_first_to_return_is_used(clock):
+    peers = {name: PEERS[name] for name in ('peer0.org1', 'peer1.org1')}
+    selector = PeerSelector(peers, failure_threshold=1, cooldown=5.0)
+    call(selector, clock, 'peer1.org1', 1, ok=False, error='i/o timeout')
+    clock.now += 1.0
+    call(selector, clock, 'peer0.org1', 1, ok=False, error='i/o timeout')
+
+    assert selector.select_query_peer() == 'peer1.org1'
+    assert selector.select_endorser('Org1MSP') == 'peer1.org1'
+
+
+def test_connectivity_errors_and_peer_addresses_are_recognized():
+    selector = PeerSelector(PEERS)
+
+    assert PeerSelector.is_connectivity_error('rpc error: code = Unavailable desc = connection refused')
+    assert PeerSelector.is_connectivity_error('context deadline exceeded')
+    assert not PeerSelector.is_connectivity_error('Error: ECG data for patient P-1 not found')
+    assert not PeerSelector.is_connectivity_error(None)
+    assert selector.peer_for_address('failed to connect to peer0.org2.example.com:9051') == 'peer0.org2'
+    assert selector.peer_for_address('chaincode error') is None